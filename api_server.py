@@ -1,19 +1,24 @@
 # api_server.py
 
-import os, uuid
+import json, os, uuid
 from typing import Optional, Dict, Any, List
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from context_store import load_context
+from context_store import load_context, load_agent
 from orchestrator import run_orchestrator_turn, execute_with_keys
+from jobs import JOBS_ENABLED, start_job, get_job
+from seo_common import forget_session_key
+from patch_pack_adapter import latest_pack
 
 # --- MODELS ---
 class StartSessionResponse(BaseModel): session_id: str
 class ChatBody(BaseModel): message: str; api_keys: Optional[dict] = None
 class ExecuteBody(BaseModel): creds: dict
 class ChatResponse(BaseModel): messages: List[Dict[str, Any]]
+class JobResponse(BaseModel): job_id: str; status: str
 
 # --- APP SETUP ---
 app = FastAPI(title="FieldNote API", version="1.0.0") # Let's call it 1.0!
@@ -29,6 +34,12 @@ app.add_middleware(CORSMiddleware, allow_origins=allow_origins, allow_credential
 @app.post("/api/session/start", response_model=StartSessionResponse)
 async def start_session(): return {"session_id": str(uuid.uuid4())[:8]}
 
+@app.post("/api/session/{session_id}/end")
+async def end_session(session_id: str):
+    # Forgets the Gemini key the session's turns were using.
+    forget_session_key(session_id)
+    return {"ok": True}
+
 @app.post("/api/session/{session_id}/chat", response_model=ChatResponse)
 async def post_chat_message(session_id: str, body: ChatBody):
     response_messages = await run_orchestrator_turn(session_id, body.message, api_keys=body.api_keys)
@@ -39,19 +50,69 @@ async def execute_changes(session_id: str, body: ExecuteBody):
     logs = await execute_with_keys(session_id, body.creds)
     return {"messages": logs}
 
+# Long turns (crawl + analysis, CMS execution) run as background jobs; the
+# dashboard follows their progress on /api/jobs/{job_id}/events. Jobs are kept
+# in process memory, so they are disabled on serverless deployments (see
+# jobs.py) and the dashboard uses the blocking endpoints above instead.
+def _require_jobs():
+    if not JOBS_ENABLED: raise HTTPException(status_code=503, detail="Background jobs are disabled on this deployment.")
+
+@app.post("/api/session/{session_id}/jobs/chat", response_model=JobResponse)
+async def start_chat_job(session_id: str, body: ChatBody):
+    _require_jobs()
+    job = start_job(session_id, "chat", lambda emit: run_orchestrator_turn(session_id, body.message, api_keys=body.api_keys, on_message=emit))
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/api/session/{session_id}/jobs/execute", response_model=JobResponse)
+async def start_execute_job(session_id: str, body: ExecuteBody):
+    _require_jobs()
+    job = start_job(session_id, "execute", lambda emit: execute_with_keys(session_id, body.creds, on_message=emit))
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None: raise HTTPException(status_code=404, detail="Unknown job.")
+    return {**job.summary(), "messages": job.events}
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, after: int = 0, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events: one `message` per progress event, then `end`. Reconnects resume after Last-Event-ID."""
+    job = get_job(job_id)
+    if job is None: raise HTTPException(status_code=404, detail="Unknown job.")
+    if last_event_id and last_event_id.isdigit(): after = max(after, int(last_event_id))
+
+    async def stream():
+        yield "retry: 2000\n\n"
+        async for event in job.events_after(after):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                kind = "end" if event.get("type") == "end" else "message"
+                yield f"id: {event['id']}\nevent: {kind}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/api/session/{session_id}/context")
 async def get_context(session_id: str):
-    return load_context(session_id) or {"error" : "No context found for this session."}
+    # The dashboard's review modal shows each page's original html.
+    return load_context(session_id, include_pages=True) or {"error" : "No context found for this session."}
 
 @app.get("/api/session/{session_id}/review")
 async def get_review_data(session_id: str):
-    ctx = load_context(session_id)
-    if not ctx: return {"error": "No context."}
+    if load_context(session_id) is None: return {"error": "No context."}
     return {
-        "onpage_seo": ctx.get("agents", {}).get("onpage_seo", {}).get("proposals", []),
-        "meta_optimization": ctx.get("agents", {}).get("meta_optimization", {}).get("proposals", []),
-        "blog_automation": ctx.get("agents", {}).get("blog_automation", {}).get("schedule", []),
+        "onpage_seo": load_agent(session_id, "onpage_seo").get("proposals", []),
+        "meta_optimization": load_agent(session_id, "meta_optimization").get("proposals", []),
+        "blog_automation": load_agent(session_id, "blog_automation").get("schedule", []),
     }
 
+@app.get("/api/session/{session_id}/patch-pack")
+async def download_patch_pack(session_id: str):
+    # FileResponse streams the archive from disk in chunks.
+    pack = latest_pack(session_id)
+    if pack is None: raise HTTPException(status_code=404, detail="No patch pack has been built for this session.")
+    return FileResponse(pack, media_type="application/zip", filename=f"fieldnote-{session_id}-{pack.stem}.zip")
+
 if os.path.isdir("agent"):
     app.mount("/", StaticFiles(directory="agent", html=True), name="static")
\ No newline at end of file
@@ -5,7 +5,7 @@ import os
 from datetime import date, timedelta
 # CORRECTED: Removed the non-existent 'llm_enabled'
 from seo_common import genai_model, generate_with_fallback, today_iso
-from context_store import load_context, save_context
+from context_store import load_section, load_agent, update_agent
 
 class BlogAutomation:
     def __init__(self):
@@ -27,15 +27,14 @@ class BlogAutomation:
         return []
 
     def schedule_blogs(self, session_id: str, days: int = 7, generate_drafts: bool = True) -> dict:
-        ctx = load_context(session_id)
-        if not ctx: return {"error": "No snapshot found."}
+        website = load_section(session_id, "website")
+        if not website: return {"error": "No snapshot found."}
+        ctx = {"website": website, "business": load_section(session_id, "business", {}) or {}}
         days = min(days, int(os.environ.get("DEMO_BLOG_DRAFTS", "5")))
-        clusters_data = (ctx.get("agents", {}).get("topical_map", {}).get("clusters") or {})
+        clusters_data = (load_agent(session_id, "topical_map").get("clusters") or {})
         clusters_list = self._normalize_clusters(clusters_data)
         if not clusters_list:
-            ctx.setdefault("agents", {}).setdefault("blog_automation", {})["schedule"] = []
-            ctx["agents"]["blog_automation"]["created_at"] = today_iso()
-            save_context(session_id, ctx)
+            update_agent(session_id, self.name, {"schedule": [], "created_at": today_iso()})
             return {"status": "ok", "scheduled": 0, "schedule": []}
         queue = []
         for cluster in clusters_list:
@@ -76,9 +75,7 @@ class BlogAutomation:
                     entry["draft_content"] = md
             schedule.append(entry)
 
-        ctx.setdefault("agents", {}).setdefault("blog_automation", {})["schedule"] = schedule
-        ctx["agents"]["blog_automation"]["created_at"] = today_iso()
-        save_context(session_id, ctx)
+        update_agent(session_id, self.name, {"schedule": schedule, "created_at": today_iso()})
         return {"status": "ok", "scheduled": len(schedule), "schedule": schedule}
 
     def _draft_markdown(self, ctx: dict, item: dict, model):
@@ -3,6 +3,9 @@ from typing import Any, Dict, List, Optional, Tuple
 
 class CMSClient:
     """Abstract adapter interface for CMS / platform updates."""
+    # Whether operations applied in an earlier run are skipped (see CMSExecutor.completed).
+    RESUMABLE = True
+
     def update_page_meta(self, page_id_or_path: str, title: Optional[str]=None, description: Optional[str]=None, canonical: Optional[str]=None) -> Dict[str, Any]:
         raise NotImplementedError
 
@@ -16,6 +19,16 @@ class CMSClient:
         """List of (from, to, status)."""
         raise NotImplementedError
 
+    def finalize(self) -> Dict[str, Any]:
+        """
+        Called once after every operation of a run has been attempted. Adapters
+        that stage changes (results with "staged": True) apply them here;
+        raising marks the staged operations as failed. Staged results may
+        carry a "ref" (or a list of refs); returning {"failed": {ref: error}}
+        fails only the operations those refs belong to.
+        """
+        return {}
+
 def get_client(platform: str, creds: Dict[str, Any]):
     platform = (platform or '').lower()
     if platform in ('wordpress', 'wp'):
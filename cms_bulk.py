@@ -0,0 +1,206 @@
+# cms_bulk.py
+"""
+Shared machinery for CMS adapters whose content lives in collection items
+(Webflow, Wix).
+
+Items of the configured collections are listed once per run and indexed by
+slug, so a page URL resolves to (collection, item) without a request per
+change. Calls only stage field values; changes to the same item (meta and
+JSON-LD) are merged, and finalize() sends them with the platform's bulk
+endpoints, BULK_LIMIT items per request, then publishes the site once.
+Requests are paced to REQUESTS_PER_MINUTE and 429 / 5xx responses are
+retried with the executor's backoff.
+"""
+
+import itertools, json, os, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import requests
+from cms_base import CMSClient
+from cms_executor import retry_delay
+
+MAX_ATTEMPTS = 5
+
+class RequestPacer:
+    """Spaces requests at least 60 / per_minute seconds apart across threads."""
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self.next_at = 0.0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self.next_at - now)
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay:
+            self.waited += delay
+            time.sleep(delay)
+
+class BulkItemAdapter(CMSClient):
+    PLATFORM = ""
+    API_BASE = ""
+    REQUESTS_PER_MINUTE = 60
+    BULK_LIMIT = 100
+    # Item field names; creds["fields"] overrides any of them.
+    FIELDS = {"seo_title": "", "seo_description": "", "json_ld": "", "post_title": "", "post_body": "", "slug": "slug"}
+
+    def __init__(self, creds: Dict[str, Any]):
+        self.creds = creds or {}
+        self.api_base = (self.creds.get("api_base") or self.API_BASE).rstrip("/")
+        self.collections: List[str] = [c for c in ([self.creds.get("collection_id")] + list(self.creds.get("collection_ids") or [])) if c]
+        self.blog_collection = self.creds.get("blog_collection_id") or (self.collections[0] if self.collections else None)
+        self.fields = {**self.FIELDS, **(self.creds.get("fields") or {})}
+        per_minute = float(os.environ.get(f"{self.PLATFORM.upper()}_REQUESTS_PER_MINUTE", self.REQUESTS_PER_MINUTE))
+        self.pacer = RequestPacer(per_minute)
+        self.session = requests.Session()
+        self.requests_made = 0
+        self.direct_writes = 0     # changes applied immediately (no bulk endpoint) that still need the publish
+        self._lock = threading.Lock()
+        self._refs = itertools.count(1)
+        self._index: Optional[Dict[str, Tuple[str, str, Dict[str, Any]]]] = None
+        self._updates: Dict[Tuple[str, str], Tuple[Dict[str, Any], List[str]]] = {}
+        self._creates: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            attempt += 1
+            self.pacer.wait()
+            r = self.session.request(method, f"{self.api_base}{path}", params=params,
+                                     data=json.dumps(payload) if payload is not None else None, timeout=60)
+            self.requests_made += 1
+            try:
+                r.raise_for_status()
+            except requests.HTTPError as e:
+                delay = retry_delay(e, attempt) if attempt < MAX_ATTEMPTS else None
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            return r.json() if r.content else {}
+
+    # --- platform hooks ---
+    def _list_items(self, collection_id: str):
+        """Yields (item id, item fields) of every item in a collection."""
+        raise NotImplementedError
+
+    def _bulk_update(self, collection_id: str, items: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, str]:
+        """Updates (item id, fields) pairs; returns {item id: error} for items that failed."""
+        raise NotImplementedError
+
+    def _bulk_create(self, collection_id: str, items: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Creates draft items; returns an error or None per item."""
+        raise NotImplementedError
+
+    def _publish(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _page_seo(self, page_id_or_path: str, title: Optional[str], description: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Static (non-collection) page SEO, where the platform supports it; None when it does not."""
+        return None
+
+    # --- staging ---
+    def _item_index(self) -> Dict[str, Tuple[str, str, Dict[str, Any]]]:
+        with self._lock:
+            if self._index is None:
+                index: Dict[str, Tuple[str, str, Dict[str, Any]]] = {}
+                for collection_id in self.collections:
+                    for item_id, fields in self._list_items(collection_id):
+                        slug = fields.get(self.fields["slug"])
+                        if slug:
+                            index.setdefault(str(slug), (collection_id, item_id, fields))
+                self._index = index
+            return self._index
+
+    @staticmethod
+    def _slug(page_id_or_path: str) -> str:
+        path = urlparse(page_id_or_path).path if "://" in page_id_or_path else page_id_or_path
+        return path.rstrip("/").rsplit("/", 1)[-1]
+
+    def _stage_fields(self, page_id_or_path: str, fields: Dict[str, Any], what: str) -> Dict[str, Any]:
+        fields = {k: v for k, v in fields.items() if k}
+        if not fields:
+            return {"ok": False, "message": f"no {self.PLATFORM} field is configured for {what}"}
+        item = self._item_index().get(self._slug(page_id_or_path))
+        if item is None:
+            return {"ok": False, "message": f"no {self.PLATFORM} collection item with slug '{self._slug(page_id_or_path)}'"}
+        collection_id, item_id, _ = item
+        with self._lock:
+            ref = f"i{next(self._refs)}"
+            staged, refs = self._updates.setdefault((collection_id, item_id), ({}, []))
+            staged.update(fields)
+            refs.append(ref)
+        return {"ok": True, "staged": True, "ref": ref, "message": f"{what} queued for item '{self._slug(page_id_or_path)}'"}
+
+    def update_page_meta(self, page_id_or_path: str, title: Optional[str]=None, description: Optional[str]=None, canonical: Optional[str]=None):
+        if self._slug(page_id_or_path) not in self._item_index():
+            page = self._page_seo(page_id_or_path, title, description)
+            if page is not None:
+                return page
+        fields = {}
+        if title: fields[self.fields["seo_title"]] = title
+        if description: fields[self.fields["seo_description"]] = description
+        return self._stage_fields(page_id_or_path, fields, "SEO fields")
+
+    def inject_json_ld(self, page_id_or_path: str, json_ld: Dict[str, Any]):
+        return self._stage_fields(page_id_or_path, {self.fields["json_ld"]: json.dumps(json_ld)}, "JSON-LD")
+
+    def create_post(self, collection_or_path: str, title: str, html: str, slug: Optional[str]=None, date: Optional[str]=None, meta: Optional[Dict[str, Any]]=None):
+        if not self.blog_collection:
+            return {"ok": False, "message": f"no {self.PLATFORM} blog collection configured (blog_collection_id)"}
+        fields = {self.fields["post_title"]: title, self.fields["post_body"]: html}
+        if slug: fields[self.fields["slug"]] = slug
+        with self._lock:
+            ref = f"i{next(self._refs)}"
+            self._creates.append((ref, self.blog_collection, fields))
+        return {"ok": True, "staged": True, "ref": ref, "message": "Blog item queued as draft"}
+
+    def set_redirects(self, redirects: List[Tuple[str, str, int]]):
+        return {"ok": False, "message": f"Redirects are not available through the {self.PLATFORM} API; add them in the site settings."}
+
+    def finalize(self) -> Dict[str, Any]:
+        if not (self._updates or self._creates or self.direct_writes):
+            return {}
+        started = time.monotonic()
+        failed: Dict[str, str] = {}
+        applied = 0
+        by_collection: Dict[str, List[Tuple[str, Dict[str, Any], List[str]]]] = {}
+        for (collection_id, item_id), (fields, refs) in self._updates.items():
+            by_collection.setdefault(collection_id, []).append((item_id, fields, refs))
+        for collection_id, items in by_collection.items():
+            for start in range(0, len(items), self.BULK_LIMIT):
+                chunk = items[start:start + self.BULK_LIMIT]
+                try:
+                    errors = self._bulk_update(collection_id, [(item_id, fields) for item_id, fields, _ in chunk])
+                except Exception as e:
+                    errors = {item_id: str(e) for item_id, _, _ in chunk}
+                for item_id, _, refs in chunk:
+                    if item_id in errors:
+                        failed.update({ref: errors[item_id] for ref in refs})
+                    else:
+                        applied += 1
+        creates: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for ref, collection_id, fields in self._creates:
+            creates.setdefault(collection_id, []).append((ref, fields))
+        for collection_id, items in creates.items():
+            for start in range(0, len(items), self.BULK_LIMIT):
+                chunk = items[start:start + self.BULK_LIMIT]
+                try:
+                    errors = self._bulk_create(collection_id, [fields for _, fields in chunk])
+                except Exception as e:
+                    errors = [str(e)] * len(chunk)
+                for (ref, _), error in zip(chunk, errors):
+                    if error:
+                        failed[ref] = error
+                    else:
+                        applied += 1
+        # One publish for the whole run, and only when something changed.
+        published = self._publish() if applied or self.direct_writes else {}
+        return {
+            "ok": True, "failed": failed, "requests": self.requests_made, "published": bool(published),
+            "message": (f"{self.PLATFORM.capitalize()}: {applied} item(s) written in {self.requests_made} request(s)"
+                        f"{', site published once' if published else ''}, {round(self.pacer.waited, 1)}s rate-limit wait, "
+                        f"{round(time.monotonic() - started, 1)}s total."),
+        }
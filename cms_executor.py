@@ -0,0 +1,225 @@
+# cms_executor.py
+"""
+Concurrent executor for approved CMS changes.
+
+Each change (meta update, schema injection, blog post) is an Operation with
+a stable id derived from what it writes. Operations run in worker threads,
+at most EXECUTOR_CONCURRENCY (or the platform default) at a time; throttled
+and transient failures are retried with exponential backoff and jitter,
+honouring Retry-After. Finished operations are recorded in the session's
+ledger section in small batches (every LEDGER_BATCH entries or
+LEDGER_FLUSH_SECONDS, and when the run ends or is interrupted), so an
+interrupted or partly failed run can be started again and only redoes what
+is not done. The ledger lives outside the context document, so re-analysing
+the site keeps it.
+"""
+
+import asyncio, hashlib, json, os, random, time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import requests
+from context_store import LEDGER_PREFIX, load_section, merge_section, save_section
+from crawl_frontier import parse_retry_after
+
+LEDGER_KEY = LEDGER_PREFIX + "execution"
+REPORT_KEY = LEDGER_PREFIX + "execution_report"
+LEDGER_BATCH = 50
+LEDGER_FLUSH_SECONDS = 2.0
+# Concurrent adapter calls per platform; APIs with tight rate limits get fewer.
+PLATFORM_CONCURRENCY = {"wordpress": 4, "shopify": 2, "webflow": 2, "wix": 2, "git": 1, "patch": 1}
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+@dataclass
+class Operation:
+    kind: str                        # "meta" | "schema" | "post"
+    target: str                      # page url or post title, for messages
+    payload: Any                     # what gets written; part of the id
+    call: Callable[[Any], Any] = field(repr=False)  # call(client) -> adapter result
+
+    @property
+    def id(self) -> str:
+        digest = hashlib.sha256(json.dumps([self.kind, self.target, self.payload], sort_keys=True, default=str).encode("utf-8"))
+        return f"{self.kind}:{digest.hexdigest()[:16]}"
+
+def platform_concurrency(platform: str) -> int:
+    override = os.environ.get("EXECUTOR_CONCURRENCY")
+    if override:
+        try:
+            return max(1, int(override))
+        except ValueError:
+            pass
+    return PLATFORM_CONCURRENCY.get((platform or "").lower(), 2)
+
+def retry_delay(error: BaseException, attempt: int) -> Optional[float]:
+    """Seconds to wait before attempt `attempt + 1`, or None when `error` is not worth retrying."""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        if response is None or response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(retry_after, _env_float("EXECUTOR_MAX_BACKOFF_SECONDS", 60.0))
+    elif not isinstance(error, (requests.ConnectionError, requests.Timeout, TimeoutError)):
+        return None
+    backoff = _env_float("EXECUTOR_BACKOFF_SECONDS", 1.0) * 2 ** (attempt - 1)
+    return min(backoff, _env_float("EXECUTOR_MAX_BACKOFF_SECONDS", 60.0)) * random.uniform(0.5, 1.0)
+
+def _result_message(result: Any) -> str:
+    return str(result.get("message", "")) if isinstance(result, dict) else ""
+
+class CMSExecutor:
+    """
+    Runs operations against one adapter. `on_result(op, entry)` is called on
+    the event loop for every operation as it finishes (ledger entry with
+    status done / staged / skipped / failed).
+    """
+    def __init__(self, session_id: str, client: Any, platform: str,
+                 on_result: Optional[Callable[[Operation, Dict], None]] = None,
+                 concurrency: Optional[int] = None, max_attempts: Optional[int] = None):
+        self.session_id = session_id
+        self.client = client
+        self.platform = (platform or "").lower()
+        self.on_result = on_result
+        self.concurrency = concurrency or platform_concurrency(platform)
+        self.max_attempts = max_attempts or max(1, int(_env_float("EXECUTOR_MAX_ATTEMPTS", 4)))
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._unrecorded: Dict[str, Dict] = {}
+        self._flushed_at = time.monotonic()
+
+    def _kind_stats(self, kind: str) -> Dict[str, Any]:
+        return self.stats.setdefault(kind, {"ops": 0, "done": 0, "skipped": 0, "failed": 0, "retries": 0,
+                                            "latencies": [], "first_start": None, "last_end": None})
+
+    def completed(self, ops: List[Operation], ledger: Optional[Dict[str, Dict]] = None) -> set:
+        """Ids of `ops` already applied to this platform in an earlier run (none for adapters that are not RESUMABLE)."""
+        if not getattr(self.client, "RESUMABLE", True):
+            return set()
+        if ledger is None:
+            ledger = load_section(self.session_id, LEDGER_KEY, {}) or {}
+        return {op.id for op in ops
+                if ledger.get(op.id, {}).get("status") == "done" and ledger[op.id].get("platform", self.platform) == self.platform}
+
+    def _record(self, entries: Dict[str, Dict]) -> None:
+        merge_section(self.session_id, LEDGER_KEY, entries)
+
+    async def _flush(self, force: bool = False) -> None:
+        """Writes buffered ledger entries in one merge, when enough have piled up (or `force`)."""
+        if not self._unrecorded or not (force or len(self._unrecorded) >= LEDGER_BATCH
+                                        or time.monotonic() - self._flushed_at >= LEDGER_FLUSH_SECONDS):
+            return
+        entries, self._unrecorded = self._unrecorded, {}
+        self._flushed_at = time.monotonic()
+        await asyncio.to_thread(self._record, entries)
+
+    async def _run_one(self, op: Operation, slots: asyncio.Semaphore) -> Dict:
+        stats = self._kind_stats(op.kind)
+        async with slots:
+            started = time.monotonic()
+            if stats["first_start"] is None:
+                stats["first_start"] = started
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    result = await asyncio.to_thread(op.call, self.client)
+                except Exception as e:
+                    delay = retry_delay(e, attempt) if attempt < self.max_attempts else None
+                    if delay is None:
+                        entry = {"status": "failed", "error": str(e)}
+                        break
+                    stats["retries"] += 1
+                    await asyncio.sleep(delay)
+                    continue
+                if isinstance(result, dict) and result.get("ok") is False:
+                    entry = {"status": "skipped", "message": _result_message(result)}
+                elif isinstance(result, dict) and result.get("staged"):
+                    entry = {"status": "staged", "message": _result_message(result), "ref": result.get("ref")}
+                else:
+                    entry = {"status": "done", "message": _result_message(result)}
+                break
+            ended = time.monotonic()
+        stats["latencies"].append(ended - started)
+        stats["last_end"] = ended
+        entry.update({"kind": op.kind, "target": op.target, "platform": self.platform, "attempts": attempt,
+                      "latency_ms": round((ended - started) * 1000, 1), "updated_at": time.time()})
+        self._unrecorded[op.id] = entry
+        await self._flush()
+        return entry
+
+    async def run(self, ops: List[Operation]) -> Dict:
+        """Runs every operation not already done in an earlier run, then the adapter's finalize()."""
+        done = self.completed(ops)
+        pending = [op for op in ops if op.id not in done]
+        slots = asyncio.Semaphore(self.concurrency)
+        started = time.monotonic()
+
+        async def run_and_report(op: Operation) -> tuple:
+            entry = await self._run_one(op, slots)
+            stats = self._kind_stats(op.kind)
+            stats["ops"] += 1
+            if entry["status"] != "staged":
+                stats[entry["status"]] += 1
+                if self.on_result:
+                    self.on_result(op, entry)
+            return op, entry
+
+        try:
+            finished = await asyncio.gather(*(run_and_report(op) for op in pending))
+        finally:
+            await self._flush(force=True)
+        staged = [(op, entry) for op, entry in finished if entry["status"] == "staged"]
+        finalized: Dict[str, Any] = {}
+        try:
+            finalized = await asyncio.to_thread(self.client.finalize) or {}
+            outcome = {"status": "done"}
+        except Exception as e:
+            finalized = {"ok": False, "message": str(e)}
+            outcome = {"status": "failed", "error": f"finalize failed: {e}"}
+        # finalize() may report individual staged operations as failed by the "ref" (or refs) their call returned.
+        failed_refs = finalized.get("failed") or {}
+
+        def staged_outcome(entry: Dict) -> Dict:
+            refs = entry.get("ref") if isinstance(entry.get("ref"), list) else [entry.get("ref")]
+            errors = [str(failed_refs[ref]) for ref in refs if ref is not None and ref in failed_refs]
+            return {"status": "failed", "error": "; ".join(errors)} if outcome["status"] == "done" and errors else outcome
+
+        outcomes = [(op, entry, staged_outcome(entry)) for op, entry in staged]
+        if staged:
+            await asyncio.to_thread(self._record, {op.id: {**entry, **result, "updated_at": time.time()} for op, entry, result in outcomes})
+            for op, entry, result in outcomes:
+                entry.update(result)
+                self._kind_stats(op.kind)[result["status"]] += 1
+                if self.on_result:
+                    self.on_result(op, entry)
+
+        report = {
+            "ops": len(ops),
+            "already_done": len(ops) - len(pending),
+            "done": sum(s["done"] for s in self.stats.values()),
+            "skipped": sum(s["skipped"] for s in self.stats.values()),
+            "failed": sum(s["failed"] for s in self.stats.values()),
+            "concurrency": self.concurrency,
+            "elapsed_seconds": round(time.monotonic() - started, 3),
+            "by_kind": {kind: self._summarize(s) for kind, s in self.stats.items()},
+            "finalize": finalized,
+        }
+        await asyncio.to_thread(save_section, self.session_id, REPORT_KEY, report)
+        return report
+
+    @staticmethod
+    def _summarize(stats: Dict[str, Any]) -> Dict[str, Any]:
+        latencies = sorted(stats["latencies"])
+        span = (stats["last_end"] - stats["first_start"]) if latencies else 0.0
+        return {
+            "ops": stats["ops"], "done": stats["done"], "skipped": stats["skipped"], "failed": stats["failed"],
+            "retries": stats["retries"],
+            "ops_per_second": round(len(latencies) / span, 2) if span > 0 else None,
+            "avg_ms": round(sum(latencies) * 1000 / len(latencies), 1) if latencies else None,
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else None,
+        }
@@ -1,35 +1,305 @@
 # context_store.py
+"""
+Session context storage backed by SQLite.
 
-import json, os, pathlib, typing as t
+A context document is stored as separate records: one row per top-level
+section ("website", "business", "state", ...), one row per agent
+("agents.onpage_seo", ...) and one row per crawled page. Agents read and
+update only the records they touch, so per-call I/O does not grow with the
+size of the crawl. Derived indexes ("index.*") and execution records
+("ledger.*") are stored as sections too but are never part of the assembled
+document, so saving a new snapshot never drops them. Legacy `.vibe_context/<session>.json` files (and the
+`.pages.jsonl` page files that went with them) are migrated on first load,
+or all at once with `python context_store.py migrate`.
+"""
+
+import json, os, pathlib, sqlite3, sys, threading, time, typing as t, uuid
 
 # Check if we are running in the Vercel environment
 # If so, use the /tmp directory, which is the only writable location.
 # Otherwise, use the local .vibe_context directory for local development.
 IS_VERCEL = os.environ.get('VERCEL') == '1'
 BASE_DIR = '/tmp/vibe_context' if IS_VERCEL else '.vibe_context'
+DB_PATH = str(pathlib.Path(BASE_DIR) / "context.sqlite3")
+AGENT_PREFIX = "agents."
+INDEX_PREFIX = "index."
+LEDGER_PREFIX = "ledger."
+# Sections that live outside the context document.
+_DETACHED = (INDEX_PREFIX, LEDGER_PREFIX)
+_PAGE_BATCH = 200
+# Staged page sets older than this were left by a crashed crawl and are dropped.
+_STALE_STAGING_SECONDS = 24 * 3600
 
 # Ensure the base directory exists
 pathlib.Path(BASE_DIR).mkdir(parents=True, exist_ok=True)
 
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def _conn() -> sqlite3.Connection:
+    """One connection per thread; agents run in worker threads."""
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS sections (
+                        session_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+                        updated_at REAL NOT NULL, PRIMARY KEY (session_id, key));
+                    CREATE TABLE IF NOT EXISTS pages (
+                        session_id TEXT NOT NULL, seq INTEGER NOT NULL, url TEXT NOT NULL,
+                        data TEXT NOT NULL, PRIMARY KEY (session_id, url));
+                    CREATE INDEX IF NOT EXISTS pages_by_seq ON pages (session_id, seq);
+                """)
+                _schema_ready = True
+    return conn
+
+class _Tx:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on the thread's connection."""
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn = _conn()
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+def _dumps(value: t.Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
 def _path(session_id: str) -> str:
     safe_id = session_id.replace("/", "_").replace("\\", "_")
     return str(pathlib.Path(BASE_DIR) / f"{safe_id}.json")
 
+def _pages_path(session_id: str) -> str:
+    safe_id = session_id.replace("/", "_").replace("\\", "_")
+    return str(pathlib.Path(BASE_DIR) / f"{safe_id}.pages.jsonl")
+
+def _split(ctx: t.Dict) -> t.Dict[str, t.Any]:
+    """Context document -> {record key: value}; pages are never part of it."""
+    records: t.Dict[str, t.Any] = {}
+    for key, value in ctx.items():
+        if key == "agents" and isinstance(value, dict):
+            for name, agent_value in value.items():
+                records[AGENT_PREFIX + name] = agent_value
+        elif key == "website" and isinstance(value, dict):
+            records[key] = {k: v for k, v in value.items() if k != "pages"}
+        else:
+            records[key] = value
+    return records
+
+# -------- Sections -------- #
+def load_section(session_id: str, key: str, default: t.Any = None) -> t.Any:
+    _ensure_migrated(session_id)
+    row = _conn().execute("SELECT value FROM sections WHERE session_id=? AND key=?", (session_id, key)).fetchone()
+    return json.loads(row[0]) if row else default
+
+def save_section(session_id: str, key: str, value: t.Any) -> None:
+    _conn().execute(
+        "INSERT INTO sections (session_id, key, value, updated_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (session_id, key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
+        (session_id, key, _dumps(value), time.time()),
+    )
+
+def load_agent(session_id: str, name: str) -> dict:
+    return load_section(session_id, AGENT_PREFIX + name, {}) or {}
+
+def merge_section(session_id: str, key: str, values: t.Dict) -> dict:
+    """Merges `values` into a dict section in one transaction, so concurrent writers do not lose updates."""
+    with _Tx() as conn:
+        row = conn.execute("SELECT value FROM sections WHERE session_id=? AND key=?", (session_id, key)).fetchone()
+        merged = {**(json.loads(row[0]) if row else {}), **values}
+        save_section(session_id, key, merged)
+    return merged
+
+def update_agent(session_id: str, name: str, values: t.Dict) -> dict:
+    """Merges `values` into one agent's record without touching any other record."""
+    return merge_section(session_id, AGENT_PREFIX + name, values)
+
+# -------- Pages -------- #
+class PageSink:
+    """
+    Writes crawled pages to the store as they arrive, in small batches. The
+    new page set replaces the session's previous pages only when the sink
+    closes without an error; until then readers keep seeing the old set.
+    """
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # Each sink stages under its own key, so two crawls of one session never mix pages.
+        base = f"{session_id}\x00staging"
+        self._staging = f"{base}\x00{int(time.time())}\x00{uuid.uuid4().hex}"
+        self._batch: t.List[tuple] = []
+        self._closed = False
+        self.count = 0
+        conn = _conn()
+        staged = conn.execute("SELECT DISTINCT session_id FROM pages WHERE session_id >= ? AND session_id < ?",
+                              (base, base + "\x01")).fetchall()
+        for (key,) in staged:
+            started = key[len(base) + 1:].split("\x00")[0]
+            if not started.isdigit() or time.time() - int(started) > _STALE_STAGING_SECONDS:
+                conn.execute("DELETE FROM pages WHERE session_id=?", (key,))
+
+    def write(self, page: t.Dict) -> None:
+        self._batch.append((self._staging, self.count, page.get("url", ""), _dumps(page)))
+        self.count += 1
+        if len(self._batch) >= _PAGE_BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch:
+            with _Tx() as conn:
+                conn.executemany("INSERT OR REPLACE INTO pages (session_id, seq, url, data) VALUES (?, ?, ?, ?)", self._batch)
+            self._batch = []
+
+    def close(self, commit: bool = True) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if commit:
+            self._flush()
+            with _Tx() as conn:
+                conn.execute("DELETE FROM pages WHERE session_id=?", (self.session_id,))
+                conn.execute("UPDATE pages SET session_id=? WHERE session_id=?", (self.session_id, self._staging))
+        else:
+            self._batch = []
+            _conn().execute("DELETE FROM pages WHERE session_id=?", (self._staging,))
+
+    def __enter__(self) -> "PageSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(commit=exc_type is None)
+
+def save_pages(session_id: str, pages: t.Iterable[t.Dict]) -> int:
+    with PageSink(session_id) as sink:
+        for page in pages:
+            sink.write(page)
+    return sink.count
+
+def iter_pages(session_id: str, limit: t.Optional[int] = None, without_html: bool = False) -> t.Iterator[dict]:
+    """Pages in crawl order; `without_html` skips the (large) html field inside SQLite."""
+    _ensure_migrated(session_id)
+    column = "json_remove(data, '$.html')" if without_html else "data"
+    sql = f"SELECT {column} FROM pages WHERE session_id=? ORDER BY seq"
+    params: tuple = (session_id,)
+    if limit is not None:
+        sql += " LIMIT ?"
+        params += (int(limit),)
+    for (data,) in _conn().execute(sql, params):
+        yield json.loads(data)
+
+def get_page(session_id: str, url: str) -> t.Optional[dict]:
+    _ensure_migrated(session_id)
+    row = _conn().execute("SELECT data FROM pages WHERE session_id=? AND url=?", (session_id, url)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def page_hashes(session_id: str) -> t.Dict[str, str]:
+    """url -> content_hash of the session's current pages (pages without one are left out)."""
+    _ensure_migrated(session_id)
+    rows = _conn().execute("SELECT url, json_extract(data, '$.content_hash') FROM pages WHERE session_id=?", (session_id,))
+    return {url: h for url, h in rows if h}
+
+def count_pages(session_id: str) -> int:
+    _ensure_migrated(session_id)
+    return _conn().execute("SELECT COUNT(*) FROM pages WHERE session_id=?", (session_id,)).fetchone()[0]
+
+# -------- Whole documents -------- #
 def save_context(session_id: str, ctx: t.Dict) -> None:
-    p = _path(session_id)
+    """
+    Replaces the session's sections with `ctx`. Pages, index and ledger
+    records are not written here (use PageSink / save_pages, save_section),
+    so saving a context loaded without them never drops them.
+    """
     try:
-        with open(p, "w", encoding="utf-8") as f:
-            json.dump(ctx, f, ensure_ascii=False, indent=2)
+        records = _split(ctx)
+        now = time.time()
+        with _Tx() as conn:
+            existing = {k for (k,) in conn.execute("SELECT key FROM sections WHERE session_id=?", (session_id,))}
+            stale = {k for k in existing - set(records) if not k.startswith(_DETACHED)}
+            conn.executemany("DELETE FROM sections WHERE session_id=? AND key=?", [(session_id, k) for k in stale])
+            conn.executemany(
+                "INSERT INTO sections (session_id, key, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id, key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
+                [(session_id, k, _dumps(v), now) for k, v in records.items()],
+            )
     except Exception as e:
-        print(f"Error saving context to {p}: {e}")
+        print(f"Error saving context for {session_id}: {e}")
 
-def load_context(session_id: str) -> t.Optional[dict]:
-    p = _path(session_id)
-    if not os.path.exists(p):
-        return None
+def load_context(session_id: str, include_pages: bool = False) -> t.Optional[dict]:
+    """
+    Assembles the session's context document. Pages are attached as
+    website["pages"] only when `include_pages` is set.
+    """
     try:
-        with open(p, "r", encoding="utf-8") as f:
-            return json.load(f)
+        _ensure_migrated(session_id)
+        rows = _conn().execute(
+            "SELECT key, value FROM sections WHERE session_id=? AND substr(key, 1, ?) != ? AND substr(key, 1, ?) != ?",
+            (session_id, len(INDEX_PREFIX), INDEX_PREFIX, len(LEDGER_PREFIX), LEDGER_PREFIX),
+        ).fetchall()
+        if not rows:
+            return None
+        ctx: t.Dict[str, t.Any] = {}
+        for key, value in rows:
+            if key.startswith(AGENT_PREFIX):
+                ctx.setdefault("agents", {})[key[len(AGENT_PREFIX):]] = json.loads(value)
+            else:
+                ctx[key] = json.loads(value)
+        if include_pages:
+            ctx.setdefault("website", {})["pages"] = list(iter_pages(session_id))
+        return ctx
     except Exception as e:
-        print(f"Error loading context from {p}: {e}")
-        return None
\ No newline at end of file
+        print(f"Error loading context for {session_id}: {e}")
+        return None
+
+# -------- Migration from JSON files -------- #
+def migrate_json_context(session_id: str) -> bool:
+    """Imports `<session>.json` (and its `.pages.jsonl`) into the store, then renames them `*.migrated`."""
+    p = _path(session_id)
+    if not os.path.exists(p):
+        return False
+    with open(p, "r", encoding="utf-8") as f:
+        ctx = json.load(f)
+    website = ctx.get("website") if isinstance(ctx.get("website"), dict) else {}
+    pages_file = _pages_path(session_id)
+    if os.path.exists(pages_file):
+        with open(pages_file, "r", encoding="utf-8") as f:
+            pages = [json.loads(line) for line in f if line.strip()]
+    else:
+        pages = website.get("pages") or []
+    website.pop("pages_file", None)
+    if website:
+        website.setdefault("page_count", len(pages))
+    save_pages(session_id, pages)
+    save_context(session_id, ctx)
+    for old in (p, pages_file):
+        if os.path.exists(old):
+            os.replace(old, f"{old}.migrated")
+    return True
+
+def _ensure_migrated(session_id: str) -> None:
+    if os.path.exists(_path(session_id)):
+        try:
+            migrate_json_context(session_id)
+        except Exception as e:
+            print(f"Error migrating context file {_path(session_id)}: {e}")
+
+def migrate_all(base_dir: str = BASE_DIR) -> t.List[str]:
+    migrated = []
+    for p in sorted(pathlib.Path(base_dir).glob("*.json")):
+        if migrate_json_context(p.stem):
+            migrated.append(p.stem)
+    return migrated
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        done = migrate_all()
+        print(f"Migrated {len(done)} context file(s) into {DB_PATH}")
+    else:
+        print("usage: python context_store.py migrate")
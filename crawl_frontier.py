@@ -0,0 +1,194 @@
+# crawl_frontier.py
+"""
+Per-host crawl frontier: one URL queue, token bucket and backoff state per
+host, so a slow or throttling origin only delays its own URLs while workers
+keep fetching from every other host.
+"""
+
+import asyncio, time
+from collections import deque
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Deque, Dict, Optional, Set, Tuple
+from yarl import URL
+
+THROTTLE_STATUSES = {429, 503}
+MAX_BACKOFF = 32.0
+MAX_RETRIES = 2
+
+def host_key(url: str) -> str:
+    """scheme://host[:port] – robots.txt and politeness are scoped per origin."""
+    try:
+        return str(URL(url).origin())
+    except Exception:
+        return ""
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+@dataclass
+class _HostState:
+    rate: float                      # requests/second before backoff
+    burst: float
+    tokens: float
+    updated: float
+    queue: Deque[str] = field(default_factory=deque)
+    in_flight: int = 0
+    backoff: float = 1.0             # divides the rate after 429/503
+    not_before: float = 0.0          # Retry-After / backoff pause
+    last_served: float = 0.0
+    requests: int = 0
+    throttled: int = 0
+
+    def effective_rate(self) -> float:
+        return self.rate / self.backoff
+
+    def refill(self, now: float):
+        # Backoff shrinks the burst too, so a recovering host is not hit in a spike.
+        cap = max(1.0, min(self.burst, self.effective_rate()))
+        self.tokens = min(cap, self.tokens + (now - self.updated) * self.effective_rate())
+        self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        """Earliest time a request may start, given tokens and any pause."""
+        self.refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.effective_rate()
+        return max(now + wait, self.not_before)
+
+class HostFrontier:
+    """
+    Async frontier shared by the crawl workers.
+
+    `get()` hands out the URL of the host that can be served soonest and
+    returns None once nothing is queued or in flight. Every URL obtained from
+    `get()` must be reported back through `done()`.
+    """
+    def __init__(self, rate_per_host: float = 4, max_in_flight_per_host: int = 2):
+        self.rate_per_host = max(float(rate_per_host), 0.01)
+        self.max_in_flight_per_host = max(1, max_in_flight_per_host)
+        self.hosts: Dict[str, _HostState] = {}
+        self.seen: Set[str] = set()
+        self.retries: Dict[str, int] = {}
+        self._queued = 0
+        self._in_flight = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+
+    def _host(self, key: str) -> _HostState:
+        state = self.hosts.get(key)
+        if state is None:
+            now = time.monotonic()
+            burst = max(1.0, self.rate_per_host)
+            state = _HostState(rate=self.rate_per_host, burst=burst, tokens=1.0, updated=now)
+            self.hosts[key] = state
+        return state
+
+    def size(self) -> int:
+        return self._queued
+
+    def put_nowait(self, url: str) -> bool:
+        if url in self.seen or self._closed:
+            return False
+        key = host_key(url)
+        if not key:
+            return False
+        self.seen.add(url)
+        self._host(key).queue.append(url)
+        self._queued += 1
+        return True
+
+    async def put(self, url: str) -> bool:
+        added = self.put_nowait(url)
+        if added:
+            async with self._cond:
+                self._cond.notify()
+        return added
+
+    def set_crawl_delay(self, url: str, delay: Optional[float]):
+        """Applies robots.txt Crawl-delay: at most one request every `delay` seconds."""
+        if not delay or delay <= 0:
+            return
+        state = self._host(host_key(url))
+        state.rate = min(state.rate, 1.0 / delay)
+        state.burst = 1.0
+        state.tokens = min(state.tokens, 1.0)
+
+    async def close(self):
+        async with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    async def get(self) -> Optional[Tuple[str, str]]:
+        async with self._cond:
+            while True:
+                if self._closed or (self._queued == 0 and self._in_flight == 0):
+                    self._cond.notify_all()
+                    return None
+                now = time.monotonic()
+                best: Optional[Tuple[float, float, str]] = None
+                for key, state in self.hosts.items():
+                    if not state.queue or state.in_flight >= self.max_in_flight_per_host:
+                        continue
+                    candidate = (state.ready_at(now), state.last_served, key)
+                    if best is None or candidate < best:
+                        best = candidate
+                if best is None:
+                    await self._cond.wait()
+                    continue
+                ready, _, key = best
+                if ready > now:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=ready - now)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                state = self.hosts[key]
+                state.tokens -= 1
+                state.in_flight += 1
+                state.last_served = now
+                state.requests += 1
+                self._queued -= 1
+                self._in_flight += 1
+                return key, state.queue.popleft()
+
+    async def done(self, key: str, url: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Releases an in-flight URL. 429/503 doubles the host's backoff, pauses it
+        for Retry-After (or the backed-off interval) and requeues the URL a
+        limited number of times; other responses slowly recover the rate.
+        """
+        async with self._cond:
+            state = self.hosts[key]
+            state.in_flight -= 1
+            self._in_flight -= 1
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES:
+                state.throttled += 1
+                state.backoff = min(MAX_BACKOFF, state.backoff * 2)
+                pause = retry_after if retry_after is not None else 1.0 / state.effective_rate()
+                state.not_before = max(state.not_before, now + pause)
+                attempts = self.retries.get(url, 0)
+                if attempts < MAX_RETRIES and not self._closed:
+                    self.retries[url] = attempts + 1
+                    state.queue.appendleft(url)
+                    self._queued += 1
+            elif status is not None and state.backoff > 1.0:
+                state.backoff = max(1.0, state.backoff * 0.75)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        return {
+            "hosts": len(self.hosts),
+            "requests": sum(s.requests for s in self.hosts.values()),
+            "throttled_responses": sum(s.throttled for s in self.hosts.values()),
+            "backed_off_hosts": sorted(k for k, s in self.hosts.items() if s.backoff > 1.0),
+        }
@@ -0,0 +1,272 @@
+# fingerprints.py
+"""
+Platform and SEO-plugin fingerprinting.
+
+FINGERPRINTS is a registry of (category, name, where, pattern, weight)
+entries: generator meta tags, script / asset URLs and markup markers are
+matched against the HTML, header and cookie markers against the response
+headers. All HTML patterns are compiled into one alternation regex (and the
+header patterns into another), so a page is scanned once however many
+fingerprints exist. Each distinct matched string is then attributed to its
+fingerprint once (named groups would make the scan an order of magnitude
+slower, as they defeat the regex engine's first-character prefilter). Only
+the start of the page (head, <html> attributes) and its end (footer scripts,
+badges) are scanned, which is where every marker lives.
+
+A page's confidence for a name combines the weights of its distinct matched
+fingerprints as independent evidence (1 - prod(1 - w)). SiteFingerprint
+aggregates pages: the winner is the name with the most summed confidence,
+and the site confidence is its average page confidence scaled by its share of
+all the evidence, so a few pages with a stray embed cannot outvote the rest.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PLATFORM = "platform"
+SEO_PLUGIN = "seo_plugin"
+UNKNOWN = "unknown"
+PAGE_MIN_CONFIDENCE = 0.5
+SITE_MIN_CONFIDENCE = 0.5
+HEAD_SCAN_CHARS = 64_000
+TAIL_SCAN_CHARS = 16_000
+
+_GENERATOR_META = r"""<meta\b(?=[^>]*\sname=["']?generator(?![\w.:-]))"""
+# What the scanner looks for in place of every _generator pattern: one branch
+# per generator tag instead of one per platform. The tag is then attributed.
+_GENERATOR_TAG = _GENERATOR_META + r"[^>]*>"
+
+def _generator(name: str) -> str:
+    """A whole <meta name="generator" content="...{name}..."> tag, attributes in either order."""
+    return _GENERATOR_META + rf"""[^>]*\scontent=["']?[^"'>]*{name}[^>]*>"""
+
+def _literal(text: str) -> str:
+    return re.escape(text.lower())
+
+# (category, name, "html" | "header", regex over lower-cased text, weight)
+FINGERPRINTS: List[Tuple[str, str, str, str, float]] = [
+    (PLATFORM, "WordPress", "html", _generator("wordpress"), 0.95),
+    (PLATFORM, "WordPress", "html", _literal("/wp-content/"), 0.9),
+    (PLATFORM, "WordPress", "html", _literal("/wp-includes/"), 0.9),
+    (PLATFORM, "WordPress", "html", _literal("/wp-json/"), 0.8),
+    (PLATFORM, "WordPress", "header", _literal("api.w.org"), 0.9),
+    (PLATFORM, "WordPress", "header", r"^x-pingback:", 0.7),
+    (PLATFORM, "WordPress", "header", r"^set-cookie: (?:wordpress_|wp-settings)", 0.8),
+    (PLATFORM, "Webflow", "html", _generator("webflow"), 0.95),
+    (PLATFORM, "Webflow", "html", _literal("data-wf-domain="), 0.95),
+    (PLATFORM, "Webflow", "html", _literal("data-wf-page="), 0.95),
+    (PLATFORM, "Webflow", "html", _literal("w-webflow-badge"), 0.9),
+    (PLATFORM, "Webflow", "html", r"assets\.website-files\.com|cdn\.prod\.website-files\.com", 0.85),
+    (PLATFORM, "Webflow", "html", _literal("webflow.io"), 0.5),
+    (PLATFORM, "Shopify", "html", _literal("shopify.theme"), 0.95),
+    (PLATFORM, "Shopify", "html", _literal("cdn.shopify.com"), 0.9),
+    (PLATFORM, "Shopify", "html", _literal(".myshopify.com"), 0.6),
+    (PLATFORM, "Shopify", "header", r"^(?:x-shopid|x-shopify-stage|x-sorting-hat-shopid):", 0.95),
+    (PLATFORM, "Shopify", "header", r"^powered-by: shopify", 0.95),
+    (PLATFORM, "Shopify", "header", r"^set-cookie: _shopify_", 0.9),
+    (PLATFORM, "Wix", "html", _literal('"@wix/thunderbolt"'), 0.95),
+    (PLATFORM, "Wix", "html", _generator("wix\\.com"), 0.95),
+    (PLATFORM, "Wix", "html", r"static\.wixstatic\.com|static\.parastorage\.com", 0.85),
+    (PLATFORM, "Wix", "header", r"^x-wix-request-id:", 0.95),
+    (PLATFORM, "Squarespace", "html", _literal("static.squarespace_context"), 0.95),
+    (PLATFORM, "Squarespace", "html", r"static1?\.squarespace\.com", 0.9),
+    (PLATFORM, "Squarespace", "header", r"^server: squarespace", 0.95),
+    (PLATFORM, "Drupal", "html", _generator("drupal"), 0.95),
+    (PLATFORM, "Drupal", "html", r"drupal-settings-json|drupal\.settings", 0.9),
+    (PLATFORM, "Drupal", "html", _literal("/sites/default/files/"), 0.7),
+    (PLATFORM, "Drupal", "header", r"^(?:x-drupal-cache|x-drupal-dynamic-cache):|^x-generator: drupal", 0.95),
+    (PLATFORM, "Joomla", "html", _generator("joomla"), 0.95),
+    (PLATFORM, "Joomla", "html", _literal("/media/jui/"), 0.7),
+    (PLATFORM, "Ghost", "html", _generator("ghost"), 0.95),
+    (PLATFORM, "Ghost", "html", _literal("/ghost/api/"), 0.8),
+    (PLATFORM, "Ghost", "header", r"^x-ghost-cache-status:", 0.9),
+    (PLATFORM, "HubSpot", "html", _generator("hubspot"), 0.95),
+    (PLATFORM, "HubSpot", "html", _literal("hs-sites.com"), 0.6),
+    (PLATFORM, "HubSpot", "header", r"^x-hs-hub-id:", 0.6),
+    (PLATFORM, "Magento", "html", _literal("data-mage-init"), 0.9),
+    (PLATFORM, "Magento", "html", _literal("mage/cookies"), 0.8),
+    (PLATFORM, "Magento", "header", r"^set-cookie: mage-", 0.9),
+    (PLATFORM, "BigCommerce", "html", r"cdn\d*\.bigcommerce\.com", 0.9),
+    (PLATFORM, "PrestaShop", "html", _generator("prestashop"), 0.95),
+    (PLATFORM, "PrestaShop", "html", _literal("var prestashop"), 0.9),
+    (PLATFORM, "Framer", "html", _generator("framer"), 0.95),
+    (PLATFORM, "Framer", "html", _literal("framerusercontent.com"), 0.85),
+    (PLATFORM, "Weebly", "html", _literal("editmysite.com"), 0.9),
+    (PLATFORM, "Duda", "html", _literal("irp.cdn-website.com"), 0.85),
+    (PLATFORM, "Next.js", "html", _literal('id="__next_data__"'), 0.8),
+    (PLATFORM, "Next.js", "header", r"^x-powered-by: next\.js", 0.9),
+    (PLATFORM, "Gatsby", "html", _generator("gatsby"), 0.95),
+    (PLATFORM, "Gatsby", "html", _literal('id="___gatsby"'), 0.9),
+    (PLATFORM, "Hugo", "html", _generator("hugo"), 0.95),
+    (PLATFORM, "Jekyll", "html", _generator("jekyll"), 0.95),
+    (SEO_PLUGIN, "Yoast SEO", "html", r"optimized with the yoast seo|yoast-schema-graph", 0.95),
+    (SEO_PLUGIN, "Rank Math", "html", r"search engine optimization by rank math|rank-math-schema", 0.95),
+    (SEO_PLUGIN, "All in One SEO", "html", r"<!-- all in one seo|aioseo-", 0.9),
+    (SEO_PLUGIN, "SEOPress", "html", _literal("seopress"), 0.8),
+    (SEO_PLUGIN, "The SEO Framework", "html", _literal("the seo framework"), 0.9),
+    (SEO_PLUGIN, "Squirrly SEO", "html", _literal("squirrly seo"), 0.9),
+    (SEO_PLUGIN, "Smart SEO", "html", _literal("smart-seo"), 0.6),
+    (SEO_PLUGIN, "Plug in SEO", "html", _literal("pluginseo"), 0.7),
+]
+
+_SPECIAL = set(".^$*+?{}[]|()\\")
+
+def _branches(pattern: str) -> List[str]:
+    """Top-level alternatives of a regex."""
+    parts, depth, in_class, start, i = [], 0, False, 0, 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and depth == 0:
+            parts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    return parts + [pattern[start:]]
+
+def _literal_prefix(branch: str) -> Tuple[str, str]:
+    """(literal characters the branch must start with, regex for the rest)."""
+    chars, i = [], 0
+    while i < len(branch):
+        c = branch[i]
+        if c == "\\" and i + 1 < len(branch) and not branch[i + 1].isalnum():
+            literal, step = branch[i + 1], 2
+        elif c not in _SPECIAL:
+            literal, step = c, 1
+        else:
+            break
+        if i + step < len(branch) and branch[i + step] in "*+?{":
+            break  # a quantified character is not a fixed prefix
+        chars.append(literal)
+        i += step
+    return "".join(chars), branch[i:]
+
+def _trie_regex(branches: List[str]) -> str:
+    """
+    One regex for all branches with their literal prefixes merged into a trie,
+    so at each position the engine follows one path instead of trying every
+    branch in turn.
+    """
+    trie: Dict = {}
+    for branch in branches:
+        prefix, rest = _literal_prefix(branch)
+        node = trie
+        for c in prefix:
+            node = node.setdefault(c, {})
+        node.setdefault(None, []).append(rest)
+
+    def render(node: Dict) -> str:
+        parts = [re.escape(c) + render(child) for c, child in node.items() if c is not None]
+        # Tails go last, so longer literal paths win at the same position.
+        parts += [rest for rest in node.get(None, [])]
+        if len(parts) == 1:
+            return parts[0]
+        return "(?:" + "|".join(parts) + ")"
+
+    return render(trie)
+
+def _compile(where: str) -> Tuple[re.Pattern, List[Tuple[int, re.Pattern]]]:
+    """The combined scanner for one source, and each fingerprint's own pattern for attributing matches."""
+    ids = [i for i, fp in enumerate(FINGERPRINTS) if fp[2] == where]
+    scan = [_GENERATOR_TAG if FINGERPRINTS[i][3].startswith(_GENERATOR_META) else FINGERPRINTS[i][3] for i in ids]
+    combined = re.compile(_trie_regex([b for pattern in dict.fromkeys(scan) for b in _branches(pattern)]), re.M)
+    return combined, [(i, re.compile(FINGERPRINTS[i][3], re.M)) for i in ids]
+
+_HTML = _compile("html")
+_HEADERS = _compile("header")
+
+def _header_text(headers: Optional[Dict[str, str]]) -> str:
+    """Lower-cased "name: value" lines; set-cookie values come one per line."""
+    lines = []
+    for name, value in (headers or {}).items():
+        for part in str(value).split("\n"):
+            lines.append(f"{name.lower()}: {part.lower()}")
+    return "\n".join(lines)
+
+def _scan_text(html: str) -> str:
+    if len(html) > HEAD_SCAN_CHARS + TAIL_SCAN_CHARS:
+        html = html[:HEAD_SCAN_CHARS] + "\n" + html[-TAIL_SCAN_CHARS:]
+    return html.lower()
+
+def _matched(scanner: Tuple[re.Pattern, List[Tuple[int, re.Pattern]]], text: str) -> set:
+    combined, parts = scanner
+    found, attributed = set(), {}
+    for m in combined.finditer(text):
+        s = m.group()
+        if s not in attributed:
+            # The alternation took the first branch matching here, which is the first one matching the whole string.
+            attributed[s] = next((i for i, part in parts if part.fullmatch(s)), None)
+            if attributed[s] is not None:
+                found.add(attributed[s])
+    return found
+
+def detect(html: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Tuple[str, float]]:
+    """
+    {category: (name, confidence)} for one page; name is "unknown" below
+    PAGE_MIN_CONFIDENCE. Each distinct fingerprint counts once per page.
+    """
+    matched = _matched(_HTML, _scan_text(html or "")) | _matched(_HEADERS, _header_text(headers))
+    misses: Dict[Tuple[str, str], float] = defaultdict(lambda: 1.0)
+    for i in matched:
+        category, name, _, _, weight = FINGERPRINTS[i]
+        misses[(category, name)] *= 1.0 - weight
+    result = {PLATFORM: (UNKNOWN, 0.0), SEO_PLUGIN: (UNKNOWN, 0.0)}
+    for (category, name), miss in misses.items():
+        confidence = round(1.0 - miss, 4)
+        if confidence >= PAGE_MIN_CONFIDENCE and confidence > result[category][1]:
+            result[category] = (name, confidence)
+    return result
+
+class SiteFingerprint:
+    """Aggregates per-page detections (page["platform"], page["platform_confidence"], page["seo_plugin"])."""
+    def __init__(self):
+        self.pages = 0
+        self.scores: Dict[str, Dict[str, float]] = {PLATFORM: defaultdict(float), SEO_PLUGIN: defaultdict(float)}
+        self.hits: Dict[str, Dict[str, int]] = {PLATFORM: defaultdict(int), SEO_PLUGIN: defaultdict(int)}
+
+    def add(self, page: Dict) -> None:
+        self.pages += 1
+        for category, confidence_key in ((PLATFORM, "platform_confidence"), (SEO_PLUGIN, "seo_plugin_confidence")):
+            name = page.get(category) or UNKNOWN
+            if name != UNKNOWN:
+                # Pages extracted before confidences existed count as certain.
+                self.scores[category][name] += float(page.get(confidence_key, 1.0))
+                self.hits[category][name] += 1
+
+    def best(self, category: str = PLATFORM) -> Tuple[str, float]:
+        scores = self.scores[category]
+        if not scores:
+            return UNKNOWN, 0.0
+        name = max(scores, key=scores.get)
+        confidence = round((scores[name] / self.hits[category][name]) * (scores[name] / sum(scores.values())), 3)
+        return (name, confidence) if confidence >= SITE_MIN_CONFIDENCE else (UNKNOWN, confidence)
+
+    def candidates(self, category: str = PLATFORM, limit: int = 3) -> List[Dict]:
+        scores = self.scores[category]
+        return [{"name": name, "pages": self.hits[category][name], "score": round(score, 2)}
+                for name, score in sorted(scores.items(), key=lambda kv: -kv[1])[:limit]]
+
+    def summary(self) -> Dict:
+        platform, platform_confidence = self.best(PLATFORM)
+        plugin, plugin_confidence = self.best(SEO_PLUGIN)
+        return {
+            "platform": platform, "platform_confidence": platform_confidence,
+            "seo_plugin": plugin, "seo_plugin_confidence": plugin_confidence,
+            "platform_candidates": self.candidates(PLATFORM),
+        }
+
+def site_fingerprint(pages: Iterable[Dict]) -> Dict:
+    site = SiteFingerprint()
+    for page in pages:
+        site.add(page)
+    return site.summary()
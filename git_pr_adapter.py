@@ -1,16 +1,191 @@
-
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, List, Tuple, Optional
+import html as html_lib, json, os, re, shutil, subprocess, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from cms_base import CMSClient
 
+# Where a URL path's source file is looked for when the route map has no entry.
+DEFAULT_CANDIDATES = ("{path}.html", "{path}/index.html", "{path}.htm", "{path}/index.htm")
+_HEAD = re.compile(r"<head\b[^>]*>", re.I)
+_HEAD_END = re.compile(r"</head\s*>", re.I)
+_TITLE = re.compile(r"<title\b[^>]*>.*?</title\s*>", re.I | re.S)
+_META_DESCRIPTION = re.compile(r"<meta\b[^>]*\bname\s*=\s*[\"']description[\"'][^>]*>", re.I)
+_CANONICAL = re.compile(r"<link\b[^>]*\brel\s*=\s*[\"']canonical[\"'][^>]*>", re.I)
+
+def _set_tag(doc: str, pattern: re.Pattern, tag: str) -> str:
+    """Replaces the first tag matching `pattern`, or adds `tag` at the top of <head>."""
+    if pattern.search(doc):
+        return pattern.sub(lambda _: tag, doc, count=1)
+    head = _HEAD.search(doc)
+    if head:
+        return doc[:head.end()] + "\n" + tag + doc[head.end():]
+    return tag + "\n" + doc
+
+def _relative_path(value: str, name: str) -> str:
+    """`value` as a repository-relative path; absolute paths and ".." are rejected."""
+    path = (value or "").replace("\\", "/").strip("/")
+    if os.path.isabs(value or "") or any(part == ".." for part in path.split("/")):
+        raise ValueError(f"git {name} must be a path inside the repository, got {value!r}.")
+    return path
+
+def _inside(worktree: str, path: str) -> str:
+    """The real path of `path` in the worktree; raises if it resolves outside it (e.g. through a symlink)."""
+    root = os.path.realpath(worktree)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"{path} resolves outside the repository.")
+    return full
+
+def _add_to_head(doc: str, snippet: str) -> str:
+    if snippet in doc:
+        return doc
+    end = _HEAD_END.search(doc)
+    return doc[:end.start()] + snippet + "\n" + doc[end.start():] if end else snippet + "\n" + doc
+
 class GitPRAdapter(CMSClient):
-    """Requires creds: { repo_url, token, provider: 'github'|'gitlab'|'bitbucket' }"""
+    """
+    Requires creds: { repo_path } (a local clone or bare repository).
+    Optional: base (default HEAD), branch, route_map ({url path or prefix*: file
+    or template with {path} / {slug}}), site_root (folder the site is served
+    from), posts_dir, redirects_file, author_name, author_email.
+
+    Operations only record edits. finalize() checks the base out into a
+    temporary worktree, applies every file's edits in parallel and makes one
+    commit on the branch; the repository's own checkout is never touched.
+    Every run starts a new branch from base, so operations applied on an
+    earlier run's branch are not skipped (see CMSExecutor.completed).
+    """
+    RESUMABLE = False
+
     def __init__(self, creds: Dict[str, Any]):
-        self.creds = creds
+        self.creds = creds or {}
+        self.repo = self.creds.get("repo_path") or ""
+        if not self.repo or not os.path.isdir(self.repo):
+            raise ValueError("Missing git creds: need repo_path (a local repository or bare repository).")
+        self.base = self.creds.get("base") or "HEAD"
+        self.branch = self.creds.get("branch") or f"fieldnote/seo-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.route_map: Dict[str, str] = self.creds.get("route_map") or {}
+        self.site_root = _relative_path(self.creds.get("site_root") or "", "site_root")
+        self.posts_dir = _relative_path(self.creds.get("posts_dir") or "blog", "posts_dir")
+        self.redirects_file = _relative_path(self.creds.get("redirects_file") or "_redirects", "redirects_file")
+        self._lock = threading.Lock()
+        self._files: Optional[set] = None
+        self._edits: Dict[str, List[Callable[[str], str]]] = {}
+        self._new_files: Dict[str, str] = {}
+        self._redirects: List[Tuple[str, str, int]] = []
+
+    def _git(self, *args: str, cwd: Optional[str] = None) -> str:
+        result = subprocess.run(["git", *args], cwd=cwd or self.repo, capture_output=True, text=True)
+        if result.returncode != 0:
+            command = next((a for i, a in enumerate(args) if a != "-c" and (i == 0 or args[i - 1] != "-c")), "")
+            raise RuntimeError(f"git {command} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    def _file_index(self) -> set:
+        """Every file of the base revision, listed once per run (works on bare repositories)."""
+        with self._lock:
+            if self._files is None:
+                self._files = set(self._git("ls-tree", "-r", "--name-only", self.base).splitlines())
+            return self._files
+
+    def _prefixed(self, path: str) -> str:
+        return f"{self.site_root}/{path}" if self.site_root else path
+
+    def _source_file(self, page_id_or_path: str) -> Optional[str]:
+        path = urlparse(page_id_or_path).path if "://" in page_id_or_path else page_id_or_path
+        path = "/" + path.strip("/")
+        slug = path.rsplit("/", 1)[-1]
+        files = self._file_index()
+        candidates = []
+        if path in self.route_map:
+            candidates.append(self.route_map[path])
+        for prefix, template in self.route_map.items():
+            if prefix.endswith("*") and path.startswith(prefix[:-1]):
+                candidates.append(template.format(path=path.strip("/"), slug=slug))
+        if path == "/":
+            candidates.append(self._prefixed("index.html"))
+        candidates += [self._prefixed(c.format(path=path.strip("/"))) for c in DEFAULT_CANDIDATES]
+        return next((c.lstrip("/") for c in candidates if c.lstrip("/") in files), None)
+
+    def _stage_edit(self, page_id_or_path: str, edit: Callable[[str], str], kind: str) -> Dict[str, Any]:
+        source = self._source_file(page_id_or_path)
+        if source is None:
+            return {"ok": False, "message": f"no source file found for {page_id_or_path}; add it to route_map"}
+        with self._lock:
+            self._edits.setdefault(source, []).append(edit)
+        return {"ok": True, "staged": True, "message": f"{kind} staged for {source}"}
+
     def update_page_meta(self, page_id_or_path: str, title: Optional[str]=None, description: Optional[str]=None, canonical: Optional[str]=None):
-        return {"ok": True, "message": "Would open PR modifying head tags in file."}
+        def edit(doc: str) -> str:
+            if title: doc = _set_tag(doc, _TITLE, f"<title>{html_lib.escape(title, quote=False)}</title>")
+            if description: doc = _set_tag(doc, _META_DESCRIPTION, f'<meta name="description" content="{html_lib.escape(description)}">')
+            if canonical: doc = _set_tag(doc, _CANONICAL, f'<link rel="canonical" href="{html_lib.escape(canonical)}">')
+            return doc
+        return self._stage_edit(page_id_or_path, edit, "Head tags")
+
     def inject_json_ld(self, page_id_or_path: str, json_ld: Dict[str, Any]):
-        return {"ok": True, "message": "Would open PR injecting JSON-LD script tag."}
+        script = f'<script type="application/ld+json">{json.dumps(json_ld, ensure_ascii=False)}</script>'
+        return self._stage_edit(page_id_or_path, lambda doc: _add_to_head(doc, script), "JSON-LD")
+
     def create_post(self, collection_or_path: str, title: str, html: str, slug: Optional[str]=None, date: Optional[str]=None, meta: Optional[Dict[str, Any]]=None):
-        return {"ok": True, "message": "Would open PR adding new blog file."}
+        path = self._prefixed(f"{self.posts_dir}/{re.sub(r'[^A-Za-z0-9_-]', '-', slug or 'post')}.html")
+        doc = (f"<!doctype html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{html_lib.escape(title, quote=False)}</title>\n</head>\n"
+               f"<body>\n<article>\n{html}\n</article>\n</body>\n</html>\n")
+        with self._lock:
+            self._new_files[path] = doc
+        return {"ok": True, "staged": True, "message": f"New post staged as {path}"}
+
     def set_redirects(self, redirects: List[Tuple[str, str, int]]):
-        return {"ok": True, "message": "Would open PR updating redirects config."}
+        with self._lock:
+            self._redirects.extend(redirects)
+        return {"ok": True, "staged": True, "message": f"{len(redirects)} redirect(s) staged for {self.redirects_file}"}
+
+    def _apply(self, worktree: str, path: str, edits: List[Callable[[str], str]]) -> bool:
+        full = _inside(worktree, path)
+        with open(full, "r", encoding="utf-8", errors="surrogateescape") as f:
+            original = f.read()
+        doc = original
+        for edit in edits:
+            doc = edit(doc)
+        if doc == original:
+            return False
+        with open(full, "w", encoding="utf-8", errors="surrogateescape") as f:
+            f.write(doc)
+        return True
+
+    def finalize(self) -> Dict[str, Any]:
+        if not (self._edits or self._new_files or self._redirects):
+            return {"ok": True, "message": "No changes to commit."}
+        worktree = tempfile.mkdtemp(prefix="fieldnote-worktree-")
+        created = committed = False
+        try:
+            self._git("worktree", "add", "--quiet", "-b", self.branch, worktree, self.base)
+            created = True
+            with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 2) * 2)) as pool:
+                changed = sum(pool.map(lambda item: self._apply(worktree, *item), self._edits.items()))
+            for path, doc in self._new_files.items():
+                full = _inside(worktree, path)
+                os.makedirs(os.path.dirname(full), exist_ok=True)
+                with open(full, "w", encoding="utf-8") as f:
+                    f.write(doc)
+            if self._redirects:
+                with open(_inside(worktree, self.redirects_file), "a", encoding="utf-8") as f:
+                    f.writelines(f"{a} {b} {c}\n" for a, b, c in self._redirects)
+            self._git("add", "--all", cwd=worktree)
+            if not self._git("status", "--porcelain", cwd=worktree).strip():
+                return {"ok": True, "message": "Every change was already in the repository."}
+            author = ["-c", f"user.name={self.creds.get('author_name') or 'FieldNote'}",
+                      "-c", f"user.email={self.creds.get('author_email') or 'fieldnote@localhost'}"]
+            message = (f"SEO updates from FieldNote\n\n{changed} page(s) edited, {len(self._new_files)} post(s) added, "
+                       f"{len(self._redirects)} redirect(s).")
+            self._git(*author, "commit", "--quiet", "-m", message, cwd=worktree)
+            commit = self._git("rev-parse", "HEAD", cwd=worktree).strip()
+            committed = True
+            return {"ok": True, "branch": self.branch, "commit": commit, "files": changed + len(self._new_files) + bool(self._redirects),
+                    "message": f"Committed to branch {self.branch} ({commit[:10]})"}
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=self.repo, capture_output=True)
+            shutil.rmtree(worktree, ignore_errors=True)
+            if created and not committed:
+                # Nothing was committed on the branch (no changes, or the commit failed): don't leave it behind.
+                subprocess.run(["git", "branch", "-D", self.branch], cwd=self.repo, capture_output=True)
@@ -0,0 +1,177 @@
+# http_cache.py
+"""
+Persistent HTTP cache for re-crawls.
+
+Entries are keyed by normalized URL and keep the response validators, the
+body and the parsed page, so a re-crawl can send If-None-Match /
+If-Modified-Since and reuse the stored page on 304, or skip a URL entirely
+when the sitemap's <lastmod> is older than the cached copy. After each
+crawl, entries not fetched or revalidated for HTTP_CACHE_MAX_AGE_DAYS are
+pruned, then the least recently refreshed ones until the cache fits in
+HTTP_CACHE_MAX_MB.
+"""
+
+import gzip, hashlib, json, os, pathlib, time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from yarl import URL
+from context_store import BASE_DIR
+from page_extract import PAGE_SCHEMA_VERSION
+
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR") or str(pathlib.Path(BASE_DIR) / "http_cache")
+
+# Temporary files older than this were left by an interrupted write.
+_STALE_TMP_SECONDS = 3600
+
+def http_cache_enabled() -> bool:
+    return os.environ.get("CRAWL_HTTP_CACHE", "true").strip().lower() not in {"0", "false", "no", "off"}
+
+def _max_age() -> float:
+    try:
+        return float(os.environ.get("HTTP_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+    except ValueError:
+        return 30 * 24 * 3600.0
+
+def _max_bytes() -> int:
+    try:
+        return int(float(os.environ.get("HTTP_CACHE_MAX_MB", "500")) * 1024 * 1024)
+    except ValueError:
+        return 500 * 1024 * 1024
+
+def cache_key(url: str) -> str:
+    """Lower-cased scheme/host, no default port, no fragment, sorted query."""
+    try:
+        u = URL(url).with_fragment(None)
+        if u.is_default_port():
+            u = u.with_port(None)
+        if u.query_string:
+            u = u.with_query(sorted(u.query.items()))
+        if not u.path:
+            u = u.with_path("/")
+        return str(u)
+    except Exception:
+        return url
+
+def parse_lastmod(value: Optional[str]) -> Optional[float]:
+    """W3C datetime from a sitemap <lastmod> to epoch seconds (dates are read as UTC)."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+class HttpCache:
+    def __init__(self, directory: str = CACHE_DIR):
+        self.dir = pathlib.Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.stats = {"revalidated": 0, "lastmod_skips": 0, "misses": 0, "pruned": 0}
+
+    def _path(self, url: str) -> pathlib.Path:
+        digest = hashlib.sha256(cache_key(url).encode("utf-8")).hexdigest()
+        return self.dir / digest[:2] / f"{digest}.json.gz"
+
+    def get(self, url: str) -> Optional[dict]:
+        p = self._path(url)
+        if not p.exists():
+            return None
+        try:
+            with gzip.open(p, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error reading HTTP cache entry {p}: {e}")
+            return None
+
+    def _write(self, url: str, entry: dict) -> None:
+        p = self._path(url)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f"{p.name}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, p)
+        except Exception as e:
+            print(f"Error writing HTTP cache entry {p}: {e}")
+            tmp.unlink(missing_ok=True)
+
+    def put(self, url: str, final_url: str, body: str, headers: Dict[str, str], page: Optional[dict] = None) -> None:
+        """`headers` must use lower-cased names."""
+        self._write(url, {
+            "url": url,
+            "final_url": final_url or url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "fetched_at": time.time(),
+            "body": body,
+            "page": page,
+            "page_version": PAGE_SCHEMA_VERSION if page is not None else None,
+        })
+
+    def refresh(self, url: str, entry: dict, headers: Dict[str, str], page: Optional[dict] = None) -> None:
+        """Records a 304: the stored body is current as of now."""
+        entry = dict(entry, fetched_at=time.time())
+        entry["etag"] = headers.get("etag") or entry.get("etag")
+        entry["last_modified"] = headers.get("last-modified") or entry.get("last_modified")
+        if page is not None:
+            entry["page"], entry["page_version"] = page, PAGE_SCHEMA_VERSION
+        self._write(url, entry)
+
+    def prune(self) -> int:
+        """
+        Drops entries written (fetched or revalidated) longer than the max age
+        ago, then the oldest ones down to 90% of the size cap. Returns how many
+        entries were removed.
+        """
+        now = time.time()
+        entries, removed = [], 0
+        for p in self.dir.glob("*/*"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if p.name.endswith(".tmp"):
+                if now - st.st_mtime > _STALE_TMP_SECONDS:
+                    p.unlink(missing_ok=True)
+            elif now - st.st_mtime > _max_age():
+                p.unlink(missing_ok=True)
+                removed += 1
+            else:
+                entries.append((st.st_mtime, st.st_size, p))
+        total, limit = sum(size for _, size, _ in entries), _max_bytes()
+        if total > limit:
+            target = int(limit * 0.9)
+            for _, size, p in sorted(entries, key=lambda e: e[0]):
+                if total <= target:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        self.stats["pruned"] += removed
+        return removed
+
+    @staticmethod
+    def validators(entry: Optional[dict]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def page(entry: Optional[dict]) -> Optional[dict]:
+        """The stored parsed page, unless it was produced by an older extractor."""
+        if entry and entry.get("page") and entry.get("page_version") == PAGE_SCHEMA_VERSION:
+            return entry["page"]
+        return None
+
+    def unchanged_page(self, entry: Optional[dict], lastmod: Optional[str]) -> Optional[dict]:
+        """The stored page when the sitemap says the URL has not changed since it was cached."""
+        modified = parse_lastmod(lastmod)
+        if entry is None or modified is None or modified > entry.get("fetched_at", 0):
+            return None
+        return self.page(entry)
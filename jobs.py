@@ -0,0 +1,111 @@
+# jobs.py
+"""
+In-process background jobs for long orchestrator turns.
+
+A job runs on the server's event loop and records every progress message
+as a numbered event; any number of clients can follow it with `events()`
+(served as Server-Sent Events by api_server) and resume from the last event
+id they saw. Jobs for the same session run one at a time, in order.
+
+Job state lives in this process's memory, so jobs need a long-running
+server: on serverless deployments (Vercel) a follow-up request can reach
+another instance that does not know the job, and work left running after a
+response is frozen. JOBS_ENABLED is therefore off there (and with
+BACKGROUND_JOBS=0); the job endpoints refuse with 503 and the dashboard falls
+back to the blocking /chat and /execute endpoints.
+"""
+
+import asyncio, os, time, uuid, weakref
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", "3600"))
+JOBS_ENABLED = os.environ.get("BACKGROUND_JOBS", "0" if os.environ.get("VERCEL") == "1" else "1") != "0"
+
+@dataclass
+class Job:
+    id: str
+    session_id: str
+    kind: str
+    status: str = "queued"            # queued | running | done | error
+    events: List[dict] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def emit(self, message: dict) -> None:
+        """Records one progress message; safe to call from the loop thread only."""
+        self.events.append({"id": len(self.events) + 1, **message})
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id, "session_id": self.session_id, "kind": self.kind, "status": self.status,
+            "events": len(self.events), "created_at": self.created_at, "finished_at": self.finished_at, "error": self.error,
+        }
+
+    async def events_after(self, after: int = 0, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+        """
+        Yields events with id > `after` as they are emitted, until the job
+        finishes. Yields None every `heartbeat` seconds of silence so the
+        caller can keep the connection alive.
+        """
+        while True:
+            changed = self._changed
+            while after < len(self.events):
+                after += 1
+                yield self.events[after - 1]
+            if self.finished:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+_jobs: Dict[str, Job] = {}
+# A session's lock lives only as long as a job of that session holds it.
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+_tasks: set = set()
+
+def get_job(job_id: str) -> Optional[Job]:
+    return _jobs.get(job_id)
+
+def _prune() -> None:
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id in [j.id for j in _jobs.values() if j.finished and (j.finished_at or 0) < cutoff]:
+        del _jobs[job_id]
+
+def start_job(session_id: str, kind: str, run: Callable[[Callable[[dict], None]], Awaitable[object]]) -> Job:
+    """
+    Schedules `run(emit)` on the running loop and returns its Job at once.
+    `run` reports progress by calling `emit(message)`.
+    """
+    _prune()
+    job = Job(id=uuid.uuid4().hex[:12], session_id=session_id, kind=kind)
+    _jobs[job.id] = job
+    lock = _session_locks.setdefault(session_id, asyncio.Lock())
+
+    async def runner():
+        async with lock:
+            job.status = "running"
+            try:
+                await run(job.emit)
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e)
+                job.emit({"agent": "orchestrator", "text": f"The job failed: {e}", "status": "error"})
+                job.status = "error"
+            finally:
+                job.finished_at = time.time()
+                job.emit({"type": "end", "status": job.status})
+
+    task = asyncio.get_running_loop().create_task(runner())
+    _tasks.add(task)  # keep a reference until it finishes
+    task.add_done_callback(_tasks.discard)
+    return job
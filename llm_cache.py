@@ -0,0 +1,141 @@
+# llm_cache.py
+"""
+Persistent LLM response cache.
+
+Responses are keyed by model name plus a hash of the whitespace-normalized
+prompt, so re-running an analysis of an unchanged site reuses earlier
+answers instead of spending quota. Entries expire after LLM_CACHE_TTL_SECONDS
+and the least recently used ones are evicted once the cache grows past
+LLM_CACHE_MAX_MB. Set LLM_CACHE=0 to bypass it.
+"""
+
+import hashlib, os, pathlib, sqlite3, threading, time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from context_store import BASE_DIR
+
+DB_PATH = os.environ.get("LLM_CACHE_PATH") or str(pathlib.Path(BASE_DIR) / "llm_cache.sqlite3")
+
+_local = threading.local()
+_lock = threading.Lock()
+stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+@dataclass
+class CachedResponse:
+    """Stands in for a generate_content() response; callers only read `.text`."""
+    text: str
+    model: str
+    cached: bool = True
+
+def llm_cache_enabled() -> bool:
+    return os.environ.get("LLM_CACHE", "true").strip().lower() not in {"0", "false", "no", "off"}
+
+def _ttl() -> float:
+    try:
+        return float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    except ValueError:
+        return 7 * 24 * 3600.0
+
+def _max_bytes() -> int:
+    try:
+        return int(float(os.environ.get("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)
+    except ValueError:
+        return 200 * 1024 * 1024
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # INSERT OR REPLACE only fires the delete trigger below with this on.
+        conn.execute("PRAGMA recursive_triggers=ON")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, model TEXT NOT NULL, text TEXT NOT NULL,
+                size INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_age ON responses (created_at)")
+            # Running total of `size`, so eviction never has to sum the table.
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) SELECT 'total_size', COALESCE(SUM(size), 0) FROM responses")
+            conn.execute("""CREATE TRIGGER IF NOT EXISTS responses_added AFTER INSERT ON responses BEGIN
+                UPDATE meta SET value = value + NEW.size WHERE name = 'total_size'; END""")
+            conn.execute("""CREATE TRIGGER IF NOT EXISTS responses_removed AFTER DELETE ON responses BEGIN
+                UPDATE meta SET value = value - OLD.size WHERE name = 'total_size'; END""")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _local.conn = conn
+    return conn
+
+def cache_key(model: str, prompt: str) -> str:
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+def _count(name: str) -> None:
+    with _lock:
+        stats[name] += 1
+
+def get(models: Iterable[str], prompt: str) -> Optional[CachedResponse]:
+    """First fresh entry for any of `models`, in order."""
+    try:
+        conn = _conn()
+        now = time.time()
+        for model in models:
+            key = cache_key(model, prompt)
+            row = conn.execute("SELECT text, created_at FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None:
+                continue
+            if now - row[1] > _ttl():
+                conn.execute("DELETE FROM responses WHERE key=?", (key,))
+                continue
+            conn.execute("UPDATE responses SET last_used=? WHERE key=?", (now, key))
+            _count("hits")
+            return CachedResponse(text=row[0], model=model)
+    except Exception as e:
+        print(f"Error reading LLM cache: {e}")
+    _count("misses")
+    return None
+
+def put(model: str, prompt: str, text: str) -> None:
+    if not text:
+        return
+    try:
+        conn = _conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, text, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (cache_key(model, prompt), model, text, len(text.encode("utf-8")), now, now),
+        )
+        _count("stores")
+        _evict(conn)
+    except Exception as e:
+        print(f"Error writing LLM cache: {e}")
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """Drops expired entries, then least recently used ones down to 90% of the size cap."""
+    removed = conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - _ttl(),)).rowcount
+    total = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+    limit = _max_bytes()
+    if total > limit:
+        target = int(limit * 0.9)
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key=?", victims)
+        removed += len(victims)
+    if removed:
+        with _lock:
+            stats["evictions"] += removed
+
+def cache_stats() -> Dict[str, float]:
+    with _lock:
+        snapshot = dict(stats)
+    lookups = snapshot["hits"] + snapshot["misses"]
+    snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 3) if lookups else 0.0
+    return snapshot
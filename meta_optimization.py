@@ -1,8 +1,16 @@
 # meta_optimization.py
 
+import json
+import os
+import typing as t
 # CORRECTED: Removed the non-existent 'llm_enabled' from the import list.
-from seo_common import genai_model, generate_with_fallback, safe_json, today_iso
-from context_store import load_context, save_context
+from seo_common import ProposalRun, genai_model, generate_many, safe_json
+from context_store import load_section
+from page_extract import estimate_tokens
+from seo_index import representative_pages
+
+# Room reserved in a batch for each page's answer (url + title + description).
+_OUTPUT_TOKENS_PER_PAGE = 90
 
 class MetaOptimization:
     def __init__(self):
@@ -18,54 +26,133 @@ class MetaOptimization:
             fallback_desc = "Explore the key information and resources available on this page."[:160]
         return fallback_title, fallback_desc
 
-    def optimize_meta_tags(self, session_id: str) -> dict:
-        ctx = load_context(session_id)
-        if not ctx or "website" not in ctx or "pages" not in ctx["website"]:
+    def optimize_meta_tags(self, session_id: str, deadline: t.Optional[float] = None) -> dict:
+        """
+        Sends pages in batches (one JSON array per request, sized to
+        META_BATCH_TOKEN_BUDGET), validates each returned entry and retries
+        only the missing or malformed pages one by one. Requests run
+        concurrently and proposals are saved as they complete; pages still
+        outstanding at `deadline` keep their previous proposals. Near-duplicate
+        pages are not sent: they get their cluster representative's meta tags
+        and a canonical recommendation. Pages whose content hash matches the
+        previous run's proposal keep it.
+        """
+        if not load_section(session_id, "website"):
             return {"error": "No snapshot found."}
 
-        pages = ctx["website"]["pages"]
-        max_pages = int(__import__("os").environ.get("DEMO_MAX_PROPOSAL_PAGES", "8"))
-        pages = pages[:max_pages]
+        business = load_section(session_id, "business", {}) or {}
+        max_pages = int(os.environ.get("DEMO_MAX_PROPOSAL_PAGES", "24"))
         model = genai_model() # This function correctly handles the check.
-        proposals = []
-
-        for p in pages:
-            url = p.get("url")
-            current_title = (p.get("meta_title") or p.get("title") or "")[:120]
-            current_desc  = (p.get("meta_description") or "")[:320]
-            h1 = " | ".join(p.get("h1") or [])
+        # If the model failed to load, we just skip the AI part.
+        pages, duplicates = representative_pages(session_id, max_pages, without_html=True) if model else ([], {})
+        current = [self._current(p) for p in pages]
+        run = ProposalRun(session_id, self.name, pages, duplicates)
+        proposals, todo = run.proposals, run.todo
+        self._calls = 0
 
-            # If the model failed to load, we just skip the AI part.
-            if not model:
-                continue
+        batches = self._batches(pages, current, business, todo)
+        retry: list[int] = []
+        for b, resp, error in generate_many([prompt for prompt, _ in batches], deadline=deadline, json_mode=True):
+            self._calls += 1
+            indexes = batches[b][1]
+            entries = {} if error or not resp else self._parse_batch(resp.text)
+            for i in indexes:
+                entry = entries.get(pages[i].get("url"))
+                if entry:
+                    proposals[i] = self._proposal(pages[i], current[i], entry["title"], entry["description"], "LLM meta refinement.")
+                else:
+                    retry.append(i)
+            run.maybe_save()
 
-            prompt = f"""
-You are an expert technical SEO. Propose a concise, compelling meta title (<=60 chars) and description (<=160 chars). Return **JSON** with keys: "title", "description". No extra text. Business Name: {ctx.get('business',{}).get('name','')} Page URL: {url} Current Title: {current_title} Current Description: {current_desc} Primary H1s: {h1} Site Theme: {ctx.get('business',{}).get('constraints',{}).get('brand_tone','')}
-"""
+        prompts = [self._single_prompt(pages[i], current[i], business) for i in retry]
+        for r, resp, error in generate_many(prompts, deadline=deadline):
+            self._calls += 1
+            i = retry[r]
+            current_title, current_desc, h1 = current[i]
             try:
-                resp = generate_with_fallback(prompt)
-                if not resp:
-                    raise RuntimeError("LLM unavailable")
+                if error or not resp:
+                    raise error or RuntimeError("LLM unavailable")
                 data = safe_json(resp.text) or {}
-                new_title = (data.get("title") or current_title)[:60]
-                new_desc  = (data.get("description") or current_desc)[:160]
-                proposals.append({
-                    "page_url": url,
-                    "before": {"title": current_title, "description": current_desc},
-                    "after":  {"title": new_title,   "description": new_desc},
-                    "reason": "LLM meta refinement."
-                })
-            except Exception as e:
+                proposals[i] = self._proposal(pages[i], current[i], data.get("title") or current_title, data.get("description") or current_desc, "LLM meta refinement.")
+            except Exception:
                 new_title, new_desc = self._fallback_meta(current_title, current_desc, h1)
-                proposals.append({
-                    "page_url": url,
-                    "before": {"title": current_title, "description": current_desc},
-                    "after": {"title": new_title, "description": new_desc},
-                    "reason": "Fallback meta refinement."
-                })
+                proposals[i] = self._proposal(pages[i], current[i], new_title, new_desc, "Fallback meta refinement.")
+            run.maybe_save()
+
+        for i in sorted(proposals):
+            after = proposals[i]["after"]
+            rep = pages[i].get("url")
+            proposals[i] = [proposals[i]] + [
+                {**self._proposal(m, self._current(m), after["title"], after["description"],
+                                  f"Near-duplicate of {rep}: shares its meta tags; point rel=canonical to it."),
+                 "canonical_to": rep}
+                for m in duplicates.get(rep, [])
+            ]
+        ordered = run.save()
+        return {"status": "ok", "count": len([p for p in ordered if 'error' not in p]), "proposals": ordered,
+                "pending": run.pending, "batches": len(batches), "retried": len(retry), "llm_calls": self._calls,
+                "propagated": run.propagated, "reused": run.reused}
+
+    def _current(self, page: dict) -> tuple:
+        """(current title, current description, joined H1s) of a page."""
+        current_title = (page.get("meta_title") or page.get("title") or "")[:120]
+        current_desc  = (page.get("meta_description") or "")[:320]
+        return current_title, current_desc, " | ".join(page.get("h1") or [])
 
-        ctx.setdefault("agents", {}).setdefault("meta_optimization", {})["proposals"] = proposals
-        ctx["agents"]["meta_optimization"]["created_at"] = today_iso()
-        save_context(session_id, ctx)
+    def _proposal(self, page: dict, current: tuple, title: str, description: str, reason: str) -> dict:
+        current_title, current_desc, _ = current
+        return {
+            "page_url": page.get("url"),
+            "before": {"title": current_title, "description": current_desc},
+            "after":  {"title": title[:60], "description": description[:160]},
+            "reason": reason,
+            "content_hash": page.get("content_hash"),
+        }
 
-        return {"status": "ok", "count": len([p for p in proposals if 'error' not in p]), "proposals": proposals}
+    def _batches(self, pages: list, current: list, business: dict, indexes: list[int]) -> list[tuple[str, list[int]]]:
+        """Packs pages[indexes] into prompts whose input plus expected output fit the token budget."""
+        budget = int(os.environ.get("META_BATCH_TOKEN_BUDGET", "6000"))
+        max_size = max(1, int(os.environ.get("META_BATCH_MAX", "25")))
+        batches, items, used = [], [], 0
+        for i in indexes:
+            p = pages[i]
+            current_title, current_desc, h1 = current[i]
+            item = {"url": p.get("url"), "current_title": current_title, "current_description": current_desc, "h1": h1}
+            cost = estimate_tokens(json.dumps(item, ensure_ascii=False)) + _OUTPUT_TOKENS_PER_PAGE
+            if items and (used + cost > budget or len(items) >= max_size):
+                batches.append(items)
+                items, used = [], 0
+            items.append((i, item))
+            used += cost
+        if items:
+            batches.append(items)
+        return [(self._batch_prompt([item for _, item in b], business), [i for i, _ in b]) for b in batches]
+
+    def _batch_prompt(self, items: list, business: dict) -> str:
+        return f"""
+You are an expert technical SEO. For every page below, propose a concise, compelling meta title (<=60 chars) and description (<=160 chars). Return a **JSON array** with one object per page and keys: "url" (copied exactly), "title", "description". No extra text. Business Name: {business.get('name','')} Site Theme: {business.get('constraints',{}).get('brand_tone','')}
+Pages: {json.dumps(items, ensure_ascii=False)}
+"""
+
+    def _single_prompt(self, page: dict, current: tuple, business: dict) -> str:
+        current_title, current_desc, h1 = current
+        return f"""
+You are an expert technical SEO. Propose a concise, compelling meta title (<=60 chars) and description (<=160 chars). Return **JSON** with keys: "title", "description". No extra text. Business Name: {business.get('name','')} Page URL: {page.get("url")} Current Title: {current_title} Current Description: {current_desc} Primary H1s: {h1} Site Theme: {business.get('constraints',{}).get('brand_tone','')}
+"""
+
+    def _parse_batch(self, text: str) -> dict:
+        """{url: entry} for the well-formed entries of a batch response."""
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            data = safe_json(text or "")
+        if isinstance(data, dict):
+            data = next((v for v in data.values() if isinstance(v, list)), [data])
+        entries = {}
+        for entry in data if isinstance(data, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            url, title, desc = entry.get("url"), entry.get("title"), entry.get("description")
+            if isinstance(url, str) and isinstance(title, str) and isinstance(desc, str) and title.strip() and desc.strip():
+                entries[url.strip()] = {"title": title.strip(), "description": desc.strip()}
+        return entries
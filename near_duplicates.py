@@ -0,0 +1,95 @@
+# near_duplicates.py
+"""
+Near-duplicate detection for crawled pages.
+
+Each page's visible text is reduced to a 64-bit SimHash of its word
+3-shingles at extraction time. Pages whose fingerprints differ in at most
+NEAR_DUP_MAX_BITS bits are near-duplicates (template pages, filtered
+listings, printer views...). Candidates are found with LSH banding: the
+fingerprint is split into NEAR_DUP_MAX_BITS + 1 bands, and any two pages
+within the distance must agree on at least one whole band, so only pages
+sharing a band are ever compared.
+"""
+
+import hashlib, os, re
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+NEAR_DUP_MAX_BITS = int(os.environ.get("NEAR_DUP_MAX_BITS", "3"))
+# Pages with fewer words than this are too short to fingerprint meaningfully.
+MIN_FINGERPRINT_WORDS = 20
+_SHINGLE = 3
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Multipliers that combine the word hashes of a shingle, position by position.
+_SHINGLE_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer, so every bit of a combined shingle hash depends on all three words."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def simhash(text: str) -> Optional[str]:
+    """
+    64-bit SimHash of `text` as 16 hex digits, or None for too little text.
+    Each distinct word is hashed once; the shingle hashes are combined from
+    those in numpy rather than hashing every shingle string.
+    """
+    words = _WORD.findall((text or "").lower())
+    if len(words) < MIN_FINGERPRINT_WORDS:
+        return None
+    ids: Dict[str, int] = {}
+    index = np.array([ids.setdefault(w, len(ids)) for w in words])
+    word_hashes = np.frombuffer(b"".join(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest() for w in ids), dtype="<u8")[index]
+    combined = sum(word_hashes[i:len(words) - _SHINGLE + 1 + i] * _SHINGLE_MIX[i] for i in range(_SHINGLE))
+    shingles = _mix64(np.unique(combined))
+    bits = np.unpackbits(shingles.astype(">u8").view(np.uint8)).reshape(-1, 64)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    return np.packbits(votes > 0).tobytes().hex()
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return np.unpackbits(values.astype(">u8").view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+def cluster(fingerprints: Sequence[Optional[str]], max_bits: int = NEAR_DUP_MAX_BITS) -> List[List[int]]:
+    """
+    Groups of indexes (two or more, in input order) whose fingerprints are
+    within `max_bits` of each other, transitively. Missing fingerprints never cluster.
+    """
+    present = [i for i, f in enumerate(fingerprints) if f]
+    if len(present) < 2:
+        return []
+    # Identical fingerprints (template pages) are one point, so buckets stay small.
+    values, inverse = np.unique(np.array([int(fingerprints[i], 16) for i in present], dtype=np.uint64), return_inverse=True)
+    parent = np.arange(len(values))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    bands = max_bits + 1
+    width = 64 // bands
+    for b in range(bands):
+        shift = np.uint64(b * width)
+        mask = np.uint64((1 << (width if b < bands - 1 else 64 - b * width)) - 1)
+        keys = (values >> shift) & mask
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for group in np.split(order, bounds):
+            # Every pair in the bucket is compared, so a chain A~B~C joins even when A and C are further apart.
+            for n in range(group.size - 1):
+                rest = group[n + 1:]
+                for j in rest[_popcount(values[rest] ^ values[group[n]]) <= max_bits]:
+                    a, b2 = find(int(group[n])), find(int(j))
+                    if a != b2:
+                        parent[max(a, b2)] = min(a, b2)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(present)):
+        groups.setdefault(find(int(inverse[i])), []).append(present[i])
+    return [members for members in groups.values() if len(members) > 1]
@@ -1,9 +1,14 @@
 # onpage_seo.py
 
 import json
+import typing as t
 from bs4 import BeautifulSoup
-from seo_common import genai_model, generate_with_fallback, safe_json, today_iso
-from context_store import load_context, save_context
+from seo_common import ProposalRun, genai_model, generate_many, safe_json
+from context_store import load_section
+from link_graph import DEEP_PAGE_CLICKS, UNREACHABLE
+from seo_index import THIN_PAGE_WORDS, load_link_metrics, page_key, representative_pages
+
+MAX_LINK_SUGGESTIONS = 5
 
 class OnPageSEO:
     """
@@ -27,40 +32,127 @@ class OnPageSEO:
             },
         }
 
-    def analyze_website(self, session_id: str) -> dict:
-        ctx = load_context(session_id)
-        if not ctx or "website" not in ctx or "pages" not in ctx["website"]:
+    def analyze_website(self, session_id: str, deadline: t.Optional[float] = None) -> dict:
+        """
+        Pages are sent to the LLM concurrently (see generate_many). Proposals
+        are saved as each page completes, so whatever finishes before
+        `deadline` (a time.monotonic() timestamp) is kept and pages still
+        pending then keep their previous proposals. Only one page per
+        near-duplicate cluster is sent; its proposal is copied to the other
+        pages of the cluster together with a canonical recommendation. Pages
+        whose content hash matches the previous run's proposal keep it.
+        """
+        if not load_section(session_id, "website"):
             return {"error": "No snapshot found. Build the weekly snapshot first."}
 
-        pages = ctx["website"]["pages"]
-        max_pages = int(__import__("os").environ.get("DEMO_MAX_PROPOSAL_PAGES", "8"))
-        pages = pages[:max_pages]
+        business = load_section(session_id, "business", {}) or {}
+        max_pages = int(__import__("os").environ.get("DEMO_MAX_PROPOSAL_PAGES", "24"))
         model = genai_model()
-        proposals = []
+        pages, duplicates = representative_pages(session_id, max_pages) if model else ([], {})
+        pages = [p for p in pages if p.get("html")]
+        link_metrics = load_link_metrics(session_id)
+        weak_pages = self._weak_pages(link_metrics)
+        run = ProposalRun(session_id, self.name, pages, duplicates)
+        proposals, todo = run.proposals, run.todo
+        prompts = [self._prompt(pages[i], business, link_metrics.get(pages[i].get("url")), self._link_targets(pages[i], weak_pages))
+                   for i in todo]
 
-        for page in pages:
+        for r, resp, error in generate_many(prompts, deadline=deadline):
+            i = todo[r]
+            page = pages[i]
             url = page.get("url")
-            original_html = page.get("html", "")
-            if not original_html or not model:
-                continue
+            try:
+                if error or not resp:
+                    raise error or RuntimeError("LLM unavailable")
+                data = safe_json(resp.text) or {}
+                if data.get("rewritten_html_body") and data.get("json_ld_schema"):
+                    proposals[i] = {
+                        "page_url": url,
+                        "reason": data.get("reason_for_changes", "Comprehensive technical SEO rewrite."),
+                        "proposed_html_body": data["rewritten_html_body"],
+                        "proposed_schema": data["json_ld_schema"],
+                        "content_hash": page.get("content_hash"),
+                    }
+                else:
+                    proposals[i] = {"page_url": url, "error": "LLM failed to generate valid HTML/Schema proposal.", "raw_response": resp.text}
+            except Exception:
+                proposals[i] = {
+                    "page_url": url,
+                    "reason": "Fallback technical SEO proposal.",
+                    "proposed_html_body": page.get("html", ""),
+                    "proposed_schema": self._fallback_schema(page, business.get("name", "")),
+                }
+            run.maybe_save()
 
+        for i in sorted(proposals):
+            if "error" not in proposals[i]:
+                proposals[i] = [proposals[i]] + [self._propagate(proposals[i], member) for member in duplicates.get(pages[i].get("url"), [])]
+        ordered = run.save()
+        return {"status": "ok", "count": len([p for p in ordered if 'error' not in p]), "proposals": ordered,
+                "pending": run.pending, "propagated": run.propagated, "reused": run.reused}
+
+    def _propagate(self, proposal: dict, member: dict) -> dict:
+        """The representative's proposal, re-targeted at one of its near-duplicates."""
+        rep, url = proposal["page_url"], member.get("url")
+        schema = proposal.get("proposed_schema")
+        if isinstance(schema, dict) and schema.get("url") == rep:
+            schema = {**schema, "url": url}
+        return {
+            **proposal,
+            "page_url": url,
+            "reason": f"Near-duplicate of {rep}: point rel=canonical to it, or apply the same rewrite. {proposal.get('reason', '')}".strip(),
+            "proposed_schema": schema,
+            "canonical_to": rep,
+            "content_hash": member.get("content_hash"),
+        }
+
+    def _weak_pages(self, link_metrics: dict) -> list:
+        """Orphan, deep and unreachable pages, weakest (lowest internal PageRank) first."""
+        weak = [(m[0], url) for url, m in link_metrics.items()
+                if m[1] != 0 and (m[2] == 0 or m[1] == UNREACHABLE or m[1] > DEEP_PAGE_CLICKS)]
+        return [url for _, url in sorted(weak)]
+
+    def _link_targets(self, page: dict, weak_pages: list) -> list:
+        """Under-linked pages this page does not link to yet, same site section first."""
+        url = page.get("url", "")
+        linked = {page_key(link) for link in page.get("internal_links") or []} | {page_key(url)}
+        section = url.split("/")[3:4]
+        candidates = [u for u in weak_pages if page_key(u) not in linked]
+        candidates.sort(key=lambda u: u.split("/")[3:4] != section)  # stable: keeps weakest-first within each group
+        return candidates[:MAX_LINK_SUGGESTIONS]
+
+    def _prompt(self, page: dict, business: dict, link_metrics: t.Optional[list] = None, link_targets: t.Optional[list] = None) -> str:
+        url = page.get("url")
+        original_html = page.get("html", "")
+        if "images_without_alt" in page:
+            # Collected by the crawler's single extraction pass.
+            images_without_alt = page["images_without_alt"]
+        else:
             soup = BeautifulSoup(original_html, 'html.parser')
             # CORRECTED: Use .get('src') to prevent crashes on images without a src attribute.
             images_without_alt = [img.get('src', '') for img in soup.find_all('img') if img.get('src') and not img.get('alt', '').strip()]
+        if link_metrics:
+            rank, depth, inlinks, _ = link_metrics
+            link_position = f"{'unreachable' if depth == UNREACHABLE else f'{depth} clicks'} from the home page, {inlinks} internal links in, internal PageRank {rank} (1.0 = average page)"
+        else:
+            link_position = "unknown"
 
-            # CORRECTED: The prompt now specifies the correct "@type" for valid JSON-LD schema.
-            prompt = f"""
+        # CORRECTED: The prompt now specifies the correct "@type" for valid JSON-LD schema.
+        return f"""
             You are "FieldNote", a world-class technical SEO expert and web developer.
             Your task is to completely rewrite the body of a webpage for optimal technical and on-page SEO.
 
             **Analysis Context:**
             - Page URL: {url}
-            - Business Name: {ctx.get('business', {}).get('name', '')}
-            - Brand Tone: {ctx.get('business', {}).get('constraints', {}).get('brand_tone', 'expert, helpful')}
+            - Business Name: {business.get('name', '')}
+            - Brand Tone: {business.get('constraints', {}).get('brand_tone', 'expert, helpful')}
             - Images missing alt text: {json.dumps(images_without_alt)}
+            - Visible word count: {page.get('word_count', 'unknown')}{' (thin content: expand it with genuinely useful detail)' if page.get('word_count') is not None and page['word_count'] < THIN_PAGE_WORDS else ''}
+            - Internal link position: {link_position}
+            - Under-linked pages on this site: {json.dumps(link_targets or [])}
 
             **Instructions:**
-            1. **Rewrite HTML Body:** Analyze the provided original HTML `<body>`. Rewrite it to be semantically correct and SEO-optimized. Ensure a single, compelling <h1>, logical structure, integrated keywords, and descriptive `alt` attributes for all `<img>` tags.
+            1. **Rewrite HTML Body:** Analyze the provided original HTML `<body>`. Rewrite it to be semantically correct and SEO-optimized. Ensure a single, compelling <h1>, logical structure, integrated keywords, and descriptive `alt` attributes for all `<img>` tags. Where the content is relevant, add contextual internal links (descriptive anchor text) to the under-linked pages listed above.
             2. **Generate Schema:** Based on the content, generate one primary JSON-LD schema block (e.g., Article, FAQPage, Product). It must be rich and detailed.
 
             **Output Format:**
@@ -77,29 +169,3 @@ class OnPageSEO:
             {original_html}
             ```
             """
-            try:
-                resp = generate_with_fallback(prompt)
-                if not resp:
-                    raise RuntimeError("LLM unavailable")
-                data = safe_json(resp.text) or {}
-                if data.get("rewritten_html_body") and data.get("json_ld_schema"):
-                    proposals.append({
-                        "page_url": url,
-                        "reason": data.get("reason_for_changes", "Comprehensive technical SEO rewrite."),
-                        "proposed_html_body": data["rewritten_html_body"],
-                        "proposed_schema": data["json_ld_schema"],
-                    })
-                else:
-                    proposals.append({"page_url": url, "error": "LLM failed to generate valid HTML/Schema proposal.", "raw_response": resp.text})
-            except Exception as e:
-                proposals.append({
-                    "page_url": url,
-                    "reason": "Fallback technical SEO proposal.",
-                    "proposed_html_body": original_html,
-                    "proposed_schema": self._fallback_schema(page, ctx.get("business", {}).get("name", "")),
-                })
-
-        ctx.setdefault("agents", {}).setdefault("onpage_seo", {})["proposals"] = proposals
-        ctx["agents"]["onpage_seo"]["created_at"] = today_iso()
-        save_context(session_id, ctx)
-        return {"status": "ok", "count": len([p for p in proposals if 'error' not in p]), "proposals": proposals}
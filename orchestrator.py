@@ -4,19 +4,58 @@ import asyncio
 import json
 import html
 import os
+import time
 import typing as t
 from search_crawl import build_weekly_snapshot
-from context_store import save_context, load_context
+from context_store import load_context, load_agent, save_section, update_agent
+from seo_index import INDEX_VERSION as SEO_INDEX_VERSION, ensure_summary as ensure_seo_summary
 from topical_map import TopicalMap
 from meta_optimization import MetaOptimization
 from onpage_seo import OnPageSEO
 from blog_automation import BlogAutomation
 from cms_base import get_client
-from seo_common import genai_model, generate_with_fallback
+from cms_executor import CMSExecutor, Operation
+from seo_common import genai_model, agenerate, session_api_key, use_api_key, scheduler_stats
+from llm_cache import cache_stats as llm_cache_stats
 
 def _demo_mode_enabled() -> bool:
     return os.environ.get("DEMO_MODE", "false").strip().lower() in {"1", "true", "yes", "on"}
 
+# Platforms whose changes can be applied from the chat, with the credentials the dashboard asks for:
+# (creds key, label, secret). Other platforms get a patch pack. Committing to a git repository is
+# server configuration only (GIT_REPO_PATH, see _git_creds), never chosen by the request.
+EXECUTION_CREDENTIALS = {
+    "wordpress": [("user", "Username", False), ("password", "Application Password", True)],
+    "shopify": [("store", "Store domain (myshop.myshopify.com)", False), ("token", "Admin API access token", True)],
+    "webflow": [("site_id", "Site ID", False), ("collection_id", "CMS collection ID", False), ("token", "API token", True)],
+    "wix": [("site_id", "Site ID", False), ("collection_id", "Data collection ID", False), ("api_key", "API key", True)],
+}
+
+def _git_creds() -> t.Optional[dict]:
+    """GitPRAdapter creds from the server's environment; None unless GIT_REPO_PATH is set."""
+    repo = os.environ.get("GIT_REPO_PATH", "").strip()
+    if not repo:
+        return None
+    creds = {"repo_path": repo, "route_map": json.loads(os.environ.get("GIT_ROUTE_MAP") or "{}")}
+    for key in ("base", "site_root", "posts_dir", "redirects_file"):
+        if os.environ.get(f"GIT_{key.upper()}"):
+            creds[key] = os.environ[f"GIT_{key.upper()}"]
+    return creds
+
+def _execution_actions(platform: str) -> list[dict]:
+    """The action that starts execution for `platform`: credentials when it has an adapter, otherwise a patch pack."""
+    fields = EXECUTION_CREDENTIALS.get((platform or "").lower())
+    if not fields:
+        return [{"type": "build_patch_pack", "label": "Build Patch Pack"}]
+    return [{"type": "provide_keys", "label": f"Provide {platform.capitalize()} Credentials & Approve", "platform": platform.lower(),
+             "fields": [{"name": name, "label": label, "secret": secret} for name, label, secret in fields]}]
+
+def _manual_execution_note(platform: str) -> str:
+    names = ["WordPress" if p == "wordpress" else p.capitalize() for p in EXECUTION_CREDENTIALS]
+    supported = ", ".join(names[:-1]) + " and " + names[-1]
+    return (f"Execution is automated for **{supported}**. For **{platform}**, this review plan is intended as a manual "
+            f"implementation guide, and a patch pack with every change can be built as files to apply.")
+
 def _safe_async_timeout() -> float:
     try:
         return float(os.environ.get("DEMO_AGENT_TIMEOUT_SECONDS", "12"))
@@ -79,22 +118,30 @@ def _cluster_list(ctx: dict) -> list[dict]:
         return clusters
     return []
 
+def _metrics(ctx: dict) -> dict:
+    """The crawl's stored metrics summary (see seo_index); empty before the first crawl."""
+    return ctx.get("seo_metrics") or {}
+
 def _seo_score(ctx: dict) -> tuple[int, list[str]]:
-    pages = ctx.get("website", {}).get("pages", [])
-    page_count = len(pages)
+    metrics = _metrics(ctx)
+    page_count = metrics.get("page_count", 0)
     if page_count == 0:
         return 0, ["No pages were successfully crawled yet."]
 
-    pages_with_meta = sum(1 for p in pages if p.get("meta_description"))
-    pages_with_h1 = sum(1 for p in pages if p.get("h1"))
-    pages_with_canonical = sum(1 for p in pages if p.get("canonical"))
-    avg_internal_links = sum(len(p.get("internal_links", [])) for p in pages) / max(page_count, 1)
+    pages_with_meta = metrics.get("with_meta", 0)
+    pages_with_h1 = metrics.get("with_h1", 0)
+    pages_with_canonical = metrics.get("with_canonical", 0)
+    avg_internal_links = metrics.get("avg_internal_links", 0.0)
+    links = metrics.get("link_graph", {})
+    deep_pages = links.get("deep_pages", 0)
 
     score = 40
     score += round((pages_with_meta / page_count) * 20)
     score += round((pages_with_h1 / page_count) * 20)
     score += round((pages_with_canonical / page_count) * 10)
     score += 10 if avg_internal_links >= 5 else 5 if avg_internal_links >= 2 else 0
+    # Pages buried deep in (or cut off from) the internal link structure cost up to 10 points.
+    score -= round((deep_pages / page_count) * 10)
     score = max(0, min(score, 100))
 
     recommendations = []
@@ -106,6 +153,20 @@ def _seo_score(ctx: dict) -> tuple[int, list[str]]:
         recommendations.append("Add canonical tags consistently to strengthen indexation signals.")
     if avg_internal_links < 5:
         recommendations.append("Improve internal linking between related pages to support crawl depth and topic authority.")
+    if metrics.get("duplicate_title_pages"):
+        recommendations.append(f"Give each page a unique title: {metrics['duplicate_title_pages']} pages share their title with another page.")
+    if metrics.get("thin_pages"):
+        recommendations.append(f"Expand or consolidate thin content: {metrics['thin_pages']} pages have fewer than {metrics.get('thin_page_words', 300)} words.")
+    if metrics.get("orphan_pages"):
+        recommendations.append(f"Link to orphan pages: {metrics['orphan_pages']} crawled pages have no internal links pointing to them.")
+    duplicates = metrics.get("near_duplicates", {})
+    if duplicates.get("clusters"):
+        recommendations.append(
+            f"Consolidate near-duplicate pages: {duplicates['pages']} pages fall into {duplicates['clusters']} groups of near-identical content"
+            + (f"; {duplicates['missing_canonical']} of them lack a canonical tag pointing to the group's main page." if duplicates.get("missing_canonical") else ".")
+        )
+    if deep_pages:
+        recommendations.append(f"Bring deep pages closer to the home page: {deep_pages} pages are more than {links.get('deep_page_clicks', 3)} clicks away or unreachable through internal links.")
     if not recommendations:
         recommendations.append("Use the generated review plan to refine titles, schema, and supporting content for higher CTR and topical coverage.")
 
@@ -129,21 +190,23 @@ def _approval_intent(text: str) -> bool:
     return any(phrase in lowered for phrase in phrases)
 
 def _grounded_chat_context(ctx: dict) -> str:
-    pages = ctx.get("website", {}).get("pages", [])
+    metrics = _metrics(ctx)
     platform = ctx.get("website", {}).get("platform", "unknown")
     score, recommendations = _seo_score(ctx)
-    sample_pages = [p.get("url") for p in pages[:5] if p.get("url")]
+    sample_pages = metrics.get("sample_urls", [])
     return "\n".join([
         f"Website URL: {ctx.get('website', {}).get('url', '')}",
-        f"Pages crawled: {len(pages)}",
+        f"Pages crawled: {metrics.get('page_count', 0)}",
         f"Detected platform: {platform}",
         f"SEO score: {score}/100",
         f"Sample pages: {json.dumps(sample_pages[:3])}",
+        f"Duplicate-title pages: {metrics.get('duplicate_title_pages', 0)}, thin pages: {metrics.get('thin_pages', 0)}, orphan pages: {metrics.get('orphan_pages', 0)}",
+        f"Link graph: average click depth {metrics.get('link_graph', {}).get('avg_depth', 0)}, deep pages {metrics.get('link_graph', {}).get('deep_pages', 0)}, strongest pages {json.dumps([p['url'] for p in metrics.get('link_graph', {}).get('top_pages', [])[:3]])}",
         f"Top recommendations: {json.dumps(recommendations[:4], ensure_ascii=False)}",
         f"Current proposal counts: onpage={len(ctx.get('agents', {}).get('onpage_seo', {}).get('proposals', []))}, meta={len(ctx.get('agents', {}).get('meta_optimization', {}).get('proposals', []))}, blog={len(ctx.get('agents', {}).get('blog_automation', {}).get('schedule', []))}",
     ])
 
-def _demo_conversational_reply(ctx: dict, user_message: str) -> str:
+async def _demo_conversational_reply(ctx: dict, user_message: str) -> str:
     prompt = f"""
 You are FieldNote, a warm and sharp SEO strategist speaking in a live product demo.
 
@@ -163,7 +226,7 @@ User message:
 {user_message}
 """
     try:
-        resp = generate_with_fallback(prompt)
+        resp = await agenerate(prompt)
         if resp and getattr(resp, "text", "").strip():
             return resp.text.strip()
     except Exception:
@@ -172,14 +235,14 @@ User message:
 
 def _grounded_findings_message(ctx: dict, snapshot: dict) -> str:
     url = ctx.get("website", {}).get("url", "the website")
-    pages = ctx.get("website", {}).get("pages", [])
+    metrics = _metrics(ctx)
     platform = ctx.get("website", {}).get("platform", "unknown")
     crawl_errors = ctx.get("website", {}).get("crawl_errors", [])
     clusters = _cluster_list(ctx)
-    page_count = len(pages)
-    pages_with_meta = sum(1 for p in pages if p.get("meta_description"))
-    pages_with_h1 = sum(1 for p in pages if p.get("h1"))
-    sample_urls = [p.get("url") for p in pages[:3] if p.get("url")]
+    page_count = metrics.get("page_count", 0)
+    pages_with_meta = metrics.get("with_meta", 0)
+    pages_with_h1 = metrics.get("with_h1", 0)
+    sample_urls = metrics.get("sample_urls", [])[:3]
     score, recommendations = _seo_score(ctx)
 
     lines = [
@@ -191,6 +254,24 @@ def _grounded_findings_message(ctx: dict, snapshot: dict) -> str:
         f"* Pages with an H1 heading: **{pages_with_h1}/{page_count}**",
         f"* SEO score: **{score}/100**",
     ]
+    seo_plugin = ctx.get("website", {}).get("seo_plugin", "unknown")
+    if seo_plugin != "unknown":
+        lines.insert(4, f"* SEO plugin: **{seo_plugin}**")
+    if metrics.get("duplicate_title_pages"):
+        lines.append(f"* Pages sharing a duplicate title: **{metrics['duplicate_title_pages']}**")
+    if metrics.get("thin_pages"):
+        lines.append(f"* Thin pages (under {metrics.get('thin_page_words', 300)} words): **{metrics['thin_pages']}**")
+    if metrics.get("orphan_pages"):
+        lines.append(f"* Orphan pages (no internal links in): **{metrics['orphan_pages']}**")
+    changes = ctx.get("website", {}).get("changes") or {}
+    if changes.get("changed") or changes.get("unchanged") or changes.get("removed"):
+        lines.append(f"* Since the last crawl: **{changes.get('new', 0)}** new, **{changes.get('changed', 0)}** changed, **{changes.get('removed', 0)}** removed pages")
+    duplicates = metrics.get("near_duplicates", {})
+    if duplicates.get("clusters"):
+        lines.append(f"* Near-duplicate pages: **{duplicates['pages']}** in **{duplicates['clusters']}** groups")
+    links = metrics.get("link_graph", {})
+    if links.get("pages"):
+        lines.append(f"* Click depth from the home page: **{links.get('avg_depth', 0)}** on average, **{links.get('max_depth', 0)}** at most")
     if crawl_errors:
         lines.append(f"* Crawl warnings captured: **{len(crawl_errors)}**")
     if sample_urls:
@@ -217,9 +298,9 @@ def _grounded_findings_message(ctx: dict, snapshot: dict) -> str:
 
 def _grounded_followup_response(ctx: dict, user_message: str) -> str:
     lowered = (user_message or "").lower()
-    page_count = len(ctx.get("website", {}).get("pages", []))
+    page_count = _metrics(ctx).get("page_count", 0)
     platform = ctx.get("website", {}).get("platform", "unknown")
-    sample_pages = [p.get("url") for p in ctx.get("website", {}).get("pages", [])[:5] if p.get("url")]
+    sample_pages = _metrics(ctx).get("sample_urls", [])
     score, recommendations = _seo_score(ctx)
 
     if any(term in lowered for term in ["score", "recommendation", "recommendations", "seo score"]):
@@ -281,27 +362,52 @@ def _grounded_plan_ready_message(ctx: dict) -> str:
         ])
     else:
         platform = ctx.get("website", {}).get("platform", "unknown").capitalize()
-        if platform.lower() == "wordpress":
+        if platform.lower() in EXECUTION_CREDENTIALS:
             lines.extend([
                 "",
-                "If the plan looks good, the next step is to provide WordPress credentials to execute it.",
+                f"If the plan looks good, the next step is to provide {platform} credentials to execute it.",
             ])
         else:
-            lines.extend([
-                "",
-                f"Execution is currently automated only for **WordPress**. For **{platform}**, this review plan is intended as a manual implementation guide.",
-            ])
+            lines.extend(["", _manual_execution_note(platform)])
     return "\n".join(lines)
 
-async def _run_generation_step(label: str, fn, session_id: str) -> dict | None:
+async def _run_generation_step(label: str, fn, session_id: str, with_deadline: bool = False) -> dict | None:
+    timeout = _safe_async_timeout()
+    # Agents that fan out LLM calls stop a little before the hard timeout and return what finished.
+    kwargs = {"deadline": time.monotonic() + timeout * 0.9} if with_deadline else {}
     try:
-        return await asyncio.wait_for(asyncio.to_thread(fn, session_id), timeout=_safe_async_timeout())
+        return await asyncio.wait_for(asyncio.to_thread(fn, session_id, **kwargs), timeout=timeout)
     except Exception as e:
         return {"error": f"{label} failed: {e}"}
 
+async def _generate_proposals(session_id: str, ctx: dict) -> dict:
+    """
+    Runs the proposal agents concurrently. Each agent only writes its own
+    agents.<name> record, so their outputs cannot clobber each other; the
+    results are merged into `ctx` and into the run_status record afterwards.
+    """
+    steps = {
+        "onpage_seo": (OnPageSEO().analyze_website, True),
+        "meta_optimization": (MetaOptimization().optimize_meta_tags, True),
+        "blog_automation": (BlogAutomation().schedule_blogs, False),
+    }
+    results = await asyncio.gather(*(
+        _run_generation_step(name, fn, session_id, with_deadline=with_deadline)
+        for name, (fn, with_deadline) in steps.items()
+    ))
+    agents = ctx.setdefault("agents", {})
+    for name in steps:
+        agents[name] = load_agent(session_id, name)
+    agents["run_status"] = update_agent(session_id, "run_status", {
+        **{name: result or {"status": "unknown"} for name, result in zip(steps, results)},
+        "llm_cache": llm_cache_stats(),
+        "llm_scheduler": scheduler_stats(),
+    })
+    return agents["run_status"]
+
 def _fallback_chat_response(ctx: dict, user_message: str) -> str:
     lowered = (user_message or "").lower()
-    page_count = len(ctx.get("website", {}).get("pages", []))
+    page_count = _metrics(ctx).get("page_count", 0)
     platform = ctx.get("website", {}).get("platform", "unknown")
     onpage_count = len(ctx.get("agents", {}).get("onpage_seo", {}).get("proposals", []))
     meta_count = len(ctx.get("agents", {}).get("meta_optimization", {}).get("proposals", []))
@@ -309,7 +415,7 @@ def _fallback_chat_response(ctx: dict, user_message: str) -> str:
     score, recommendations = _seo_score(ctx)
 
     if any(term in lowered for term in ["what did you find", "what did you actually find", "specific", "found on the site"]):
-        sample_pages = [p.get("url") for p in ctx.get("website", {}).get("pages", [])[:5] if p.get("url")]
+        sample_pages = _metrics(ctx).get("sample_urls", [])
         lines = [
             f"Here’s the grounded SEO readout from the crawl for **{ctx.get('website', {}).get('url', 'this site')}**:",
             "",
@@ -359,7 +465,17 @@ class Agent:
         self.model = genai_model()
         self.ctx = load_context(session_id) or {"history": [], "state": "start"}
 
-    def chat(self, instruction: str) -> str:
+    def set_state(self, state: str):
+        self.ctx["state"] = state
+        save_section(self.session_id, "state", state)
+
+    def with_metrics(self) -> dict:
+        """Makes sure the crawl's metrics summary is loaded; sessions crawled before it existed get one built once."""
+        if self.ctx.get("website") and _metrics(self.ctx).get("version") != SEO_INDEX_VERSION:
+            self.ctx["seo_metrics"] = ensure_seo_summary(self.session_id)
+        return self.ctx
+
+    async def chat(self, instruction: str) -> str:
         system_prompt = f"""
         You are "FieldNote", an expert AI SEO strategist.
         Your Persona: A helpful, data-driven, and clear expert. You explain the 'why' behind your suggestions in simple terms to build excitement and trust. NO EMOJIS.
@@ -374,7 +490,8 @@ class Agent:
         **CONTEXT FOR THIS TURN:**
         *   Website URL: {self.ctx.get("url")}
         *   Detected Platform: {self.ctx.get("website", {}).get("platform", "Unknown")}
-        *   Number of Pages Scanned: {len(self.ctx.get("website", {}).get("pages", []))}
+        *   Detected SEO Plugin: {self.ctx.get("website", {}).get("seo_plugin", "unknown")}
+        *   Number of Pages Scanned: {self.ctx.get("website", {}).get("page_count", _metrics(self.ctx).get("page_count", 0))}
         *   Proposed Blog Topics (if available): {json.dumps(self.ctx.get("agents", {}).get("topical_map", {}).get("clusters", {}))}
         ---
 
@@ -383,7 +500,7 @@ class Agent:
         if not self.model:
             return _fallback_chat_response(self.ctx, instruction)
         try:
-            resp = generate_with_fallback(system_prompt)
+            resp = await agenerate(system_prompt)
             if not resp:
                 return _fallback_chat_response(self.ctx, instruction)
             clean_response = resp.text.split('</thinking>')[-1].strip()
@@ -392,28 +509,51 @@ class Agent:
             print(f"LLM Generation Error: {e}")
             return _fallback_chat_response(self.ctx, instruction)
 
-async def run_orchestrator_turn(session_id: str, user_message: str, api_keys: t.Optional[dict] = None) -> t.List[dict]:
+# States in which "analyze:" (re)starts a crawl. Re-analyzing a session only
+# regenerates proposals for pages whose content changed since the last crawl.
+_ANALYZE_STATES = {"start", "crawl_failed", "error", "awaiting_final_approval", "complete", "execution_incomplete"}
+
+class _MessageLog(list):
+    """Turn transcript that also hands each message to `on_message` as soon as it is added."""
+    def __init__(self, on_message: t.Optional[t.Callable[[dict], None]] = None):
+        super().__init__()
+        self.on_message = on_message
+
+    def append(self, message: dict) -> None:
+        super().append(message)
+        if self.on_message:
+            self.on_message(message)
+
+async def run_orchestrator_turn(session_id: str, user_message: str, api_keys: t.Optional[dict] = None,
+                                on_message: t.Optional[t.Callable[[dict], None]] = None) -> t.List[dict]:
+    """
+    Runs one chat turn and returns its messages. `on_message` (called on the
+    event loop) receives each message as it is produced, for live progress.
+    """
+    # LLM calls made during the turn (including agent threads) use the session's own key, if it sent one.
+    with use_api_key(session_api_key(session_id, api_keys)):
+        return await _run_turn(session_id, user_message, _MessageLog(on_message))
+
+async def _run_turn(session_id: str, user_message: str, messages: _MessageLog) -> t.List[dict]:
     agent = Agent(session_id)
     state = agent.ctx.get("state", "start")
-    messages = []
 
-    if state == "start" and user_message.startswith("analyze:"):
+    if state in _ANALYZE_STATES and user_message.startswith("analyze:"):
         url = user_message.split("analyze:", 1)[1].strip()
         agent.ctx["url"] = url
-        agent.ctx["state"] = "discovery"
-        save_context(session_id, agent.ctx)
+        save_section(session_id, "url", url)
+        agent.set_state("discovery")
         
         messages.append({"agent": "orchestrator", "text": f"Initializing analysis for **{url}**...", "status": "in_progress"})
         
         try:
             messages.append({"agent": "orchestrator", "text": "Scraping website structure and content...", "status": "in_progress"})
-            snapshot = await build_weekly_snapshot(session_id, url, max_pages=50)
+            snapshot = await build_weekly_snapshot(session_id, url, max_pages=int(os.environ.get("CRAWL_MAX_PAGES", "50")))
             agent.ctx = load_context(session_id)
 
             if snapshot.get("pages", 0) <= 0:
                 crawl_errors = agent.ctx.get("website", {}).get("crawl_errors", [])
-                agent.ctx["state"] = "crawl_failed"
-                save_context(session_id, agent.ctx)
+                agent.set_state("crawl_failed")
                 error_hint = f" Recent crawl errors: {crawl_errors[:2]}" if crawl_errors else ""
                 messages.append({
                     "agent": "orchestrator",
@@ -430,76 +570,62 @@ async def run_orchestrator_turn(session_id: str, user_message: str, api_keys: t.
                 })
             else:
                 messages.append({"agent": "orchestrator", "text": "Identifying content gaps and blog opportunities...", "status": "in_progress"})
-                TopicalMap().generate_map(session_id)
-                agent.ctx = load_context(session_id)
+                await asyncio.to_thread(TopicalMap().generate_map, session_id)
+                agent.ctx.setdefault("agents", {})["topical_map"] = load_agent(session_id, "topical_map")
 
                 messages.append({"agent": "orchestrator", "text": "Finalizing SEO score and recommendations...", "status": "in_progress"})
-                await asyncio.sleep(1.5)
 
-                agent.ctx["state"] = "presenting_findings"
-                save_context(session_id, agent.ctx)
+                agent.set_state("presenting_findings")
+                agent.with_metrics()
 
                 if _demo_mode_enabled():
                     agent_response = _grounded_findings_message(agent.ctx, snapshot)
                 else:
                     instruction = f"The analysis of {url} is complete. It has {snapshot.get('pages', 0)} pages and the platform is {snapshot.get('platform', 'unknown')}. Present the findings to the user. Be specific and exciting using the context data. Give a score. End by asking for permission to generate the full action plan."
-                    agent_response = agent.chat(instruction)
+                    agent_response = await agent.chat(instruction)
                     if not agent_response or "LLM is not configured." in agent_response or agent_response.startswith("Error connecting to AI model"):
                         agent_response = _grounded_findings_message(agent.ctx, snapshot)
                 messages.append({"agent": "orchestrator", "text": agent_response})
 
         except Exception as e:
             messages.append({"agent": "orchestrator", "text": f"An error occurred during discovery: {e}"})
-            agent.ctx["state"] = "error"; save_context(session_id, agent.ctx)
+            agent.set_state("error")
 
     elif state == "presenting_findings":
+        agent.with_metrics()
         if _demo_mode_enabled():
             if _approval_intent(user_message):
                 agent_response = "Perfect. I’m putting together the detailed review plan now based on the pages I crawled."
             else:
-                agent_response = _demo_conversational_reply(agent.ctx, user_message)
+                agent_response = await _demo_conversational_reply(agent.ctx, user_message)
         else:
             instruction = f"The user has responded to your analysis with: '{user_message}'. If they've given approval (e.g., 'yes', 'ok', 'sure'), confirm you're generating the detailed action plan. If they ask a question, answer it. Otherwise, gently nudge them for approval."
-            agent_response = agent.chat(instruction)
+            agent_response = await agent.chat(instruction)
             if not agent_response or "LLM is not configured." in agent_response or agent_response.startswith("Error connecting to AI model"):
                 agent_response = _fallback_chat_response(agent.ctx, user_message)
         messages.append({"agent": "orchestrator", "text": agent_response})
         
         if _approval_intent(user_message):
-            agent.ctx["state"] = "generating_proposals"; save_context(session_id, agent.ctx)
+            agent.set_state("generating_proposals")
             
             messages.append({"agent": "orchestrator", "text": "Preparing technical page rewrites...", "status": "in_progress"})
-            onpage_result = await _run_generation_step("onpage_seo", OnPageSEO().analyze_website, session_id)
-            
             messages.append({"agent": "orchestrator", "text": "Optimizing all meta titles and descriptions...", "status": "in_progress"})
-            meta_result = await _run_generation_step("meta_optimization", MetaOptimization().optimize_meta_tags, session_id)
-
             messages.append({"agent": "orchestrator", "text": "Drafting all scheduled blog posts...", "status": "in_progress"})
-            blog_result = await _run_generation_step("blog_automation", BlogAutomation().schedule_blogs, session_id)
-            
-            agent.ctx = load_context(session_id)
-            agent.ctx.setdefault("agents", {}).setdefault("run_status", {})["onpage_seo"] = onpage_result or {"status": "unknown"}
-            agent.ctx["agents"]["run_status"]["meta_optimization"] = meta_result or {"status": "unknown"}
-            agent.ctx["agents"]["run_status"]["blog_automation"] = blog_result or {"status": "unknown"}
-            agent.ctx["state"] = "awaiting_final_approval"; save_context(session_id, agent.ctx)
+            await _generate_proposals(session_id, agent.ctx)
+
+            agent.set_state("awaiting_final_approval")
             platform = agent.ctx.get("website", {}).get("platform", "CMS").capitalize()
             if _demo_mode_enabled():
                 agent_response_2 = _grounded_plan_ready_message(agent.ctx)
                 actions = [{"type": "review_changes", "label": "Review Action Plan"}]
             else:
                 instruction = "All proposals are now generated. Announce that the action plan is ready for review. Remind the user of the platform you detected and ask for the appropriate credentials to execute the plan."
-                agent_response_2 = agent.chat(instruction)
+                agent_response_2 = await agent.chat(instruction)
                 if not agent_response_2 or "LLM is not configured." in agent_response_2 or agent_response_2.startswith("Error connecting to AI model"):
                     agent_response_2 = _grounded_plan_ready_message(agent.ctx)
-                actions = [{"type": "review_changes", "label": "Review Action Plan"}]
-                if platform.lower() == "wordpress" and not _demo_mode_enabled():
-                    actions.append({"type": "provide_keys", "label": f"Provide {platform} Credentials & Approve"})
-                else:
-                    agent_response_2 = (
-                        f"{agent_response_2}\n\n"
-                        f"Execution is currently automated only for **WordPress**. "
-                        f"For **{platform}**, you can still review the generated plan and use it as a manual implementation guide."
-                    )
+                actions = [{"type": "review_changes", "label": "Review Action Plan"}] + _execution_actions(platform)
+                if platform.lower() not in EXECUTION_CREDENTIALS:
+                    agent_response_2 = f"{agent_response_2}\n\n{_manual_execution_note(platform)}"
             messages.append({"agent": "orchestrator", "text": agent_response_2, "actions": actions})
     elif state == "crawl_failed":
         messages.append({
@@ -510,66 +636,101 @@ async def run_orchestrator_turn(session_id: str, user_message: str, api_keys: t.
             ),
         })
     else:
-        messages.append({"agent": "orchestrator", "text": agent.chat(f"The user said: '{user_message}'. Respond helpfully.")})
+        agent.with_metrics()
+        messages.append({"agent": "orchestrator", "text": await agent.chat(f"The user said: '{user_message}'. Respond helpfully.")})
     
-    return messages
+    return list(messages)
 
-async def execute_with_keys(session_id: str, creds: dict) -> list[dict]:
+async def execute_with_keys(session_id: str, creds: dict, on_message: t.Optional[t.Callable[[dict], None]] = None) -> list[dict]:
+    logs = _MessageLog(on_message)
     ctx = load_context(session_id)
     if not ctx:
-        return [{"agent": "executor", "text": "Execution failed: no saved session context was found."}]
-
-    platform = ctx.get("website", {}).get("platform", "unknown")
+        logs.append({"agent": "executor", "text": "Execution failed: no saved session context was found."})
+        return list(logs)
+
+    # {"platform": "patch"} builds a downloadable patch pack instead of writing to the detected CMS;
+    # it is the only platform a request may choose. A server with GIT_REPO_PATH commits to that repository.
+    git_creds = _git_creds()
+    if creds.get("platform") == "patch":
+        platform, creds = "patch", {}
+    elif git_creds:
+        platform, creds = "git", git_creds
+    else:
+        platform = ctx.get("website", {}).get("platform", "unknown")
+        creds = {k: v for k, v in creds.items() if k not in ("platform", "repo_path")}
     site_url = ctx.get("website", {}).get("url")
-    creds_with_url = {**creds, "site_url": site_url}
-    logs = []
+    creds_with_url = {**creds, "site_url": site_url, "session_id": session_id}
     try:
         client = get_client(platform, creds_with_url)
     except Exception as e:
-        return [{"agent": "executor", "text": f"Execution setup failed: {e}"}]
-
-    meta_proposals = ctx.get("agents", {}).get("meta_optimization", {}).get("proposals", [])
-    for item in meta_proposals:
-        try:
-            res = client.update_page_meta(item['page_url'], item['after']['title'], item['after']['description'])
-            if isinstance(res, dict) and res.get("ok") is False:
-                logs.append({"agent": "executor", "text": f"Meta update for {item['page_url']}: Skipped ({res.get('message', 'not supported')})"})
-            else:
-                logs.append({"agent": "executor", "text": f"Meta update for {item['page_url']}: Success"})
-        except Exception as e:
-            logs.append({"agent": "executor", "text": f"Meta update FAILED for {item['page_url']}: {e}"})
-
-    onpage_proposals = ctx.get("agents", {}).get("onpage_seo", {}).get("proposals", [])
-    for p in onpage_proposals:
-        try:
-            if "proposed_schema" not in p:
-                logs.append({"agent": "executor", "text": f"Schema inject skipped for {p.get('page_url')}: no generated schema was available"})
-                continue
-            res = client.inject_json_ld(p.get('page_url'), p.get('proposed_schema', {}))
-            if isinstance(res, dict) and res.get("ok") is False:
-                logs.append({"agent": "executor", "text": f"Schema inject for {p.get('page_url')}: Skipped ({res.get('message', 'not supported')})"})
-            else:
-                logs.append({"agent": "executor", "text": f"Schema inject for {p.get('page_url')}: Success"})
-        except Exception as e:
-            logs.append({"agent": "executor", "text": f"Schema inject FAILED for {p.get('page_url')}: {e}"})
-
-    blog_schedule = ctx.get("agents", {}).get("blog_automation", {}).get("schedule", [])
-    for b in blog_schedule:
-        try:
-            if b.get("draft_content"):
-                draft_content = b["draft_content"]
-            else:
-                with open(b['draft_path'], 'r', encoding='utf-8') as f:
-                    draft_content = f.read()
-            html_content = _markdown_to_html(draft_content)
-            res = client.create_post('blog', b.get('title'), html_content, slug=_slugify(b.get('title', 'post')))
-            if isinstance(res, dict) and res.get("ok") is False:
-                logs.append({"agent": "executor", "text": f"Blog post '{b.get('title')}': Skipped ({res.get('message', 'not supported')})"})
-            else:
-                logs.append({"agent": "executor", "text": f"Blog post '{b.get('title')}': Published as draft"})
-        except Exception as e:
-            logs.append({"agent": "executor", "text": f"Blog post FAILED for '{b.get('title')}': {e}"})
+        logs.append({"agent": "executor", "text": f"Execution setup failed: {e}"})
+        return list(logs)
+
+    ops = _execution_ops(ctx, logs)
+
+    def on_result(op: Operation, entry: dict) -> None:
+        logs.append({"agent": "executor", "text": _execution_message(op, entry)})
+
+    executor = CMSExecutor(session_id, client, platform, on_result=on_result)
+    already_done = len(executor.completed(ops))
+    if already_done:
+        logs.append({"agent": "executor", "text": f"Resuming: {already_done} of {len(ops)} changes were already applied in an earlier run and will not be repeated."})
+    report = await executor.run(ops)
+
+    lines = [f"Execution complete. Applied **{report['done']}**, skipped **{report['skipped']}**, failed **{report['failed']}** of {len(ops) - report['already_done']} changes in {report['elapsed_seconds']}s."]
+    for kind, stats in report["by_kind"].items():
+        if stats["ops_per_second"] is not None:
+            lines.append(f"* {_EXECUTION_LABELS[kind]}: {stats['ops']} at {stats['ops_per_second']}/s, avg {stats['avg_ms']} ms, p95 {stats['p95_ms']} ms, {stats['retries']} retries")
+    if report["failed"]:
+        lines.append("Run the execution again to retry the failed changes; applied changes will not be repeated.")
+    if report["finalize"].get("message"):
+        lines.append(("Finishing the run failed: " if report["finalize"].get("ok") is False else "") + report["finalize"]["message"])
+    final = {"agent": "orchestrator", "text": "\n".join(lines)}
+    if report["finalize"].get("download"):
+        final["text"] += f"\nThe patch pack is ready ({report['finalize'].get('files', 0)} files)."
+        final["actions"] = [{"type": "download_patch_pack", "label": "Download Patch Pack"}]
+    logs.append(final)
+    state = "execution_incomplete" if report["failed"] else "complete"
+    ctx["state"] = state; save_section(session_id, "state", state)
+    return list(logs)
+
+_EXECUTION_LABELS = {"meta": "Meta updates", "schema": "Schema injections", "post": "Blog posts"}
+
+def _execution_ops(ctx: dict, logs: list) -> list[Operation]:
+    """The approved proposals as executor operations; proposals that cannot be applied are logged and left out."""
+    ops = []
+    for item in ctx.get("agents", {}).get("meta_optimization", {}).get("proposals", []):
+        title, description = item['after']['title'], item['after']['description']
+        ops.append(Operation("meta", item['page_url'], {"title": title, "description": description},
+                             lambda c, url=item['page_url'], title=title, description=description: c.update_page_meta(url, title, description)))
+
+    for p in ctx.get("agents", {}).get("onpage_seo", {}).get("proposals", []):
+        if "proposed_schema" not in p:
+            logs.append({"agent": "executor", "text": f"Schema inject skipped for {p.get('page_url')}: no generated schema was available"})
+            continue
+        schema = p.get('proposed_schema', {})
+        ops.append(Operation("schema", p.get('page_url'), schema,
+                             lambda c, url=p.get('page_url'), schema=schema: c.inject_json_ld(url, schema)))
+
+    for b in ctx.get("agents", {}).get("blog_automation", {}).get("schedule", []):
+        ops.append(Operation("post", b.get('title'), {"slug": _slugify(b.get('title', 'post')), "draft": b.get("draft_content") or b.get("draft_path")},
+                             lambda c, b=b: c.create_post('blog', b.get('title'), _markdown_to_html(_draft_content(b)), slug=_slugify(b.get('title', 'post')))))
+    return ops
+
+def _draft_content(b: dict) -> str:
+    if b.get("draft_content"):
+        return b["draft_content"]
+    with open(b['draft_path'], 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _execution_message(op: Operation, entry: dict) -> str:
+    status, reason = entry["status"], entry.get("message") or "not supported"
+    if op.kind == "post":
+        if status == "failed":
+            return f"Blog post FAILED for '{op.target}': {entry.get('error')}"
+        return f"Blog post '{op.target}': Skipped ({reason})" if status == "skipped" else f"Blog post '{op.target}': {entry.get('message') or 'Published as draft'}"
+    label = "Meta update" if op.kind == "meta" else "Schema inject"
+    if status == "failed":
+        return f"{label} FAILED for {op.target}: {entry.get('error')}"
+    return f"{label} for {op.target}: Skipped ({reason})" if status == "skipped" else f"{label} for {op.target}: {entry.get('message') or 'Success'}"
 
-    logs.append({"agent": "orchestrator", "text": "Execution complete. All tasks finished."})
-    ctx["state"] = "complete"; save_context(session_id, ctx)
-    return logs
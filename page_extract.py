@@ -0,0 +1,693 @@
+# page_extract.py
+"""
+Single-pass page extraction engines used by the crawler.
+
+Every engine feeds the same `_PageCollector`, which gathers the title, meta
+description, canonical, headings, links and image-alt stats while the
+document is parsed once; the platform and SEO plugin come from one regex
+scan of the raw page and its response headers (see fingerprints). The same pass builds a
+compact copy of the body (no scripts, styles or presentational markup,
+collapsed whitespace) held to PAGE_TOKEN_BUDGET; that is what pages store
+as "html" and what prompts are built from. The word count and the SimHash
+fingerprint of the body text (see near_duplicates) come from the same pass. The "bs4" engine
+takes the crawler's original BeautifulSoup route to the same fields. The
+benchmark times every engine against it and checks they all agree:
+
+    python page_extract.py [page.html ...]
+
+These fields cost more than the six the crawler used to read (title, meta
+description, canonical, h1, h2, links): on an 80 KB page the default engine
+takes about a third longer than that extraction did, mostly in the body
+compaction, the SimHash and the fingerprint scan. It is still well ahead of
+"bs4" doing the same work.
+"""
+
+import hashlib, html as _html, json, os, re, sys, time
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+from yarl import URL
+from fingerprints import PLATFORM, SEO_PLUGIN, detect as detect_fingerprints
+from near_duplicates import simhash
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # pragma: no cover - lxml is in requirements.txt
+    _lxml_etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except ImportError:
+    _SelectolaxParser = None
+
+# Hard cap on the compact html, whatever PAGE_TOKEN_BUDGET says.
+MAX_HTML_CHARS = 50000
+# Bump whenever extract_page_data's output changes; cached pages from an
+# older version are re-parsed from their stored body.
+PAGE_SCHEMA_VERSION = 9
+MAX_IMAGES_WITHOUT_ALT = 50
+_HEADING_LIMITS = {"h1": 2, "h2": 6}
+_SKIP_TEXT_TAGS = {"script", "style"}
+
+# Compaction: subtrees dropped outright, tags kept (with these attributes),
+# everything else is unwrapped to its text.
+_DROP_SUBTREE_TAGS = {"head", "script", "style", "noscript", "template", "svg", "iframe", "object", "embed", "canvas", "select", "title"}
+_KEEP_TAGS = {
+    "header", "nav", "main", "article", "section", "aside", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "p", "ul", "ol", "li", "dl", "dt", "dd",
+    "a", "img", "strong", "em", "b", "i", "blockquote", "pre", "code",
+    "table", "thead", "tbody", "tr", "th", "td", "figure", "figcaption", "br", "hr",
+}
+_KEEP_ATTRS = {"a": ("href",), "img": ("src", "alt")}
+_VOID_TAGS = {"img", "br", "hr"}
+_PROTECTED_TEXT_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+# Tags an open element of the same name implicitly closes (the stdlib tokenizer does not repair these).
+_IMPLIED_END_TAGS = {"p", "li", "dt", "dd", "tr", "td", "th"}
+_INLINE_TAGS = {"a", "strong", "em", "b", "i", "code"}
+_EMPTY_ELEMENT = re.compile(r"<(%s)>\s*</\1>" % "|".join(sorted(_KEEP_TAGS - _VOID_TAGS)))
+_WS = re.compile(r"\s+")
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token; close enough for budgeting without a tokenizer."""
+    return (len(text) + 3) // 4
+
+def page_token_budget() -> int:
+    try:
+        return max(100, int(os.environ.get("PAGE_TOKEN_BUDGET", "3000")))
+    except ValueError:
+        return 3000
+
+def normalize_url(base: str, href: str) -> Optional[str]:
+    if not href:
+        return None
+    try:
+        u = URL(href)
+        if not u.scheme:
+            u = URL(urljoin(base, href))
+        # Drop fragments, normalize
+        u = u.with_fragment(None)
+        return str(u)
+    except Exception:
+        return None
+
+def guess_slug(url: str) -> str:
+    path = URL(url).path
+    if not path or path == "/":
+        return "index"
+    return path.strip("/").replace("/", "-")
+
+# -------- Compaction -------- #
+class _Compactor:
+    """
+    Start/end/data sink that records the body outline as a list of pieces,
+    then renders it within a character budget: paragraph text is shortened
+    evenly first (headings are kept whole), and only if the markup alone is
+    still too large is the tail cut, closing any open elements.
+    """
+    def __init__(self):
+        self.pieces: List[tuple] = []   # ("open", tag, markup) | ("close", tag) | ("void", markup) | ("text", str, protected)
+        self._stack: List[str] = []
+        self._drop_depth = 0
+        self._protected = 0
+        self.word_count = 0  # visible body words, before any shortening
+
+    def start(self, tag: str, attrs: Dict[str, Optional[str]]):
+        if tag == "body":
+            self._drop_depth = 0  # an unclosed <head> ends here
+            return
+        if tag in _DROP_SUBTREE_TAGS:
+            self._drop_depth += 1
+            return
+        if self._drop_depth or tag not in _KEEP_TAGS:
+            return
+        if tag in _IMPLIED_END_TAGS:
+            for open_tag in reversed(self._stack):
+                if open_tag == tag:
+                    self.end(tag)
+                    break
+                if open_tag not in _INLINE_TAGS:
+                    break
+        markup = tag
+        for name in _KEEP_ATTRS.get(tag, ()):
+            value = attrs.get(name)
+            if value:
+                markup += f' {name}="{_html.escape(value.strip(), quote=True)}"'
+        if tag in _VOID_TAGS:
+            self.pieces.append(("void", f"<{markup}>"))
+            return
+        self.pieces.append(("open", tag, f"<{markup}>"))
+        self._stack.append(tag)
+        if tag in _PROTECTED_TEXT_TAGS:
+            self._protected += 1
+
+    def end(self, tag: str):
+        if tag in _DROP_SUBTREE_TAGS:
+            self._drop_depth = max(0, self._drop_depth - 1)
+            return
+        if self._drop_depth or tag not in self._stack:
+            return
+        while self._stack:
+            open_tag = self._stack.pop()
+            self.pieces.append(("close", open_tag))
+            if open_tag in _PROTECTED_TEXT_TAGS:
+                self._protected -= 1
+            if open_tag == tag:
+                break
+
+    def data(self, text: str):
+        if self._drop_depth:
+            return
+        text = _WS.sub(" ", text)
+        if text.strip():
+            self.word_count += len(text.split())
+            self.pieces.append(("text", _html.escape(text, quote=False), self._protected > 0))
+        elif self.pieces and self.pieces[-1][0] == "text" and not self.pieces[-1][1].endswith(" "):
+            self.pieces.append(("text", " ", True))
+
+    def comment(self, text: str):
+        pass
+
+    def text(self) -> str:
+        """All body text, unshortened."""
+        return _html.unescape("".join(p[1] for p in self.pieces if p[0] == "text"))
+
+    def render(self, budget_chars: int) -> str:
+        while self._stack:
+            self.end(self._stack[-1])
+        budget_chars = max(0, budget_chars - len("<body></body>"))
+        cap = self._text_cap(budget_chars)
+        out: List[str] = []
+        size = closing = 0  # closing: length of the end tags the open elements still need
+        stack: List[str] = []
+        for piece in self.pieces:
+            kind = piece[0]
+            if kind == "text":
+                chunk = piece[1] if piece[2] or cap is None else _shorten(piece[1], cap)
+            elif kind == "open":
+                chunk = piece[2]
+            elif kind == "close":
+                chunk = f"</{piece[1]}>"
+            else:
+                chunk = piece[1]
+            if kind != "close" and size + len(chunk) + closing > budget_chars:
+                break
+            if kind == "open":
+                stack.append(piece[1])
+                closing += len(piece[1]) + 3
+            elif kind == "close":
+                closing -= len(stack.pop()) + 3
+            out.append(chunk)
+            size += len(chunk)
+        out.extend(f"</{t}>" for t in reversed(stack))
+        body = "".join(out)
+        for _ in range(3):
+            body, n = _EMPTY_ELEMENT.subn("", body)
+            if not n:
+                break
+        return f"<body>{_WS.sub(' ', body).strip()}</body>"
+
+    def _text_cap(self, budget_chars: int) -> Optional[int]:
+        """Largest per-text-node length that fits the budget, or None when no shortening is needed."""
+        lengths = [len(p[1]) for p in self.pieces if p[0] == "text" and not p[2]]
+        fixed = sum(len(p[2]) if p[0] == "open" else len(p[1]) + 3 if p[0] == "close" else len(p[1])
+                    for p in self.pieces if p[0] != "text" or p[2])
+        if fixed + sum(lengths) <= budget_chars:
+            return None
+        allowance = budget_chars - fixed
+        lo, hi = 0, max(lengths, default=0)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if sum(min(n, mid) for n in lengths) <= allowance:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+def _shorten(text: str, cap: int) -> str:
+    if len(text) <= cap:
+        return text
+    if cap < 8:
+        return ""
+    cut = text[:cap - 1]
+    space = cut.rfind(" ")
+    if space > cap // 2:
+        cut = cut[:space]
+    # Never leave half an entity behind.
+    amp = cut.rfind("&")
+    if amp != -1 and ";" not in cut[amp:]:
+        cut = cut[:amp]
+    return cut.rstrip() + "…"
+
+def _compact_budget_chars() -> int:
+    return min(MAX_HTML_CHARS, page_token_budget() * 4)
+
+def _body_digest(compactor: _Compactor, text: str) -> str:
+    """
+    Digest of the body text (whitespace removed) and of the links and images
+    it contains. Unlike compact_html it does not depend on how a parser
+    repairs malformed markup: lxml closes an open <p> before a block,
+    html.parser nests it, selectolax adds <tbody> / <tr>, reopens misnested
+    inline tags and turns a stray </br> into <br>. Text stranded directly
+    inside <table>, which HTML5 parsers (selectolax) move in front of the
+    table, is the one known case it still differs on.
+    """
+    refs = sorted({p[-1] for p in compactor.pieces
+                   if (p[0] == "open" and p[1] == "a") or (p[0] == "void" and p[1].startswith("<img"))})
+    return hashlib.sha256("\x00".join(["".join(text.split())] + refs).encode("utf-8")).hexdigest()
+
+def _body_fields(compactor: _Compactor) -> Dict:
+    """The fields every engine derives from the body outline."""
+    text = compactor.text()
+    return {
+        "compact_html": compactor.render(_compact_budget_chars()),
+        "word_count": compactor.word_count,
+        "text_fingerprint": simhash(text),
+        "body_digest": _body_digest(compactor, text),
+    }
+
+def _compactor_for(html: str) -> _Compactor:
+    compactor = _Compactor()
+    parser = _StdlibAdapter(compactor)
+    parser.feed(html)
+    parser.close()
+    return compactor
+
+def compact_html(html: str, budget_tokens: Optional[int] = None) -> str:
+    """Compact body outline of `html` (standard-library tokenizer)."""
+    budget = min(MAX_HTML_CHARS, budget_tokens * 4) if budget_tokens else _compact_budget_chars()
+    return _compactor_for(html).render(budget)
+
+# -------- Collector -------- #
+class _PageCollector:
+    """
+    Parser target (lxml `target=` interface) that collects every field of a
+    page in one pass. Text is flushed per text node so headings match
+    BeautifulSoup's `get_text(" ", strip=True)`.
+    """
+    def __init__(self, url: str, compact: bool = True):
+        self.url = url
+        self.title: Optional[str] = None
+        self.meta_description: Optional[str] = None
+        self.canonical: Optional[str] = None
+        self.headings: Dict[str, List[str]] = {tag: [] for tag in _HEADING_LIMITS}
+        self.links: List[str] = []
+        self.image_count = 0
+        self.images_missing_alt = 0
+        self.images_without_alt: List[str] = []
+        self._title_parts: Optional[List[str]] = None
+        self._open_text: List[tuple] = []  # (tag, parts) for open title/heading elements
+        self._buf: List[str] = []
+        self._skip_depth = 0
+        self.compactor = _Compactor() if compact else None
+
+    def _flush(self):
+        if not self._buf:
+            return
+        text = "".join(self._buf)
+        self._buf = []
+        if self._skip_depth:
+            return
+        for _, parts in self._open_text:
+            parts.append(text)
+
+    def start(self, tag: str, attrs: Dict[str, Optional[str]]):
+        self._flush()
+        tag = tag.lower()
+        if self.compactor is not None:
+            self.compactor.start(tag, attrs)
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+        elif tag == "a":
+            link = normalize_url(self.url, attrs.get("href"))
+            if link:
+                self.links.append(link)
+        elif tag == "img":
+            self.image_count += 1
+            src = attrs.get("src")
+            if src and not (attrs.get("alt") or "").strip():
+                self.images_missing_alt += 1
+                if len(self.images_without_alt) < MAX_IMAGES_WITHOUT_ALT:
+                    self.images_without_alt.append(src)
+        elif tag in _HEADING_LIMITS:
+            if len(self.headings[tag]) < _HEADING_LIMITS[tag]:
+                self._open_text.append((tag, []))
+        elif tag == "title":
+            if self.title is None and self._title_parts is None:
+                self._title_parts = []
+                self._open_text.append((tag, self._title_parts))
+        elif tag == "meta":
+            if self.meta_description is None and attrs.get("name") == "description":
+                self.meta_description = (attrs.get("content") or "").strip()[:300]
+        elif tag == "link":
+            if self.canonical is None and "canonical" in (attrs.get("rel") or "").lower().split():
+                self.canonical = normalize_url(self.url, attrs.get("href")) or ""
+
+    def end(self, tag: str):
+        self._flush()
+        tag = tag.lower()
+        if self.compactor is not None:
+            self.compactor.end(tag)
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        for i in range(len(self._open_text) - 1, -1, -1):
+            open_tag, parts = self._open_text[i]
+            if open_tag != tag:
+                continue
+            del self._open_text[i]
+            if tag == "title":
+                self.title = "".join(parts).strip()[:120]
+                self._title_parts = None
+            elif len(self.headings[tag]) < _HEADING_LIMITS[tag]:
+                self.headings[tag].append(" ".join(p.strip() for p in parts if p.strip()))
+            break
+
+    def data(self, text: str):
+        self._buf.append(text)
+        if self.compactor is not None:
+            self.compactor.data(text)
+
+    def comment(self, text: str):
+        self._flush()
+
+    def close(self) -> Dict:
+        self._flush()
+        # Unterminated elements (truncated HTML) still count, like BeautifulSoup.
+        for tag, parts in list(self._open_text):
+            self.end(tag)
+        return {
+            "title": self.title or "",
+            "meta_description": self.meta_description or "",
+            "canonical": self.canonical or "",
+            "h1": self.headings["h1"],
+            "h2": self.headings["h2"],
+            "internal_links": self.links,
+            "image_stats": {"total": self.image_count, "missing_alt": self.images_missing_alt},
+            "images_without_alt": self.images_without_alt,
+            **(_body_fields(self.compactor) if self.compactor is not None else {}),
+        }
+
+class _StdlibAdapter(HTMLParser):
+    """Feeds a `_PageCollector` (or `_Compactor`) from the standard-library HTML tokenizer."""
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag, dict(attrs))
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+    def handle_comment(self, data):
+        self.collector.comment(data)
+
+# -------- Engines -------- #
+def _extract_html_parser(url: str, html: str) -> Dict:
+    collector = _PageCollector(url)
+    parser = _StdlibAdapter(collector)
+    parser.feed(html)
+    parser.close()
+    return collector.close()
+
+def _lxml_text_parts(node) -> List[str]:
+    """The text nodes under an lxml element in document order, without script / style text or comments."""
+    parts = [node.text] if node.text and node.tag not in _SKIP_TEXT_TAGS else []
+    for child in node:
+        if isinstance(child.tag, str):
+            parts.extend(_lxml_text_parts(child))
+        if child.tail:
+            parts.append(child.tail)
+    return parts
+
+def _walk_lxml(node, sink) -> None:
+    """Replays an lxml subtree as start/data/end events, skipping the subtrees the compactor drops."""
+    stack: List = [node]  # elements to open, (tag,) to close, or text
+    while stack:
+        item = stack.pop()
+        if type(item) is str:
+            sink.data(item)
+        elif type(item) is tuple:
+            sink.end(item[0])
+        else:
+            sink.start(item.tag, item.attrib)
+            if item.text:
+                sink.data(item.text)
+            stack.append((item.tag,))
+            for child in reversed(item):
+                # A comment or dropped subtree still ends in text that belongs here.
+                if child.tail:
+                    stack.append(child.tail)
+                if isinstance(child.tag, str) and child.tag not in _DROP_SUBTREE_TAGS:
+                    stack.append(child)
+
+def _lxml_tree(html: str):
+    try:
+        return _lxml_etree.fromstring(html, _lxml_etree.HTMLParser(no_network=True, recover=True))
+    except ValueError:  # a str with an encoding declaration
+        return _lxml_etree.fromstring(html.encode("utf-8"), _lxml_etree.HTMLParser(encoding="utf-8", no_network=True, recover=True))
+
+def _extract_lxml(url: str, html: str) -> Dict:
+    """
+    Parses into lxml's C tree, then hands the collector only the elements it
+    reads and replays just the body to the compactor, so Python sees a
+    fraction of the events a parser target would get.
+    """
+    collector = _PageCollector(url, compact=False)
+    compactor = _Compactor()
+    root = _lxml_tree(html) if html.strip() else None
+    if root is not None:
+        for node in root.iter("title", "h1", "h2", "a", "img", "meta", "link"):
+            tag = node.tag
+            if tag in ("title", "h1", "h2"):
+                collector.start(tag, {})
+                for part in _lxml_text_parts(node):
+                    collector.data(part)
+                    collector._flush()
+                collector.end(tag)
+            else:
+                collector.start(tag, node.attrib)
+        body = root.find("body")
+        if body is not None:
+            _walk_lxml(body, compactor)
+    fields = collector.close()
+    fields.update(_body_fields(compactor))
+    return fields
+
+def _walk_selectolax(node, sink) -> None:
+    """Replays a selectolax subtree as start/data/end events."""
+    stack = [(node, False)]
+    while stack:
+        current, closing = stack.pop()
+        tag = current.tag
+        if closing:
+            sink.end(tag)
+        elif tag == "-text":
+            sink.data(current.text_content or "")
+        elif tag.startswith("-") or tag in _DROP_SUBTREE_TAGS:
+            continue
+        else:
+            sink.start(tag, current.attributes)
+            stack.append((current, True))
+            stack.extend((child, False) for child in reversed(list(current.iter(include_text=True))))
+
+def _extract_selectolax(url: str, html: str) -> Dict:
+    collector = _PageCollector(url, compact=False)
+    tree = _SelectolaxParser(html)
+    root = tree.root
+    if root is not None:
+        for node in root.traverse(include_text=False):
+            tag = node.tag
+            if tag in ("title", "h1", "h2"):
+                # One text node per chunk, so headings join the same way as get_text(" ", strip=True).
+                collector.start(tag, {})
+                for chunk in node.text(deep=True, separator="\x00", strip=tag != "title").split("\x00"):
+                    collector.data(chunk)
+                    collector._flush()
+                collector.end(tag)
+            elif tag in ("a", "img", "meta", "link"):
+                collector.start(tag, node.attributes)
+    fields = collector.close()
+    compactor = _Compactor()
+    if tree.body is not None:
+        _walk_selectolax(tree.body, compactor)
+    fields.update(_body_fields(compactor))
+    return fields
+
+def _walk_bs4(node, sink) -> None:
+    """Replays a BeautifulSoup subtree as start/data/end events, without comments or doctypes."""
+    from bs4.element import NavigableString, PreformattedString
+    stack: List = [node]  # tags to open, (name,) to close, or strings
+    while stack:
+        item = stack.pop()
+        if isinstance(item, NavigableString):
+            sink.data(str(item))
+        elif type(item) is tuple:
+            sink.end(item[0])
+        else:
+            sink.start(item.name, item.attrs)
+            stack.append((item.name,))
+            for child in reversed(item.contents):
+                if isinstance(child, NavigableString):
+                    if not isinstance(child, PreformattedString):
+                        stack.append(child)
+                elif child.name not in _DROP_SUBTREE_TAGS:
+                    stack.append(child)
+
+def _extract_bs4(url: str, html: str) -> Dict:
+    """The original BeautifulSoup path: one tree, then one find pass per field."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    compactor = _Compactor()
+    if soup.body is not None:
+        _walk_bs4(soup.body, compactor)
+    title = (soup.title.string.strip() if soup.title and soup.title.string else "")[:120]
+    meta_desc = ""
+    m = soup.find("meta", attrs={"name":"description"})
+    if m and m.get("content"):
+        meta_desc = m.get("content").strip()[:300]
+    canonical = ""
+    c = soup.find("link", rel=lambda v: v and "canonical" in v.lower().split())
+    if c and c.get("href"):
+        canonical = normalize_url(url, c.get("href")) or ""
+    h1 = [h.get_text(" ", strip=True) for h in soup.find_all("h1")][:2]
+    h2 = [h.get_text(" ", strip=True) for h in soup.find_all("h2")][:6]
+    links = []
+    for a in soup.find_all("a", href=True):
+        u = normalize_url(url, a["href"])
+        if u:
+            links.append(u)
+    images = soup.find_all("img")
+    missing = [img.get("src", "") for img in images if img.get("src") and not img.get("alt", "").strip()]
+    return {
+        "title": title,
+        "meta_description": meta_desc,
+        "canonical": canonical,
+        "h1": h1,
+        "h2": h2,
+        "internal_links": links,
+        "image_stats": {"total": len(images), "missing_alt": len(missing)},
+        "images_without_alt": missing[:MAX_IMAGES_WITHOUT_ALT],
+        **_body_fields(compactor),
+    }
+
+ENGINES: Dict[str, Callable[[str, str], Dict]] = {"bs4": _extract_bs4, "html.parser": _extract_html_parser}
+if _lxml_etree is not None:
+    ENGINES["lxml"] = _extract_lxml
+if _SelectolaxParser is not None:
+    ENGINES["selectolax"] = _extract_selectolax
+
+def default_engine() -> str:
+    """
+    Engine named by CRAWL_EXTRACTOR, or the fastest one installed for
+    "auto": lxml, which the benchmark puts ahead of selectolax (whose body
+    has to be replayed node by node from Python), html.parser and, last,
+    bs4.
+    """
+    name = os.environ.get("CRAWL_EXTRACTOR", "auto").strip().lower() or "auto"
+    if name != "auto" and name in ENGINES:
+        return name
+    for candidate in ("lxml", "selectolax", "html.parser"):
+        if candidate in ENGINES:
+            return candidate
+    return "bs4"
+
+def content_hash(fields: Dict) -> str:
+    """
+    Hash of everything the proposal agents read from a page; equal hashes mean
+    nothing to redo. The body enters as its digest rather than compact_html,
+    so pages with the usual broken markup (omitted end tags, no <tbody>,
+    misnested inline tags) hash the same whichever engine is installed.
+    Badly broken markup (headings left open across blocks, text loose in a
+    <table>) can still hash differently per engine.
+    """
+    material = [fields.get(k) for k in ("title", "meta_description", "canonical", "h1", "h2", "images_without_alt", "body_digest")]
+    return hashlib.sha256(json.dumps(material, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def extract_page_data(url: str, html: str, engine: Optional[str] = None, headers: Optional[Dict[str, str]] = None) -> Dict:
+    fields = ENGINES.get(engine or default_engine(), ENGINES["bs4"])(url, html)
+    title = fields["title"]
+    compact = fields["compact_html"]
+    fingerprint = detect_fingerprints(html, headers)
+    return {
+        "url": url,
+        "slug": guess_slug(url),
+        "title": title,
+        "platform": fingerprint[PLATFORM][0],
+        "platform_confidence": fingerprint[PLATFORM][1],
+        "seo_plugin": fingerprint[SEO_PLUGIN][0],
+        "seo_plugin_confidence": fingerprint[SEO_PLUGIN][1],
+        "meta_title": title or "",
+        "meta_description": fields["meta_description"],
+        "canonical": fields["canonical"],
+        "h1": fields["h1"],
+        "h2": fields["h2"],
+        "internal_links": fields["internal_links"],
+        "image_stats": fields["image_stats"],
+        "images_without_alt": fields["images_without_alt"],
+        "word_count": fields["word_count"],
+        "text_fingerprint": fields["text_fingerprint"],
+        "content_hash": content_hash(fields),
+        "html": compact,
+        "html_tokens": {"raw": estimate_tokens(html), "compact": estimate_tokens(compact), "budget": page_token_budget()},
+    }
+
+# -------- Benchmark -------- #
+# What extract_page_data returns that all engines must agree on; the compact
+# html may differ with how each parser repairs broken markup (see _body_digest).
+_COMPARED_FIELDS = ("title", "platform", "seo_plugin", "meta_description", "canonical", "h1", "h2", "internal_links",
+                    "image_stats", "images_without_alt", "word_count", "text_fingerprint", "content_hash")
+
+def benchmark(docs: List[tuple], engines: Optional[List[str]] = None, repeat: int = 3) -> Dict[str, Dict]:
+    """
+    Times each engine over `docs` [(url, html), ...] and reports, per engine,
+    the mean milliseconds per page, the speedup over "bs4" (the crawler's
+    original BeautifulSoup route) and which fields differ from its output.
+    """
+    def timed(name: str) -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for u, h in docs:
+                extract_page_data(u, h, engine=name)
+            best = min(best, time.perf_counter() - started)
+        return best * 1000 / max(len(docs), 1)
+
+    baseline = [extract_page_data(u, h, engine="bs4") for u, h in docs]
+    bs4_ms = timed("bs4")
+    report: Dict[str, Dict] = {}
+    for name in ["bs4"] + [e for e in engines or list(ENGINES) if e != "bs4"]:
+        ms = bs4_ms if name == "bs4" else timed(name)
+        mismatches = set()
+        for (u, h), expected in zip(docs, baseline):
+            got = extract_page_data(u, h, engine=name)
+            mismatches.update(k for k in _COMPARED_FIELDS if got[k] != expected[k])
+        report[name] = {"ms_per_page": round(ms, 3), "speedup": round(bs4_ms / ms, 2) if ms else None,
+                        "mismatched_fields": sorted(mismatches)}
+    return report
+
+def _sample_page(n_links: int = 400) -> str:
+    links = "".join(f'<li><a href="/section/{i}#frag">Item {i}</a><img src="/img/{i}.png"></li>' for i in range(n_links))
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    return (
+        '<html><head><title> Sample Page </title><meta name="description" content="A sample page.">'
+        f'<link rel="canonical" href="/sample"><style>body{{color:red}}</style>{script}</head>'
+        f'<body><h1>Main <span>heading</span></h1><h2>First</h2><h2>Second</h2><ul>{links}</ul></body></html>'
+    )
+
+if __name__ == "__main__":
+    docs = []
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            docs.append((f"https://example.com/{os.path.basename(path)}", f.read()))
+    if not docs:
+        docs = [("https://example.com/sample", _sample_page())]
+    for name, row in benchmark(docs).items():
+        print(f"{name:12s} {row['ms_per_page']:>9.3f} ms/page  x{row['speedup']:<6} mismatches={row['mismatched_fields'] or 'none'}")
@@ -1,27 +1,136 @@
-
 from typing import Any, Dict, List, Tuple, Optional
-import json, zipfile, io, os
+import hashlib, html, json, os, pathlib, re, threading, time, zipfile
+from urllib.parse import urlparse
 from cms_base import CMSClient
+from context_store import BASE_DIR
+
+PACK_DIR = os.environ.get("PATCH_PACK_DIR") or str(pathlib.Path(BASE_DIR) / "patch_packs")
+# Finished packs kept per session; older ones are deleted when a new one is published.
+PACKS_KEPT = max(1, int(os.environ.get("PATCH_PACKS_KEPT", "5")))
+
+def pack_dir(session_id: str) -> pathlib.Path:
+    return pathlib.Path(PACK_DIR) / re.sub(r"[^A-Za-z0-9_-]", "_", session_id or "default")
+
+def _packs(session_id: str) -> List[pathlib.Path]:
+    """A session's finished packs, newest first (by modification time; names only break ties)."""
+    packs = []
+    for path in pack_dir(session_id).glob("*.zip") if pack_dir(session_id).is_dir() else []:
+        try:
+            packs.append((path.stat().st_mtime, path.name, path))
+        except OSError:
+            continue
+    return [path for _, _, path in sorted(packs, reverse=True)]
+
+def latest_pack(session_id: str) -> Optional[pathlib.Path]:
+    """The newest finished pack of a session."""
+    packs = _packs(session_id)
+    return packs[0] if packs else None
+
+def _prune_packs(session_id: str, keep: int = PACKS_KEPT) -> None:
+    for path in _packs(session_id)[keep:]:
+        path.unlink(missing_ok=True)
 
 class PatchPackAdapter(CMSClient):
-    """No creds. Produces a ZIP with patches & instructions."""
+    """
+    No creds. Every operation of a run is written straight into one ZIP on
+    disk (deflated once, as it arrives): per-page head patches and JSON-LD
+    files, blog HTML, redirects and a manifest.json listing every file. The
+    archive is completed in finalize() and served by the patch-pack endpoint.
+    A pack is a complete artifact, so every run packs all current proposals
+    rather than only those not yet in an earlier pack.
+    """
+    RESUMABLE = False
+
     def __init__(self, creds):
         self.creds = creds or {}
-    def _zip_bytes(self, files: Dict[str, str]) -> bytes:
-        buf = io.BytesIO()
-        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
-            for path, content in files.items():
-                z.writestr(path, content)
-        return buf.getvalue()
+        self.session_id = self.creds.get("session_id") or "default"
+        self.site_url = self.creds.get("site_url") or ""
+        self._lock = threading.Lock()
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._path: Optional[pathlib.Path] = None
+        self._names: set = set()
+        self._entries: List[Dict[str, Any]] = []
+        self._redirects: List[Tuple[str, str, int]] = []
+
+    def _open(self) -> zipfile.ZipFile:
+        if self._zip is None:
+            directory = pack_dir(self.session_id)
+            directory.mkdir(parents=True, exist_ok=True)
+            self._path = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.zip"
+            self._zip = zipfile.ZipFile(str(self._path) + ".part", "w", zipfile.ZIP_DEFLATED)
+        return self._zip
+
+    def _unique(self, name: str) -> str:
+        stem, dot, ext = name.rpartition(".")
+        candidate, n = name, 1
+        while candidate in self._names:
+            n += 1
+            candidate = f"{stem}-{n}{dot}{ext}"
+        self._names.add(candidate)
+        return candidate
+
+    def _write(self, name: str, content: str) -> Dict[str, Any]:
+        data = content.encode("utf-8")
+        with self._lock:
+            name = self._unique(name)
+            self._open().writestr(name, data)
+        return {"path": name, "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+    def _stage(self, kind: str, target: str, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            self._entries.append({"kind": kind, "target": target, "files": files})
+        return {"ok": True, "staged": True, "message": "Added to patch pack: " + ", ".join(f["path"] for f in files)}
+
+    @staticmethod
+    def _page_dir(page_id_or_path: str) -> str:
+        path = urlparse(page_id_or_path).path if "://" in page_id_or_path else page_id_or_path
+        parts = [re.sub(r"[^A-Za-z0-9._-]", "_", p) for p in path.split("/") if p and p not in (".", "..")]
+        return "pages/" + ("/".join(parts) or "_home")
+
     def update_page_meta(self, page_id_or_path: str, title=None, description=None, canonical=None):
-        files = {"instructions.md": "Edit head tags accordingly."}
-        return {"ok": True, "zip": True, "bytes_len": len(self._zip_bytes(files))}
+        tags = [f"<!-- {html.escape(page_id_or_path)}: replace these tags in <head> -->"]
+        if title: tags.append(f"<title>{html.escape(title)}</title>")
+        if description: tags.append(f'<meta name="description" content="{html.escape(description)}">')
+        if canonical: tags.append(f'<link rel="canonical" href="{html.escape(canonical)}">')
+        file = self._write(f"{self._page_dir(page_id_or_path)}/head.html", "\n".join(tags) + "\n")
+        return self._stage("meta", page_id_or_path, [file])
+
     def inject_json_ld(self, page_id_or_path: str, json_ld):
-        files = {"instructions.md": "Paste JSON-LD into head."}
-        return {"ok": True, "zip": True, "bytes_len": len(self._zip_bytes(files))}
+        script = f'<script type="application/ld+json">\n{json.dumps(json_ld, indent=2, ensure_ascii=False)}\n</script>\n'
+        file = self._write(f"{self._page_dir(page_id_or_path)}/schema.jsonld.html", script)
+        return self._stage("schema", page_id_or_path, [file])
+
     def create_post(self, collection_or_path: str, title: str, html: str, slug: str=None, date: str=None, meta=None):
-        files = {f"{slug or 'post'}.html": html, "instructions.md": "Upload this file."}
-        return {"ok": True, "zip": True, "bytes_len": len(self._zip_bytes(files))}
+        file = self._write(f"posts/{re.sub(r'[^A-Za-z0-9_-]', '-', slug or 'post')}.html", html)
+        return self._stage("post", title, [file])
+
     def set_redirects(self, redirects):
-        files = {"redirects.txt": "\n".join([f"{a} -> {b} {c}" for a,b,c in redirects])}
-        return {"ok": True, "zip": True, "bytes_len": len(self._zip_bytes(files))}
+        with self._lock:
+            self._redirects.extend(redirects)
+        return {"ok": True, "staged": True, "message": f"{len(redirects)} redirect(s) added to patch pack"}
+
+    def finalize(self) -> Dict[str, Any]:
+        """Writes redirects, README and manifest, then publishes the archive."""
+        if self._zip is None and not self._redirects:
+            return {"ok": True, "files": 0, "message": "There are no changes to put in a patch pack."}
+        if self._redirects:
+            rows = ["from,to,status"] + [f"{a},{b},{c}" for a, b, c in self._redirects]
+            self._entries.append({"kind": "redirects", "target": self.site_url, "files": [self._write("redirects.csv", "\n".join(rows) + "\n")]})
+        readme = (
+            "# FieldNote patch pack\n\n"
+            "* `pages/<path>/head.html`: replace the page's <title>, meta description and canonical with these tags.\n"
+            "* `pages/<path>/schema.jsonld.html`: paste this script tag into the page's <head>.\n"
+            "* `posts/<slug>.html`: new blog posts, ready to upload.\n"
+            "* `redirects.csv`: redirects for your server or hosting provider.\n"
+            "* `manifest.json`: every file in this pack with its size and SHA-256.\n"
+        )
+        self._write("README.md", readme)
+        manifest = {"site_url": self.site_url, "session_id": self.session_id,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "operations": self._entries}
+        self._write("manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False))
+        self._zip.close()
+        os.replace(str(self._path) + ".part", self._path)
+        _prune_packs(self.session_id)
+        files = sum(len(e["files"]) for e in self._entries)
+        return {"ok": True, "artifact": str(self._path), "files": files, "bytes": self._path.stat().st_size,
+                "download": f"/api/session/{self.session_id}/patch-pack"}
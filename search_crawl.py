@@ -1,44 +1,33 @@
 """search_crawl.py"""
 
-import asyncio, re, time, json, hashlib
+import asyncio, re, time, json, hashlib, os, atexit
+import multiprocessing
+from collections import Counter
+from contextlib import aclosing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass, field
-from typing import List, Set, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Set, Dict, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import aiohttp
-from aiolimiter import AsyncLimiter
 from bs4 import BeautifulSoup
 import requests
 import tldextract
 from yarl import URL
 import urllib.robotparser as robotparser
-from context_store import save_context
+from context_store import load_context, page_hashes, save_context, PageSink
+from http_cache import HttpCache, http_cache_enabled
+from crawl_frontier import HostFrontier, THROTTLE_STATUSES, host_key, parse_retry_after
+from page_extract import MAX_HTML_CHARS, normalize_url, guess_slug, extract_page_data
+from fingerprints import SiteFingerprint
+from seo_index import SeoIndex, load_index, page_key
 # -------- Utility -------- #
 USER_AGENT = "VibeCrawler/1.0 (+https://example.com; contact: ops@vibe.local)"
-MAX_HTML_CHARS = 50000
-
-def normalize_url(base: str, href: str) -> Optional[str]:
-    if not href:
-        return None
-    try:
-        u = URL(href)
-        if not u.scheme:
-            u = URL(urljoin(base, href))
-        # Drop fragments, normalize
-        u = u.with_fragment(None)
-        return str(u)
-    except Exception:
-        return None
 
 def same_reg_domain(a: str, b: str) -> bool:
     ea, eb = tldextract.extract(a), tldextract.extract(b)
     return (ea.domain, ea.suffix) == (eb.domain, eb.suffix)
 
-def guess_slug(url: str) -> str:
-    path = URL(url).path
-    if not path or path == "/":
-        return "index"
-    return path.strip("/").replace("/", "-")
-
 # -------- DuckDuckGo HTML search (best-effort) -------- #
 # NOTE: For production, consider a search API (Serper, Google Custom Search, Tavily).
 SEARCH_ENDPOINT = "https://duckduckgo.com/html/"
@@ -58,13 +47,24 @@ async def ddg_search(session: aiohttp.ClientSession, query: str, max_results: in
     return results
 
 # -------- Robots + Sitemaps -------- #
-async def read_robots_txt(session: aiohttp.ClientSession, site_root: str) -> Tuple[robotparser.RobotFileParser, List[str]]:
+async def _get_text(session: aiohttp.ClientSession, url: str, cache: Optional[HttpCache] = None) -> str:
+    """GET a text resource, revalidating against the HTTP cache when one is given."""
+    entry = await asyncio.to_thread(cache.get, url) if cache else None
+    headers = {**HEADERS, **HttpCache.validators(entry)}
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=20)) as resp:
+        if resp.status == 304 and entry is not None:
+            return entry.get("body") or ""
+        text = await resp.text()
+        if cache and resp.status == 200:
+            await asyncio.to_thread(cache.put, url, str(resp.url), text, {k.lower(): v for k, v in resp.headers.items()})
+        return text
+
+async def read_robots_txt(session: aiohttp.ClientSession, site_root: str, cache: Optional[HttpCache] = None) -> Tuple[robotparser.RobotFileParser, List[str]]:
     robots_url = URL(site_root).with_path("/robots.txt").with_query(None)
     rp = robotparser.RobotFileParser()
     sitemaps: List[str] = []
     try:
-        async with session.get(str(robots_url), headers=HEADERS) as resp:
-            txt = await resp.text()
+        txt = await _get_text(session, str(robots_url), cache)
         rp.parse(txt.splitlines())
         # extract sitemaps
         for line in txt.splitlines():
@@ -72,210 +72,417 @@ async def read_robots_txt(session: aiohttp.ClientSession, site_root: str) -> Tup
                 sm = line.split(":", 1)[1].strip()
                 if sm: sitemaps.append(sm)
     except Exception:
-        pass
+        # Unreachable robots.txt: allow everything rather than leaving the
+        # parser unread, which makes can_fetch() refuse every URL.
+        rp.parse([])
     return rp, sitemaps
 
-def _requests_fetch_url(url: str) -> Optional[Tuple[str, str]]:
+@dataclass
+class FetchResult:
+    url: str
+    status: Optional[int] = None        # None when the request itself failed
+    final_url: str = ""
+    html: Optional[str] = None          # set only for 200 HTML responses
+    headers: Dict[str, str] = field(default_factory=dict)  # lower-cased names
+
+def _is_html(content_type: str, text: str) -> bool:
+    return "text/html" in content_type or "<html" in text.lower()
+
+def _requests_fetch(url: str) -> FetchResult:
     try:
         resp = requests.get(url, headers=HEADERS, allow_redirects=True, timeout=20)
         content_type = resp.headers.get("content-type", "").lower()
         text = resp.text
-        if resp.status_code != 200:
-            return None
-        if "text/html" not in content_type and "<html" not in text.lower():
-            return None
-        return resp.url, text
+        result = FetchResult(url, resp.status_code, resp.url, headers={k.lower(): v for k, v in resp.headers.items()})
+        if resp.status_code == 200 and _is_html(content_type, text):
+            result.html = text
+        return result
     except Exception:
-        return None
+        return FetchResult(url)
 
-async def fetch_url(session: aiohttp.ClientSession, url: str) -> Optional[Tuple[str, str]]:
+async def fetch_page(session: aiohttp.ClientSession, url: str, validators: Optional[Dict[str, str]] = None) -> FetchResult:
+    """
+    Fetches one page and keeps the status and headers so the frontier can
+    react to throttling. Throttling and 304 responses are returned as-is;
+    other failures are retried once through `requests`.
+    """
     try:
-        async with session.get(url, headers=HEADERS, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=20)) as resp:
+        headers = {**HEADERS, **(validators or {})}
+        async with session.get(url, headers=headers, allow_redirects=True, timeout=aiohttp.ClientTimeout(total=20)) as resp:
             content_type = resp.headers.get("content-type", "").lower()
             text = await resp.text(errors="ignore")
-            if resp.status != 200:
-                return await asyncio.to_thread(_requests_fetch_url, url)
-            if "text/html" not in content_type and "<html" not in text.lower():
-                return await asyncio.to_thread(_requests_fetch_url, url)
-            final_url = str(resp.url)
-            return final_url, text
+            result = FetchResult(url, resp.status, str(resp.url), headers={k.lower(): v for k, v in resp.headers.items()})
+            if resp.status in THROTTLE_STATUSES or resp.status == 304:
+                return result
+            if resp.status != 200 or not _is_html(content_type, text):
+                return await asyncio.to_thread(_requests_fetch, url)
+            result.html = text
+            return result
     except Exception:
-        return await asyncio.to_thread(_requests_fetch_url, url)
-
-def _identify_platform(html: str) -> str:
-    """A simple heuristic to guess the website's platform."""
-    html_lower = html.lower()
-    if '/wp-content/' in html or '/wp-json/' in html:
-        return "WordPress"
-    if (
-        'content="webflow"' in html_lower
-        or 'webflow.io' in html_lower
-        or 'data-wf-domain=' in html_lower
-        or 'w-webflow-badge' in html_lower
-    ):
-        return "Webflow"
-    if 'Shopify.theme' in html or 'cdn.shopify.com' in html:
-        return "Shopify"
-    if '"@wix/thunderbolt"' in html:
-        return "Wix"
-    # Lovable seems to be a specific agency, harder to detect generically.
-    # We can add more detectors here as needed.
-    return "unknown"
-
-def extract_page_data(url: str, html: str) -> Dict:
-    soup = BeautifulSoup(html, "lxml")
-    title = (soup.title.string.strip() if soup.title and soup.title.string else "")[:120]
-    meta_desc = ""
-    m = soup.find("meta", attrs={"name":"description"})
-    if m and m.get("content"):
-        meta_desc = m.get("content").strip()[:300]
-    # canonical
-    canonical = ""
-    c = soup.find("link", rel=lambda v: v and "canonical" in v)
-    if c and c.get("href"):
-        canonical = normalize_url(url, c.get("href")) or ""
-    # headings (first H1/H2s)
-    h1 = [h.get_text(" ", strip=True) for h in soup.find_all("h1")][:2]
-    h2 = [h.get_text(" ", strip=True) for h in soup.find_all("h2")][:6]
-    # internal links (same hostname)
-    links = []
-    for a in soup.find_all("a", href=True):
-        u = normalize_url(url, a["href"])
-        if u:
-            links.append(u)
-    platform = _identify_platform(html)
-    return {
-        "url": url,
-        "slug": guess_slug(url),
-        "title": title,
-        "platform": platform,
-        "meta_title": title or "",
-        "meta_description": meta_desc,
-        "canonical": canonical,
-        "h1": h1,
-        "h2": h2,
-        "internal_links": links,
-        "html": html[:MAX_HTML_CHARS]
-    }
+        return await asyncio.to_thread(_requests_fetch, url)
 
-async def parse_sitemap_urls(session: aiohttp.ClientSession, sitemap_url: str, limit: int = 2000) -> List[str]:
+async def fetch_url(session: aiohttp.ClientSession, url: str) -> Optional[Tuple[str, str]]:
+    result = await fetch_page(session, url)
+    return (result.final_url, result.html) if result.html is not None else None
+
+async def parse_sitemap_entries(session: aiohttp.ClientSession, sitemap_url: str, limit: int = 2000, cache: Optional[HttpCache] = None) -> List[Tuple[str, Optional[str]]]:
+    """(loc, lastmod) pairs from a sitemap or sitemap index."""
     try:
-        async with session.get(sitemap_url, headers=HEADERS, timeout=aiohttp.ClientTimeout(total=20)) as resp:
-            xml = await resp.text()
+        xml = await _get_text(session, sitemap_url, cache)
     except Exception:
         return []
-    urls: List[str] = []
+    entries: List[Tuple[str, Optional[str]]] = []
     soup = BeautifulSoup(xml, "xml")
     if soup.find("sitemapindex"):
         for sm in soup.find_all("sitemap"):
             loc = sm.find("loc")
             if loc and loc.text:
-                urls.extend(await parse_sitemap_urls(session, loc.text.strip(), limit))
-                if len(urls) >= limit: break
+                entries.extend(await parse_sitemap_entries(session, loc.text.strip(), limit, cache))
+                if len(entries) >= limit: break
     else:
         for u in soup.find_all("url"):
             loc = u.find("loc")
             if loc and loc.text:
-                urls.append(loc.text.strip())
-                if len(urls) >= limit: break
-    return urls
+                lastmod = u.find("lastmod")
+                entries.append((loc.text.strip(), lastmod.text.strip() if lastmod and lastmod.text else None))
+                if len(entries) >= limit: break
+    return entries
+
+async def parse_sitemap_urls(session: aiohttp.ClientSession, sitemap_url: str, limit: int = 2000) -> List[str]:
+    return [loc for loc, _ in await parse_sitemap_entries(session, sitemap_url, limit)]
+
+# -------- Parse executors -------- #
+# Pools are shared by every crawl in the process, so concurrent crawls for
+# different sessions compete for the same cores instead of oversubscribing.
+PARSE_EXECUTORS = ("inline", "thread", "process")
+_parse_pools: Dict[str, Executor] = {}
+
+def _default_parse_executor() -> str:
+    kind = os.environ.get("CRAWL_PARSE_EXECUTOR", "process").strip().lower()
+    return kind if kind in PARSE_EXECUTORS else "process"
+
+def _parse_pool(kind: str, workers: int) -> Tuple[str, Optional[Executor]]:
+    """Returns (effective kind, executor); process pools fall back to threads where unsupported."""
+    if kind not in ("thread", "process"):
+        return "inline", None
+    pool = _parse_pools.get(kind)
+    if pool is not None:
+        return kind, pool
+    workers = workers or os.cpu_count() or 2
+    if kind == "process":
+        try:
+            # spawn: the LLM client and aiohttp own threads that must not be forked.
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError, ValueError):
+            # e.g. serverless runtimes without /dev/shm; crawl_stats["parse_executor"] shows the fallback
+            return _parse_pool("thread", workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl-parse")
+    _parse_pools[kind] = pool
+    return kind, pool
+
+def _discard_parse_pool(kind: str, pool: Executor) -> None:
+    """Drops a broken pool, so the next crawl builds a new one."""
+    if _parse_pools.get(kind) is pool:
+        del _parse_pools[kind]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+@atexit.register
+def _shutdown_parse_pools():
+    for pool in _parse_pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _parse_pools.clear()
 
 # -------- Site crawler -------- #
+MAX_CRAWL_ERRORS = 200
 @dataclass
 class CrawlConfig:
     max_pages: int = 300
     same_domain_only: bool = True
     concurrency: int = 8
-    rate_limit_per_host: int = 4  # requests/second
+    rate_limit_per_host: float = 4  # requests/second to each host (lowered by robots Crawl-delay)
+    max_in_flight_per_host: int = 2
+    extractor: Optional[str] = None  # page_extract engine; None = CRAWL_EXTRACTOR / fastest installed
+    parse_executor: str = field(default_factory=_default_parse_executor)  # "inline" | "thread" | "process"
+    parse_workers: int = 0  # pool size when the shared pool is first created; 0 = cpu count
+    max_pending_parses: int = 0  # fetched-but-unparsed pages in flight; 0 = concurrency
+    http_cache: Optional[HttpCache] = None  # conditional re-crawl and sitemap <lastmod> skips
 
 @dataclass
 class CrawlResult:
-    pages: List[Dict] = field(default_factory=list)
+    pages: List[Dict] = field(default_factory=list)  # filled by crawl_site only; iter_crawl streams instead
     errors: List[str] = field(default_factory=list)
+    stats: Dict = field(default_factory=dict)
+    page_count: int = 0
 
-async def crawl_site(root_url: str, config: CrawlConfig = CrawlConfig()) -> CrawlResult:
+    def add_error(self, message: str):
+        # Bounded so long crawls against a failing site do not grow without limit.
+        if len(self.errors) < MAX_CRAWL_ERRORS:
+            self.errors.append(message)
+        self.stats["errors_total"] = self.stats.get("errors_total", 0) + 1
+
+class _LoopLagMonitor:
+    """Samples how late the event loop wakes up, i.e. how long something blocked it."""
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.samples += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        return {
+            "max_loop_lag_ms": round(self.max_lag * 1000, 2),
+            "mean_loop_lag_ms": round(self.total_lag * 1000 / max(self.samples, 1), 2),
+        }
+
+async def iter_crawl(root_url: str, config: CrawlConfig = CrawlConfig(), result: Optional[CrawlResult] = None) -> AsyncIterator[Dict]:
+    """
+    Crawls a site and yields each unique page as soon as it is parsed.
+
+    Nothing is accumulated: errors, stats and page_count land on `result`
+    (when given) and a slow consumer pauses the workers through a bounded
+    output queue, so memory does not grow with max_pages.
+    """
     root = str(URL(root_url))
-    origin = f"{URL(root).scheme}://{URL(root).host}"
-    limiter = AsyncLimiter(config.rate_limit_per_host, time_period=1.0)
-    visited: Set[str] = set()
-    q: asyncio.Queue[str] = asyncio.Queue()
-    await q.put(root)
-    result = CrawlResult()
+    origin = host_key(root)
+    frontier = HostFrontier(config.rate_limit_per_host, config.max_in_flight_per_host)
+    cache = config.http_cache
+    result = result if result is not None else CrawlResult()
+    out: asyncio.Queue = asyncio.Queue(maxsize=config.concurrency * 2)
+    done_marker = object()
+    emitted: Set[str] = set()
+    loop = asyncio.get_running_loop()
+    parse_kind, parse_pool = _parse_pool(config.parse_executor, config.parse_workers)
+    # Backpressure: a slot is taken before fetching and released once the page
+    # is parsed, so fetched-but-unparsed HTML never exceeds max_pending_parses.
+    parse_slots = asyncio.Semaphore(config.max_pending_parses or config.concurrency)
+    parse_stats = {"pages_parsed": 0, "parse_seconds": 0.0, "loop_blocked_seconds": 0.0, "peak_pending_parses": 0, "broken_parse_pools": 0}
+    pending_parses = 0
+    lag_monitor = _LoopLagMonitor()
+
+    async def parse(final_url: str, html: str, headers: Dict[str, str]) -> Dict:
+        nonlocal parse_kind, parse_pool
+        started = time.perf_counter()
+        while True:
+            if parse_pool is None:
+                page = extract_page_data(final_url, html, engine=config.extractor, headers=headers)
+                blocked = time.perf_counter() - started
+                break
+            pool = parse_pool
+            try:
+                fut = loop.run_in_executor(pool, extract_page_data, final_url, html, config.extractor, headers)
+                blocked = time.perf_counter() - started
+                page = await fut
+                break
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory): finish this crawl on threads and retry the page.
+                if parse_pool is pool:
+                    parse_stats["broken_parse_pools"] += 1
+                    _discard_parse_pool(parse_kind, pool)
+                    parse_kind, parse_pool = _parse_pool("thread", config.parse_workers)
+        parse_stats["pages_parsed"] += 1
+        parse_stats["parse_seconds"] += time.perf_counter() - started
+        parse_stats["loop_blocked_seconds"] += blocked
+        return page
+
+    def claim(page: Dict) -> bool:
+        """Deduplicates by final URL and counts the page towards max_pages."""
+        if page["url"] in emitted or result.page_count >= config.max_pages:
+            return False
+        emitted.add(page["url"])
+        result.page_count += 1
+        return True
+
+    async def enqueue(url: str):
+        if url in frontier.seen:
+            return
+        # domain filter
+        if config.same_domain_only and not same_reg_domain(root, url):
+            return
+        await frontier.put(url)
 
     async with aiohttp.ClientSession() as session:
-        rp, robots_sitemaps = await read_robots_txt(session, origin)
+        # robots.txt is read once per host; Crawl-delay feeds that host's bucket.
+        robots: Dict[str, asyncio.Future] = {}
+
+        async def load_robots(key: str) -> robotparser.RobotFileParser:
+            rp, _ = await read_robots_txt(session, key)
+            try:
+                frontier.set_crawl_delay(key, rp.crawl_delay(USER_AGENT))
+            except Exception:
+                pass
+            return rp
+
+        async def robots_for(key: str) -> robotparser.RobotFileParser:
+            if key not in robots:
+                robots[key] = asyncio.ensure_future(load_robots(key))
+            return await robots[key]
+
+        rp, robots_sitemaps = await read_robots_txt(session, origin, cache)
+        robots[origin] = loop.create_future()
+        robots[origin].set_result(rp)
+        try:
+            frontier.set_crawl_delay(origin, rp.crawl_delay(USER_AGENT))
+        except Exception:
+            pass
+        await enqueue(root)
         # Try sitemaps first
-        sitemap_urls: List[str] = []
+        sitemap_entries: List[Tuple[str, Optional[str]]] = []
         for sm in (robots_sitemaps + [str(URL(origin).with_path("/sitemap.xml")), str(URL(origin).with_path("/sitemap_index.xml"))]):
-            sitemap_urls.extend(await parse_sitemap_urls(session, sm))
-        for u in sitemap_urls[:config.max_pages]:
-            await q.put(u)
+            sitemap_entries.extend(await parse_sitemap_entries(session, sm, cache=cache))
+        unchanged: List[Dict] = []
+        for u, lastmod in sitemap_entries[:config.max_pages]:
+            if cache and lastmod and u not in frontier.seen:
+                # Unchanged since it was cached: reuse the page without any request.
+                page = cache.unchanged_page(await asyncio.to_thread(cache.get, u), lastmod)
+                if page is not None and rp.can_fetch(USER_AGENT, u):
+                    frontier.seen.add(u)
+                    cache.stats["lastmod_skips"] += 1
+                    if claim(page):
+                        unchanged.append(page["internal_links"])
+                        yield page
+                    continue
+            await enqueue(u)
+        for links in unchanged:
+            for link in links:
+                if result.page_count + frontier.size() >= config.max_pages:
+                    break
+                await enqueue(link)
+        del unchanged
 
         async def worker():
-            nonlocal visited
-            while len(result.pages) < config.max_pages:
-                try:
-                    url = await asyncio.wait_for(q.get(), timeout=2.0)
-                except asyncio.TimeoutError:
+            nonlocal pending_parses
+            while result.page_count < config.max_pages:
+                async with parse_slots:
+                    item = await frontier.get()
+                    if item is None:
+                        return
+                    key, url = item
+                    status, retry_after = None, None
+                    try:
+                        # robots
+                        try:
+                            rp = await robots_for(key)
+                            if rp and not rp.can_fetch(USER_AGENT, url):
+                                continue
+                        except Exception:
+                            pass
+
+                        entry = await asyncio.to_thread(cache.get, url) if cache else None
+                        try:
+                            fetched = await fetch_page(session, url, HttpCache.validators(entry))
+                        except Exception as e:
+                            result.add_error(f"fetch error: {url} -> {e}")
+                            continue
+                        status, headers = fetched.status, fetched.headers
+                        retry_after = parse_retry_after(headers.get("retry-after"))
+                        revalidated = fetched.status == 304 and entry is not None
+                        if revalidated:
+                            cache.stats["revalidated"] += 1
+                            page = HttpCache.page(entry)
+                            final_url, html = entry.get("final_url") or url, entry.get("body") or ""
+                        elif fetched.html is None:
+                            continue
+                        else:
+                            page = None
+                            final_url, html = fetched.final_url, fetched.html
+                        del fetched
+
+                        if page is None:
+                            pending_parses += 1
+                            parse_stats["peak_pending_parses"] = max(parse_stats["peak_pending_parses"], pending_parses)
+                            try:
+                                page = await parse(final_url, html, headers)
+                            except Exception as e:
+                                result.add_error(f"parse error: {final_url} -> {e}")
+                                continue
+                            finally:
+                                pending_parses -= 1
+                            if cache and revalidated:
+                                await asyncio.to_thread(cache.refresh, url, entry, headers, page)
+                            elif cache:
+                                cache.stats["misses"] += 1
+                                await asyncio.to_thread(cache.put, url, final_url, html, headers, page)
+                        elif cache:
+                            await asyncio.to_thread(cache.refresh, url, entry, headers)
+                        del html, entry
+                        if not claim(page):
+                            continue
+                        links = page["internal_links"]
+                        await out.put(page)
+                        del page
+
+                        # enqueue internal links (BFS); done() below keeps idle
+                        # workers waiting until these are queued.
+                        for link in links:
+                            if result.page_count + frontier.size() >= config.max_pages:
+                                break
+                            await enqueue(link)
+                    finally:
+                        await frontier.done(key, url, status, retry_after)
+            await frontier.close()
+
+        async def run_workers():
+            await asyncio.gather(*(worker() for _ in range(config.concurrency)), return_exceptions=True)
+            await out.put(done_marker)
+
+        lag_monitor.start()
+        runner = asyncio.create_task(run_workers())
+        try:
+            while True:
+                page = await out.get()
+                if page is done_marker:
                     break
-                if url in visited:
-                    q.task_done(); continue
-                visited.add(url)
-
-                # domain filter
-                if config.same_domain_only and not same_reg_domain(root, url):
-                    q.task_done(); continue
-
-                # robots
-                try:
-                    if rp and not rp.can_fetch(USER_AGENT, url):
-                        q.task_done(); continue
-                except Exception:
-                    pass
-
-                # fetch with RL
-                try:
-                    async with limiter:
-                        fetched = await fetch_url(session, url)
-                except Exception as e:
-                    result.errors.append(f"fetch error: {url} -> {e}")
-                    q.task_done(); continue
-
-                if not fetched:
-                    q.task_done(); continue
-
-                final_url, html = fetched
-                page = extract_page_data(final_url, html)
-                result.pages.append(page)
-
-                # enqueue internal links (BFS)
-                for link in page["internal_links"]:
-                    if link not in visited and len(result.pages) + q.qsize() < config.max_pages:
-                        await q.put(link)
-                q.task_done()
-
-        workers = [asyncio.create_task(worker()) for _ in range(config.concurrency)]
-        await asyncio.gather(*workers, return_exceptions=True)
-
-    # Deduplicate pages by URL
-    dedup: Dict[str, Dict] = {}
-    for p in result.pages:
-        dedup[p["url"]] = p
-    result.pages = list(dedup.values())
+                yield page
+        finally:
+            # Also reached when the consumer stops early.
+            await frontier.close()
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            lag_stats = await lag_monitor.stop()
+            result.stats.update({
+                "parse_executor": parse_kind,
+                **{k: round(v, 4) if isinstance(v, float) else v for k, v in parse_stats.items()},
+                **lag_stats,
+                **frontier.stats(),
+            })
+
+async def crawl_site(root_url: str, config: CrawlConfig = CrawlConfig()) -> CrawlResult:
+    result = CrawlResult()
+    async for page in iter_crawl(root_url, config, result):
+        result.pages.append(page)
     return result
 
 # -------- Simple memory dump helper -------- #
 def to_memory_snapshot(website_url: str, pages: List[Dict], socials: Optional[Dict] = None) -> Dict:
-    platforms = [p.get("platform", "unknown") for p in pages if p.get("platform") != "unknown"]
-    main_platform = max(set(platforms), key=platforms.count) if platforms else "unknown"
+    site = SiteFingerprint()
+    for page in pages:
+        site.add(page)
     return {
         "website": {
             "url": website_url,
-            "platform": main_platform,
-            "seo_plugin": "unknown",
+            **site.summary(),
             "pages": pages,
             "sitemaps": []
         },
+        "seo_metrics": SeoIndex.from_pages(pages, website_url).summary(),
         "social": socials or {},
         "business": {
             "name": urlparse(website_url).hostname.replace("www.","") if website_url else "",
@@ -288,28 +495,66 @@ async def build_weekly_snapshot(session_id: str, website_url: str, socials: Opti
     """
     High-level tool that crawl a site, identifies its platform,
     and saves a complete snapshot to the context file.
+
+    Pages are streamed straight into the session's page records, so memory
+    stays flat regardless of max_pages. On a re-crawl, pages are diffed
+    against the previous snapshot by content hash (website["changes"]) and
+    earlier agent results are kept, so the agents only redo changed pages.
     """
-    cfg = CrawlConfig(max_pages=max_pages)
-    result = await crawl_site(website_url, cfg)
-    pages = result.pages
+    cache = HttpCache() if http_cache_enabled() else None
+    cfg = CrawlConfig(max_pages=max_pages, http_cache=cache)
+    result = CrawlResult()
 
-    # Identify the primary platform from the crawled pages
-    platform = [p.get("platform", "unknown") for p in pages if p.get("platform") != "unknown"]
-    main_platform = max(set(platform), key=platform.count) if platform else "unknown"
+    # Identify the platform and SEO plugin from the crawled pages' fingerprints
+    site = SiteFingerprint()
+    previous = page_hashes(session_id)
+    # A re-crawl updates the stored index: only new and changed pages are re-indexed.
+    index = load_index(session_id) if previous else SeoIndex(website_url)
+    index.root = page_key(website_url)
+    crawled = set()
+    changes = Counter()
+    with PageSink(session_id) as sink:
+        async with aclosing(iter_crawl(website_url, cfg, result)) as pages:
+            async for page in pages:
+                sink.write(page)
+                url = page.get("url")
+                crawled.add(url)
+                old = previous.pop(url, None)
+                change = "new" if old is None else "unchanged" if old == page.get("content_hash") else "changed"
+                if change != "unchanged" or url not in index.rows:
+                    index.add(page)
+                changes[change] += 1
+                site.add(page)
+    for url in set(index.rows) - crawled:
+        index.remove(url)
+    if cache:
+        await asyncio.to_thread(cache.prune)
+    fingerprint = site.summary()
+    main_platform = fingerprint["platform"]
 
     # Create the context structure
     ctx = {
         "website": {
             "url": website_url,
-            "platform": main_platform,
-            "pages": pages,
+            **fingerprint,
+            "page_count": sink.count,
             "crawl_errors": result.errors,
+            "crawl_stats": result.stats,
+            "cache_stats": cache.stats if cache else None,
+            "changes": {"new": changes["new"], "changed": changes["changed"], "unchanged": changes["unchanged"], "removed": len(previous)},
         },
+        "seo_metrics": index.summary(),
         "social": socials or {},
         "business": { "name": urlparse(website_url).hostname.replace("www.", "")},
         "history": [],
         "state": "start",
+        # Proposals from an earlier crawl are reused for pages whose content hash is unchanged.
+        "agents": (load_context(session_id) or {}).get("agents", {}),
     }
 
     save_context(session_id, ctx)
-    return {"pages": len(pages), "platform": main_platform, "errors": len(result.errors)}
+    index.save_state(session_id)
+    return {
+        "pages": sink.count, "platform": main_platform, "errors": result.stats.get("errors_total", 0),
+        "crawl_stats": result.stats, "cache": cache.stats if cache else None,
+    }
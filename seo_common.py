@@ -3,15 +3,25 @@
 import os
 import json
 import datetime
+import hashlib
 import typing as t, re
+import contextlib
+import contextvars
+from collections import Counter, OrderedDict, deque
 import time
+import asyncio
+import concurrent.futures
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from dotenv import load_dotenv
+import llm_cache
+from context_store import load_agent, update_agent
 
 load_dotenv()
 _genai_model = None
 _genai_model_name = None
-_genai_cooldown_until = 0.0
 
 def gemini_model_candidates() -> list[str]:
     preferred_model = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash").strip() or "gemini-2.5-flash"
@@ -28,17 +38,97 @@ def gemini_model_candidates() -> list[str]:
 
 # --- Centralized AI Configuration ---
 
+# Key of the tenant whose turn is running; falls back to GEMINI_API_KEY.
+_api_key_var: contextvars.ContextVar[t.Optional[str]] = contextvars.ContextVar("gemini_api_key", default=None)
+# session_id -> (key, last used), in memory only (never written to the context
+# store). Least recently used first; entries idle for SESSION_KEY_TTL seconds
+# are dropped, and at most SESSION_KEY_MAX sessions are kept.
+_session_keys: "OrderedDict[str, t.Tuple[str, float]]" = OrderedDict()
+_key_sessions: Counter = Counter()   # key -> sessions remembering it
+_session_keys_lock = threading.Lock()
+SESSION_KEY_TTL = float(os.environ.get("SESSION_KEY_TTL", "3600"))
+SESSION_KEY_MAX = int(os.environ.get("SESSION_KEY_MAX", "1000"))
+
+def api_key_from(api_keys: t.Optional[dict]) -> t.Optional[str]:
+    """The Gemini key from a client-supplied `api_keys` mapping, if any."""
+    for name in ("gemini", "gemini_api_key", "GEMINI_API_KEY", "google"):
+        value = (api_keys or {}).get(name)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+def session_api_key(session_id: str, api_keys: t.Optional[dict] = None) -> t.Optional[str]:
+    """Remembers a key sent with a turn so later turns of the session keep using it."""
+    key = api_key_from(api_keys)
+    now = time.monotonic()
+    released = []
+    with _session_keys_lock:
+        while _session_keys and now - next(iter(_session_keys.values()))[1] > SESSION_KEY_TTL:
+            released.append(_drop_session(next(iter(_session_keys))))
+        if not key and session_id in _session_keys:
+            key = _session_keys[session_id][0]
+        if key:
+            if _session_keys.get(session_id, (key,))[0] != key:
+                released.append(_drop_session(session_id))
+            if session_id not in _session_keys:
+                _key_sessions[key] += 1
+            _session_keys[session_id] = (key, now)
+            _session_keys.move_to_end(session_id)
+            while len(_session_keys) > SESSION_KEY_MAX:
+                released.append(_drop_session(next(iter(_session_keys))))
+    _release_keys(released)
+    return key
+
+def forget_session_key(session_id: str) -> None:
+    """Drops the key remembered for a session that has ended, and its scheduler state once no session uses it."""
+    with _session_keys_lock:
+        released = [_drop_session(session_id)]
+    _release_keys(released)
+
+def _drop_session(session_id: str) -> t.Optional[str]:
+    """Removes a session (under _session_keys_lock); returns its key if no other session remembers it."""
+    entry = _session_keys.pop(session_id, None)
+    if entry is None:
+        return None
+    _key_sessions[entry[0]] -= 1
+    if _key_sessions[entry[0]] > 0:
+        return None
+    del _key_sessions[entry[0]]
+    return entry[0]
+
+def _release_keys(keys: t.Iterable[t.Optional[str]]) -> None:
+    """Evicts the scheduler state (clients, breakers, windows) of keys no session uses any more."""
+    digests = {_key_digest(k) for k in keys if k and k != os.environ.get("GEMINI_API_KEY")}
+    if digests and _loop is not None:
+        _loop.call_soon_threadsafe(_evict_key_state, digests)
+
+@contextlib.contextmanager
+def use_api_key(api_key: t.Optional[str]):
+    """Routes LLM calls made in this context (including to_thread / gather children) to `api_key`."""
+    token = _api_key_var.set(api_key)
+    try:
+        yield
+    finally:
+        _api_key_var.reset(token)
+
+def current_api_key() -> t.Optional[str]:
+    return _api_key_var.get() or os.environ.get("GEMINI_API_KEY")
+
+def _key_digest(api_key: str) -> str:
+    """What scheduler state is keyed by, so raw keys are not kept in its dicts."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+def key_id(api_key: str) -> str:
+    """Loggable stand-in for a key."""
+    return _key_digest(api_key)[:8]
+
 def genai_model():
     """
     A safe, centralized function to get the configured Generative AI model.
     It now assumes the environment variables are already loaded by the server.
     """
     global _genai_model, _genai_model_name
-    preferred_model = gemini_model_candidates()[0]
-    if _genai_model and _genai_model_name == preferred_model:
-        return _genai_model
-
-    api_key = os.environ.get("GEMINI_API_KEY")
+    api_key = current_api_key()
     if not api_key:
         print("---")
         print("WARNING: GEMINI_API_KEY not found in environment.")
@@ -46,8 +136,13 @@ def genai_model():
         print("---")
         return None
 
+    preferred_model = gemini_model_candidates()[0]
+    if _genai_model and _genai_model_name == preferred_model:
+        return _genai_model
+
+    # Requests go through the shared async client below, bound to the calling
+    # session's key; this model only tells callers an LLM is available.
     try:
-        genai.configure(api_key=api_key)
         last_error = None
         for model_name in gemini_model_candidates():
             try:
@@ -66,56 +161,471 @@ def genai_model():
         print(f"--- FATAL ERROR configuring Google AI: {e} ---")
         return None
 
-def generate_with_fallback(prompt: str):
+# --- Long-lived async client ---
+#
+# All Gemini requests run on one background event loop. Models (each a
+# public generativelanguage async client) are built once per (api key, model)
+# on that loop and reused, so calls pay neither genai.configure nor channel
+# setup. Sync callers block on a future; async callers await it without a
+# thread hop.
+#
+# Calls are scheduled per key: each key has its own concurrency slots,
+# RPM/TPM windows and breakers per model, so a tenant that exhausts its
+# budget or hits 429s only queues its own requests.
+
+_TRANSIENT_MARKERS = ("quota", "429", "rate limit", "not found", "deadline exceeded", "timed out", "timeout")
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_MAX_OPEN_SECONDS = 120.0
+
+class _CircuitBreaker:
     """
-    Generate content with automatic fallback across Gemini text models.
-    This helps demos survive quota/model availability issues on a single model.
+    Per (key, model) breaker. Quota errors open it for the server's
+    "retry in Ns" hint (or 30s); other transient errors open it after
+    BREAKER_FAILURE_THRESHOLD in a row, for an interval that doubles while
+    failures continue. Once open time passes a single trial call is let
+    through (half-open); its outcome closes or re-opens the breaker.
     """
-    global _genai_cooldown_until
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        return None
-    if time.time() < _genai_cooldown_until:
-        return None
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
 
-    genai.configure(api_key=api_key)
-    timeout_seconds = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "20"))
+    def allow(self, now: float) -> bool:
+        if now < self.open_until:
+            return False
+        if self.open_until and self.trial_in_flight:
+            return False
+        if self.open_until:
+            self.trial_in_flight = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+
+    def failure(self, err_text: str, now: float):
+        self.failures += 1
+        self.trial_in_flight = False
+        retry_match = re.search(r"retry in ([0-9]+(?:\.[0-9]+)?)s", err_text)
+        if retry_match:
+            self.open_until = max(self.open_until, now + float(retry_match.group(1)))
+        elif "quota" in err_text or "429" in err_text:
+            self.open_until = max(self.open_until, now + 30)
+        elif self.failures >= BREAKER_FAILURE_THRESHOLD:
+            backoff = 5 * 2 ** (self.failures - BREAKER_FAILURE_THRESHOLD)
+            self.open_until = max(self.open_until, now + min(BREAKER_MAX_OPEN_SECONDS, backoff))
+
+    def ready_at(self, now: float) -> float:
+        if now < self.open_until:
+            return self.open_until
+        if self.open_until and self.trial_in_flight:
+            return now + 0.25  # poll until the half-open trial settles
+        return now
+
+class _RateWindow:
+    """
+    Sliding 60-second window of (start, tokens) for one (key, model), checked
+    against that key's RPM/TPM budget. Requests that would exceed it wait
+    for the window to drain instead of failing. A budget of 0 is unlimited.
+    """
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm, self.tpm = rpm, tpm
+        self.events: deque = deque()
+        self.requests = 0
+        self.tokens = 0
+        self.queued = 0
+        self.queued_seconds = 0.0
+
+    def _trim(self, now: float):
+        while self.events and self.events[0][0] <= now - 60:
+            self.events.popleft()
+
+    def ready_at(self, now: float, tokens: int) -> float:
+        self._trim(now)
+        at = now
+        if self.rpm and len(self.events) >= self.rpm:
+            at = max(at, self.events[len(self.events) - self.rpm][0] + 60)
+        if self.tpm:
+            excess = sum(used for _, used in self.events) + tokens - self.tpm
+            for started, used in self.events:
+                if excess <= 0:
+                    break
+                excess -= used
+                at = max(at, started + 60)
+        return at
+
+    def record(self, now: float, tokens: int) -> list:
+        entry = [now, tokens]
+        self.events.append(entry)
+        self.requests += 1
+        self.tokens += tokens
+        return entry
+
+    def settle(self, entry: list, actual_tokens: int):
+        """Replaces the estimate with the usage the API reported."""
+        if actual_tokens:
+            self.tokens += actual_tokens - entry[1]
+            entry[1] = actual_tokens
+
+def _rate_limits() -> t.Tuple[int, int]:
+    """GEMINI_RPM / GEMINI_TPM per key and model; unset means no client-side throttle."""
+    try:
+        return int(os.environ.get("GEMINI_RPM", "0")), int(os.environ.get("GEMINI_TPM", "0"))
+    except ValueError:
+        return 0, 0
+
+_OUTPUT_TOKEN_ESTIMATE = 1024
+
+_loop: t.Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+# Scheduler state, keyed by (_key_digest(api_key), model_name) unless noted; touched only on _loop.
+_models: dict = {}
+_breakers: dict = {}
+_windows: dict = {}
+_key_semaphores: dict = {}   # key digest -> Semaphore, so one tenant's queue never holds another's slots
+
+def _evict_key_state(digests: t.Set[str]) -> None:
+    for state in (_models, _breakers, _windows):
+        for key in [k for k in state if k[0] in digests]:
+            del state[key]
+    for digest in digests:
+        _key_semaphores.pop(digest, None)
+
+def _llm_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gemini-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+class GeminiResponse:
+    """What callers read from a generation: `.text` (ValueError when the candidate was blocked or empty)."""
+    def __init__(self, raw, model: str):
+        self.raw = raw
+        self.model = model
+        self.usage_metadata = raw.usage_metadata
+
+    @property
+    def text(self) -> str:
+        candidates = list(self.raw.candidates)
+        parts = list(candidates[0].content.parts) if candidates else []
+        if not parts:
+            raise ValueError(f"{self.model} returned no text (finish reason: "
+                             f"{candidates[0].finish_reason.name if candidates else self.raw.prompt_feedback.block_reason.name})")
+        return "".join(part.text for part in parts)
+
+class _GeminiModel:
+    """
+    One model on the public generativelanguage async client, bound to one
+    API key. Only what _generate needs: generate_content_async(prompt, ...).
+    """
+    def __init__(self, api_key: str, model_name: str):
+        self.model_name = model_name
+        self.client = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+
+    async def generate_content_async(self, prompt: str, generation_config: t.Optional[dict] = None,
+                                     request_options: t.Optional[dict] = None) -> GeminiResponse:
+        request = glm.GenerateContentRequest(
+            model=f"models/{self.model_name}",
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            generation_config=glm.GenerationConfig(**(generation_config or {})),
+        )
+        raw = await self.client.generate_content(request=request, timeout=(request_options or {}).get("timeout"))
+        return GeminiResponse(raw, self.model_name)
+
+def _model(api_key: str, model_name: str) -> _GeminiModel:
+    key = (_key_digest(api_key), model_name)
+    model = _models.get(key)
+    if model is None:
+        model = _GeminiModel(api_key, model_name)
+        _models[key] = model
+    return model
+
+def breaker_status() -> dict:
+    """{model: seconds until it accepts calls again} for every open breaker of the current key."""
+    now = time.monotonic()
+    api_key = current_api_key()
+    digest = _key_digest(api_key) if api_key else None
+    return {model: round(b.open_until - now, 1) for (k, model), b in list(_breakers.items()) if k == digest and b.open_until > now}
+
+def scheduler_stats(api_key: t.Optional[str] = None) -> dict:
+    """Per-model request/token/queueing counters for one key (the current one by default)."""
+    api_key = api_key or current_api_key()
+    digest = _key_digest(api_key) if api_key else None
+    now = time.monotonic()
+    stats = {}
+    for (k, model), window in list(_windows.items()):
+        if k != digest:
+            continue
+        breaker = _breakers.get((k, model))
+        stats[model] = {
+            "requests": window.requests, "tokens": window.tokens,
+            "queued": window.queued, "queued_seconds": round(window.queued_seconds, 2),
+            "open_for": round(max(0.0, breaker.open_until - now), 1) if breaker else 0.0,
+        }
+    return {"key": key_id(api_key) if api_key else None, "models": stats}
+
+async def _generate(prompt: str, api_key: str, timeout_seconds: float, give_up_at: float, deadline: t.Optional[float], json_mode: bool):
+    """
+    Runs on _loop. Picks the candidate model that can take the request
+    soonest under this key's RPM/TPM budget and breakers (preferring the
+    configured order), waits for it if needed, and falls back to the next
+    model on a transient error. Gives up (None) when nothing can start
+    before `give_up_at`.
+    """
+    tokens = (len(prompt) + 3) // 4 + _OUTPUT_TOKEN_ESTIMATE
+    limits = _rate_limits()
+    digest = _key_digest(api_key)
+    semaphore = _key_semaphores.setdefault(digest, asyncio.Semaphore(llm_concurrency()))
+    tried: set = set()
     last_error = None
-    for model_name in gemini_model_candidates():
-        try:
-            model = genai.GenerativeModel(model_name)
-            return model.generate_content(
-                prompt,
-                request_options={"timeout": timeout_seconds},
-            )
-        except Exception as e:
-            last_error = e
-            err_text = str(e).lower()
-            if (
-                "quota" in err_text
-                or "429" in err_text
-                or "rate limit" in err_text
-                or "not found" in err_text
-                or "deadline exceeded" in err_text
-                or "timed out" in err_text
-                or "timeout" in err_text
-            ):
-                retry_match = re.search(r"retry in ([0-9]+(?:\.[0-9]+)?)s", err_text)
-                if retry_match:
-                    _genai_cooldown_until = max(_genai_cooldown_until, time.time() + float(retry_match.group(1)))
-                elif "quota" in err_text or "429" in err_text:
-                    _genai_cooldown_until = max(_genai_cooldown_until, time.time() + 30)
-                print(f"--- Warning: generate_content failed on {model_name}, trying fallback: {e} ---")
+    async with semaphore:
+        while True:
+            now = time.monotonic()
+            best = None
+            for model_name in gemini_model_candidates():
+                if model_name in tried:
+                    continue
+                breaker = _breakers.setdefault((digest, model_name), _CircuitBreaker())
+                window = _windows.setdefault((digest, model_name), _RateWindow(*limits))
+                at = max(window.ready_at(now, tokens), breaker.ready_at(now))
+                if best is None or at < best[0]:
+                    best = (at, model_name, breaker, window)
+            if best is None or best[0] > give_up_at:
+                break
+            at, model_name, breaker, window = best
+            if at > now:
+                window.queued += 1
+                window.queued_seconds += at - now
+                await asyncio.sleep(at - now)
+                continue
+            if not breaker.allow(now):
                 continue
-            raise
+            entry = window.record(now, tokens)
+            request_timeout = timeout_seconds if deadline is None else max(0.1, min(timeout_seconds, deadline - now))
+            try:
+                resp = await asyncio.wait_for(
+                    _model(api_key, model_name).generate_content_async(
+                        prompt,
+                        generation_config={"response_mime_type": "application/json"} if json_mode else None,
+                        request_options={"timeout": request_timeout},
+                    ),
+                    timeout=request_timeout + 2,
+                )
+            except asyncio.CancelledError:
+                breaker.trial_in_flight = False
+                raise
+            except Exception as e:
+                last_error = e
+                err_text = (str(e) or type(e).__name__).lower()
+                if isinstance(e, asyncio.TimeoutError) or any(marker in err_text for marker in _TRANSIENT_MARKERS):
+                    breaker.failure(err_text, time.monotonic())
+                    tried.add(model_name)
+                    print(f"--- Warning: generate_content failed on {model_name} (key {key_id(api_key)}), trying fallback: {e} ---")
+                    continue
+                breaker.trial_in_flight = False
+                raise
+            breaker.success()
+            window.settle(entry, getattr(getattr(resp, "usage_metadata", None), "total_token_count", 0) or 0)
+            return model_name, resp
     if last_error:
         raise last_error
+    return None, None
+
+def _request(prompt: str, timeout: t.Optional[float], json_mode: bool):
+    """The coroutine to run on _loop for the current key, or None when no key is configured."""
+    api_key = current_api_key()
+    if not api_key:
+        return None
+    timeout_seconds = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "20"))
+    now = time.monotonic()
+    deadline = None if timeout is None else now + timeout
+    give_up_at = now + float(os.environ.get("GEMINI_MAX_QUEUE_SECONDS", "60"))
+    if deadline is not None:
+        give_up_at = min(give_up_at, deadline)
+    return _generate(prompt, api_key, timeout_seconds, give_up_at, deadline, json_mode)
+
+def _cached(prompt: str, use_cache: bool, json_mode: bool):
+    if use_cache and llm_cache.llm_cache_enabled():
+        return llm_cache.get([_cache_model(m, json_mode) for m in gemini_model_candidates()], prompt)
     return None
 
+def _store(prompt: str, result, use_cache: bool, json_mode: bool):
+    model_name, resp = result
+    if resp is not None and use_cache and llm_cache.llm_cache_enabled():
+        try:
+            llm_cache.put(_cache_model(model_name, json_mode), prompt, resp.text)
+        except ValueError:
+            pass  # blocked / empty candidates have no .text
+    return resp
+
+def _submit(prompt: str, timeout: t.Optional[float], json_mode: bool) -> t.Optional[concurrent.futures.Future]:
+    coro = _request(prompt, timeout, json_mode)
+    return asyncio.run_coroutine_threadsafe(coro, _llm_loop()) if coro else None
+
+def generate_with_fallback(prompt: str, timeout: t.Optional[float] = None, use_cache: bool = True, json_mode: bool = False):
+    """
+    Generate content with automatic fallback across Gemini text models.
+    This helps demos survive quota/model availability issues on a single model.
+    `timeout` clips the per-request timeout (e.g. to a caller's deadline).
+    `json_mode` asks the model for an application/json response.
+    Responses are served from / stored in llm_cache unless `use_cache` is
+    False or LLM_CACHE=0. Returns None when no key is configured or every
+    model's circuit breaker is open.
+    """
+    cached = _cached(prompt, use_cache, json_mode) if current_api_key() else None
+    if cached:
+        return cached
+    future = _submit(prompt, timeout, json_mode)
+    if future is None:
+        return None
+    return _store(prompt, future.result(), use_cache, json_mode)
+
+async def agenerate(prompt: str, timeout: t.Optional[float] = None, use_cache: bool = True, json_mode: bool = False):
+    """Async generate_with_fallback for callers already on an event loop."""
+    cached = _cached(prompt, use_cache, json_mode) if current_api_key() else None
+    if cached:
+        return cached
+    future = _submit(prompt, timeout, json_mode)
+    if future is None:
+        return None
+    return _store(prompt, await asyncio.wrap_future(future), use_cache, json_mode)
+
+def _cache_model(model_name: str, json_mode: bool) -> str:
+    return f"{model_name}+json" if json_mode else model_name
+
+# --- Concurrent fan-out ---
+
+def llm_concurrency() -> int:
+    try:
+        return max(1, int(os.environ.get("GEMINI_MAX_CONCURRENCY", "8")))
+    except ValueError:
+        return 8
+
+def generate_many(prompts: t.Sequence[str], deadline: t.Optional[float] = None, concurrency: t.Optional[int] = None,
+                  use_cache: bool = True, json_mode: bool = False) -> t.Iterator[t.Tuple[int, t.Any, t.Optional[BaseException]]]:
+    """
+    Runs every prompt on the shared Gemini loop, at most `concurrency` calls
+    at a time, and yields (index, response, error) in completion order.
+
+    `deadline` is a time.monotonic() timestamp. Each call's request timeout is
+    clipped to it; once it passes, no new call is started, calls still running
+    are cancelled and the iterator stops, so callers keep whatever finished in
+    time. Prompts that never started are not yielded at all (cache hits still
+    are), so they stay pending rather than turning into errors.
+    """
+    def remaining() -> t.Optional[float]:
+        return None if deadline is None else deadline - time.monotonic()
+
+    limit = max(1, concurrency or llm_concurrency())
+    pending: dict = {}
+    next_index = 0
+    try:
+        while next_index < len(prompts) or pending:
+            while next_index < len(prompts) and len(pending) < limit:
+                index, prompt = next_index, prompts[next_index]
+                next_index += 1
+                cached = _cached(prompt, use_cache, json_mode) if current_api_key() else None
+                if cached:
+                    yield index, cached, None
+                    continue
+                left = remaining()
+                if left is not None and left <= 0:
+                    continue
+                future = _submit(prompt, left, json_mode)
+                if future is None:
+                    yield index, None, None
+                    continue
+                pending[future] = index
+            if not pending:
+                continue
+            left = remaining()
+            if left is not None and left <= 0:
+                break
+            done, _ = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    yield index, _store(prompts[index], future.result(), use_cache, json_mode), None
+                except Exception as e:
+                    yield index, None, e
+    finally:
+        for future in pending:
+            future.cancel()
+
 # --- Utility Functions (No changes needed) ---
 def today_iso():
     return datetime.datetime.utcnow().date().isoformat()
 
+def reusable_proposals(proposals: t.Iterable[dict]) -> t.Dict[str, dict]:
+    """
+    page_url -> earlier LLM proposal that can be kept as long as the page's
+    content_hash still matches. Fallbacks, errors and proposals copied from a
+    near-duplicate are always redone.
+    """
+    return {
+        p["page_url"]: p for p in proposals
+        if isinstance(p, dict) and p.get("page_url") and p.get("content_hash") and "error" not in p
+        and "canonical_to" not in p and not str(p.get("reason", "")).startswith("Fallback")
+    }
+
+class ProposalRun:
+    """
+    One agent run's proposals, by position in `pages`. Pages whose earlier
+    proposal is still reusable start out done; the rest are in `todo`. Every
+    save keeps the earlier proposals of pages (and of their near-duplicates)
+    still pending, so a run cut short by its deadline never loses them.
+    """
+    def __init__(self, session_id: str, agent: str, pages: t.List[dict], duplicates: t.Dict[str, t.List[dict]]):
+        self.session_id, self.agent, self.pages = session_id, agent, pages
+        stored = [p for p in load_agent(session_id, agent).get("proposals", []) if isinstance(p, dict)]
+        previous = reusable_proposals(stored)
+        self.proposals: t.Dict[int, t.Union[dict, t.List[dict]]] = {}
+        self.todo: t.List[int] = []
+        for i, page in enumerate(pages):
+            kept = previous.get(page.get("url"))
+            if kept and kept["content_hash"] == page.get("content_hash"):
+                self.proposals[i] = kept
+            else:
+                self.todo.append(i)
+        self._earlier: t.Dict[int, t.List[dict]] = {}
+        for i in self.todo:
+            urls = {pages[i].get("url")} | {m.get("url") for m in duplicates.get(pages[i].get("url"), [])}
+            self._earlier[i] = [p for p in stored if p.get("page_url") in urls]
+        self._saved_at = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        return len(self.pages) - len(self.proposals)
+
+    @property
+    def reused(self) -> int:
+        return len(self.pages) - len(self.todo)
+
+    @property
+    def propagated(self) -> int:
+        """Proposals copied to near-duplicates of this run's pages."""
+        return sum(len(e) - 1 for e in self.proposals.values() if isinstance(e, list))
+
+    def maybe_save(self) -> None:
+        """Saves at most once a second while results come in."""
+        if time.monotonic() - self._saved_at >= 1.0:
+            self.save()
+
+    def save(self) -> t.List[dict]:
+        ordered = []
+        for i in sorted(set(self.proposals) | set(self._earlier)):
+            entry = self.proposals[i] if i in self.proposals else self._earlier[i]
+            ordered.extend(entry if isinstance(entry, list) else [entry])
+        update_agent(self.session_id, self.agent, {"proposals": ordered, "pages_pending": self.pending, "created_at": today_iso()})
+        self._saved_at = time.monotonic()
+        return ordered
+
 def safe_json(text: str) -> t.Optional[t.Union[dict, list]]:
     """
     DEFINITIVELY FIXED: More robustly finds and parses a JSON object OR ARRAY from a string,
@@ -0,0 +1,234 @@
+# seo_index.py
+"""
+Page-level SEO metrics index.
+
+Each crawled page is reduced to a small metrics row when it is ingested
+(meta description / H1 / canonical presence, word count, title and the
+internal pages it links to). Site-wide counters are updated as rows are
+added, replaced or removed, and a compact summary (coverage counts,
+duplicate titles, thin pages, link-graph metrics, sample URLs) is stored
+with the snapshot as the "seo_metrics" section. Scoring and chat summaries
+read that summary instead of rescanning every page; the rows themselves
+live in the "index.seo_metrics" record and are only loaded on a re-crawl,
+which re-indexes the new and changed pages and drops the ones that are gone. Per-page link metrics (see link_graph) are kept in
+"index.link_graph" for the agents that propose internal links, and the
+near-duplicate clusters (see near_duplicates) in "index.near_duplicates"
+as member url -> representative url, so agents can process one page per
+cluster. A cluster's representative is the page its members already
+canonicalize to, else the home page, else the page with the highest
+internal PageRank.
+"""
+
+import itertools, os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+from context_store import INDEX_PREFIX, get_page, iter_pages, load_section, save_section
+from link_graph import LinkGraph
+from near_duplicates import cluster
+
+SUMMARY_KEY = "seo_metrics"
+STATE_KEY = INDEX_PREFIX + "seo_metrics"
+LINKS_KEY = INDEX_PREFIX + "link_graph"
+DUPLICATES_KEY = INDEX_PREFIX + "near_duplicates"
+INDEX_VERSION = 3
+THIN_PAGE_WORDS = int(os.environ.get("THIN_PAGE_WORDS", "300"))
+_SAMPLE_LIMIT = 10
+
+def page_key(url: str) -> str:
+    """URL form used to match links to pages: no fragment, no trailing slash."""
+    return (url or "").split("#", 1)[0].rstrip("/")
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower().removeprefix("www.")
+
+def _norm_title(title: str) -> str:
+    return " ".join((title or "").lower().split())
+
+def page_metrics(page: Dict) -> Dict:
+    """The metrics row for one extracted page."""
+    url = page.get("url", "")
+    key, host = page_key(url), _host(url)
+    links = page.get("internal_links") or []
+    out = sorted({page_key(link) for link in links if _host(link) == host} - {key})
+    return {
+        "meta": bool(page.get("meta_description")),
+        "h1": bool(page.get("h1")),
+        "canonical": page_key(page.get("canonical") or ""),
+        "links": len(links),
+        "words": page.get("word_count"),  # None for pages extracted before word counts existed
+        "title": _norm_title(page.get("title", "")),
+        "fingerprint": page.get("text_fingerprint"),
+        "out": out,
+    }
+
+class SeoIndex:
+    def __init__(self, root_url: str = "", rows: Optional[Dict[str, Dict]] = None, order: Optional[List[str]] = None):
+        self.root = page_key(root_url)
+        self.rows: Dict[str, Dict] = {}      # in crawl order, for sample URLs
+        self.counts: Counter = Counter()     # meta / h1 / canonical / links / thin
+        self.titles: Counter = Counter()
+        self._links: Optional[tuple] = None  # cached LinkGraph.analyze() result
+        self._duplicates: Optional[tuple] = None
+        for url in order or list(rows or {}):
+            if rows and url in rows:
+                self.rows[url] = rows[url]
+                self._apply(rows[url], +1)
+
+    def _apply(self, row: Dict, sign: int) -> None:
+        self._links = self._duplicates = None
+        self.counts["meta"] += sign * row["meta"]
+        self.counts["h1"] += sign * row["h1"]
+        self.counts["canonical"] += sign * bool(row["canonical"])
+        self.counts["links"] += sign * row["links"]
+        self.counts["thin"] += sign * (row["words"] is not None and row["words"] < THIN_PAGE_WORDS)
+        if row["title"]:
+            self.titles[row["title"]] += sign
+
+    def add(self, page: Dict) -> None:
+        """Adds a page, replacing its previous row if it was already indexed."""
+        url = page.get("url", "")
+        if not url:
+            return
+        if url in self.rows:
+            self._apply(self.rows[url], -1)
+        self.rows[url] = page_metrics(page)  # a replaced row keeps its place
+        self._apply(self.rows[url], +1)
+
+    def remove(self, url: str) -> None:
+        row = self.rows.pop(url, None)
+        if row is not None:
+            self._apply(row, -1)
+
+    def link_analysis(self) -> tuple:
+        """(summary, per-page metrics) of the internal link graph; recomputed only after changes."""
+        if self._links is None:
+            graph = LinkGraph.from_links(((url, row["out"]) for url, row in self.rows.items()),
+                                         root_url=self.root or None, key=page_key)
+            self._links = graph.analyze()
+        return self._links
+
+    def duplicate_analysis(self) -> tuple:
+        """(summary, member url -> representative url) of the near-duplicate clusters."""
+        if self._duplicates is None:
+            ranks = self.link_analysis()[1]
+            clusters, members_of = [], {}
+            order = list(self.rows)
+            for group in cluster([row["fingerprint"] for row in self.rows.values()]):
+                urls = [order[i] for i in group]
+                by_key = {page_key(u): u for u in urls}
+                targets = Counter(by_key[self.rows[u]["canonical"]] for u in urls if self.rows[u]["canonical"] in by_key)
+                if targets:
+                    rep = targets.most_common(1)[0][0]
+                elif self.root in by_key:
+                    rep = by_key[self.root]
+                else:
+                    rep = max(urls, key=lambda u: ranks.get(u, [0])[0])
+                missing = sum(1 for u in urls if u != rep and self.rows[u]["canonical"] != page_key(rep))
+                clusters.append({"representative": rep, "pages": len(urls), "missing_canonical": missing,
+                                 "members": [u for u in urls if u != rep][:5]})
+                members_of.update({u: rep for u in urls if u != rep})
+            clusters.sort(key=lambda c: -c["pages"])
+            summary = {
+                "clusters": len(clusters),
+                "pages": sum(c["pages"] for c in clusters),
+                "redundant_pages": len(members_of),
+                "missing_canonical": sum(c["missing_canonical"] for c in clusters),
+                "samples": clusters[:5],
+            }
+            self._duplicates = (summary, members_of)
+        return self._duplicates
+
+    def summary(self) -> Dict:
+        n = len(self.rows)
+        duplicate_groups = sorted(((c, t) for t, c in self.titles.items() if c > 1), reverse=True)
+        thin = [url for url, row in self.rows.items() if row["words"] is not None and row["words"] < THIN_PAGE_WORDS]
+        links = self.link_analysis()[0]
+        return {
+            "version": INDEX_VERSION,
+            "page_count": n,
+            "with_meta": self.counts["meta"],
+            "with_h1": self.counts["h1"],
+            "with_canonical": self.counts["canonical"],
+            "avg_internal_links": round(self.counts["links"] / n, 2) if n else 0.0,
+            "duplicate_title_pages": sum(c for c, _ in duplicate_groups),
+            "duplicate_titles": [{"title": t, "pages": c} for c, t in duplicate_groups[:_SAMPLE_LIMIT]],
+            "thin_pages": len(thin),
+            "thin_page_words": THIN_PAGE_WORDS,
+            "thin_samples": thin[:_SAMPLE_LIMIT],
+            "orphan_pages": links["orphan_pages"],
+            "orphan_samples": links["orphan_samples"],
+            "link_graph": {k: v for k, v in links.items() if k not in ("orphan_pages", "orphan_samples")},
+            "near_duplicates": self.duplicate_analysis()[0],
+            "sample_urls": list(itertools.islice(self.rows, 5)),
+        }
+
+    def to_state(self) -> Dict:
+        return {"version": INDEX_VERSION, "root": self.root, "order": list(self.rows), "rows": self.rows}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "SeoIndex":
+        return cls(state.get("root", ""), rows=state.get("rows") or {}, order=state.get("order"))
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Dict], root_url: str = "") -> "SeoIndex":
+        index = cls(root_url)
+        for page in pages:
+            index.add(page)
+        return index
+
+    def save_state(self, session_id: str) -> None:
+        """Stores the rows and per-page link metrics; the summary is saved separately (see save)."""
+        save_section(session_id, STATE_KEY, self.to_state())
+        save_section(session_id, LINKS_KEY, self.link_analysis()[1])
+        save_section(session_id, DUPLICATES_KEY, self.duplicate_analysis()[1])
+
+    def save(self, session_id: str) -> Dict:
+        summary = self.summary()
+        self.save_state(session_id)
+        save_section(session_id, SUMMARY_KEY, summary)
+        return summary
+
+def load_index(session_id: str) -> SeoIndex:
+    """The stored index, rebuilt from the session's pages when it is missing or out of date."""
+    state = load_section(session_id, STATE_KEY)
+    if state and state.get("version") == INDEX_VERSION:
+        return SeoIndex.from_state(state)
+    root = (load_section(session_id, "website", {}) or {}).get("url", "")
+    return SeoIndex.from_pages(iter_pages(session_id, without_html=True), root)
+
+def load_link_metrics(session_id: str) -> Dict[str, list]:
+    """url -> [relative pagerank, click depth, inlinks, outlinks]; empty before the first crawl."""
+    return load_section(session_id, LINKS_KEY, {}) or {}
+
+def load_duplicate_map(session_id: str) -> Dict[str, str]:
+    """Near-duplicate page url -> its cluster's representative url (representatives are not keys)."""
+    return load_section(session_id, DUPLICATES_KEY, {}) or {}
+
+def representative_pages(session_id: str, limit: int, without_html: bool = False) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+    """
+    The first `limit` pages that are not near-duplicates of another page, and
+    {representative url: its near-duplicate pages (no html)} for those pages.
+    """
+    duplicates = load_duplicate_map(session_id)
+    if not duplicates:
+        return list(iter_pages(session_id, limit=limit, without_html=without_html)), {}
+    representatives: List[Dict] = []
+    members: Dict[str, List[Dict]] = {}
+    for page in iter_pages(session_id, without_html=True):
+        rep = duplicates.get(page.get("url"))
+        if rep:
+            members.setdefault(rep, []).append(page)
+        elif len(representatives) < limit:
+            representatives.append(page)
+    if not without_html:
+        representatives = [get_page(session_id, p["url"]) or p for p in representatives]
+    chosen = {p.get("url") for p in representatives}
+    return representatives, {rep: pages for rep, pages in members.items() if rep in chosen}
+
+def ensure_summary(session_id: str) -> Dict:
+    """The stored summary; sessions crawled before the index existed get one built (once) from their pages."""
+    summary = load_section(session_id, SUMMARY_KEY)
+    if summary and summary.get("version") == INDEX_VERSION:
+        return summary
+    return load_index(session_id).save(session_id)
@@ -1,16 +1,253 @@
 
 from typing import Any, Dict, List, Tuple, Optional
+import itertools, json, os, threading, time
+from urllib.parse import urlparse
+import requests
 from cms_base import CMSClient
+from cms_executor import retry_delay
+
+API_VERSION = os.environ.get("SHOPIFY_API_VERSION", "2024-10")
+# Aliased mutations sent in one GraphQL document; metafieldsSet takes up to 25 metafields per alias.
+BATCH_ALIASES = int(os.environ.get("SHOPIFY_BATCH_ALIASES", "10"))
+METAFIELDS_PER_SET = 25
+LOOKUP_PAGE = 50
+MAX_ATTEMPTS = 6
+# Online Store resources whose SEO title / description live in the global.* metafields.
+RESOURCE_PATHS = {"products": "products", "collections": "collections", "pages": "pages"}
+
+class CostThrottle:
+    """
+    Client-side model of the GraphQL Admin API's leaky bucket. Each response's
+    extensions.cost.throttleStatus resets it to the server's numbers; between
+    responses it refills at restoreRate, and wait() sleeps until a query's
+    estimated cost fits, so requests are paced instead of bounced with THROTTLED.
+    """
+    def __init__(self, maximum: float = 1000.0, restore_rate: float = 50.0):
+        self.maximum = maximum
+        self.available = maximum
+        self.restore_rate = restore_rate
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(self.maximum, self.available + (now - self.updated) * self.restore_rate)
+        self.updated = now
+
+    def wait(self, cost: float) -> None:
+        self._refill()
+        cost = min(cost, self.maximum)
+        if self.available < cost:
+            delay = (cost - self.available) / self.restore_rate
+            time.sleep(delay)
+            self.waited += delay
+            self._refill()
+        self.available -= cost
+
+    def update(self, cost: Optional[Dict[str, Any]]) -> None:
+        status = (cost or {}).get("throttleStatus")
+        if status:
+            self.maximum = float(status.get("maximumAvailable", self.maximum))
+            self.available = float(status.get("currentlyAvailable", self.available))
+            self.restore_rate = float(status.get("restoreRate") or self.restore_rate)
+            self.updated = time.monotonic()
 
 class ShopifyAdapter(CMSClient):
-    """Requires creds: { store: myshop.myshopify.com, token: Admin API access token }"""
+    """
+    Requires creds: { store: myshop.myshopify.com, token: Admin API access token }.
+    Optional: api_base (full GraphQL endpoint, e.g. a local mock), api_version, blog_id.
+
+    Calls are staged and sent in finalize() as a few aliased GraphQL documents:
+    handle lookups per resource type, metafieldsSet for SEO titles /
+    descriptions (global.title_tag / global.description_tag) and JSON-LD
+    (fieldnote.json_ld), articleCreate for posts and urlRedirectCreate for
+    redirects. Every request is paced by a CostThrottle.
+    """
     def __init__(self, creds: Dict[str, Any]):
-        self.creds = creds
+        self.creds = creds or {}
+        store, token = self.creds.get("store"), self.creds.get("token")
+        if not (token and (store or self.creds.get("api_base"))):
+            raise ValueError("Missing Shopify creds: need store and token (Admin API access token).")
+        version = self.creds.get("api_version") or API_VERSION
+        self.endpoint = self.creds.get("api_base") or f"https://{store}/admin/api/{version}/graphql.json"
+        self.session = requests.Session()
+        self.session.headers.update({"X-Shopify-Access-Token": token, "Content-Type": "application/json"})
+        self.throttle = CostThrottle()
+        self.requests_made = 0
+        self._cost_per_alias: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._refs = itertools.count(1)
+        self._metafields: List[Tuple[str, str, str, Dict[str, Any]]] = []   # (ref, resource type, handle, metafield)
+        self._articles: List[Tuple[str, Dict[str, Any]]] = []
+        self._redirects: List[Tuple[str, Dict[str, str]]] = []
+
+    def _alias_cost(self, kind: str) -> float:
+        # Connection lookups cost about one point per requested node; mutations about 10.
+        return self._cost_per_alias.get(kind, LOOKUP_PAGE + 2.0 if kind == "lookup" else 10.0)
+
+    def _batches(self, items: list, kind: str):
+        """
+        Slices of `items` of at most BATCH_ALIASES, shrunk so one document never
+        costs more than the bucket holds. The first document of a kind has a
+        single alias, so its response reports the real cost and bucket size.
+        """
+        start = 0
+        while start < len(items):
+            if kind not in self._cost_per_alias:
+                size = 1
+            else:
+                size = max(1, min(BATCH_ALIASES, int(self.throttle.maximum // self._alias_cost(kind))))
+            yield items[start:start + size]
+            start += size
+
+    def _graphql(self, query: str, variables: Optional[Dict[str, Any]] = None, kind: str = "query", aliases: int = 1) -> Dict[str, Any]:
+        estimate = self._alias_cost(kind) * aliases
+        attempt = 0
+        while True:
+            attempt += 1
+            self.throttle.wait(estimate)
+            r = self.session.post(self.endpoint, data=json.dumps({"query": query, "variables": variables or {}}), timeout=60)
+            self.requests_made += 1
+            try:
+                r.raise_for_status()
+            except requests.HTTPError as e:
+                delay = retry_delay(e, attempt) if attempt < MAX_ATTEMPTS else None
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            body = r.json()
+            cost = (body.get("extensions") or {}).get("cost")
+            self.throttle.update(cost)
+            if cost and cost.get("requestedQueryCost"):
+                self._cost_per_alias[kind] = float(cost["requestedQueryCost"]) / aliases
+            errors = body.get("errors") or []
+            if errors and all((e.get("extensions") or {}).get("code") == "THROTTLED" for e in errors) and attempt < MAX_ATTEMPTS:
+                continue  # the bucket state from this response makes the next wait() long enough
+            if errors:
+                raise RuntimeError("Shopify GraphQL error: " + "; ".join(str(e.get("message")) for e in errors))
+            return body.get("data") or {}
+
+    def _stage(self, bucket: list, *item) -> str:
+        with self._lock:
+            ref = f"s{next(self._refs)}"
+            bucket.append((ref, *item))
+        return ref
+
+    @staticmethod
+    def _resource(page_id_or_path: str) -> Optional[Tuple[str, str]]:
+        path = urlparse(page_id_or_path).path if "://" in page_id_or_path else page_id_or_path
+        parts = [p for p in path.split("/") if p]
+        if len(parts) >= 2 and parts[0] in RESOURCE_PATHS:
+            return RESOURCE_PATHS[parts[0]], parts[1]
+        if len(parts) == 3 and parts[0] == "blogs":
+            return "articles", parts[2]
+        return None
+
+    def _stage_metafields(self, page_id_or_path: str, metafields: List[Dict[str, Any]], what: str) -> Dict[str, Any]:
+        resource = self._resource(page_id_or_path)
+        if resource is None:
+            return {"ok": False, "message": "only product, collection, page and article URLs can be updated"}
+        with self._lock:
+            ref = f"s{next(self._refs)}"
+            self._metafields.extend((ref, *resource, m) for m in metafields)
+        return {"ok": True, "staged": True, "ref": ref, "message": f"{what} queued for {resource[0][:-1]} '{resource[1]}'"}
+
     def update_page_meta(self, page_id_or_path: str, title: Optional[str]=None, description: Optional[str]=None, canonical: Optional[str]=None):
-        return {"ok": False, "message": "Implement with Shopify Admin API"}
+        metafields = []
+        if title: metafields.append({"namespace": "global", "key": "title_tag", "type": "single_line_text_field", "value": title})
+        if description: metafields.append({"namespace": "global", "key": "description_tag", "type": "multi_line_text_field", "value": description})
+        if not metafields:
+            return {"ok": False, "message": "nothing to update"}
+        return self._stage_metafields(page_id_or_path, metafields, "SEO fields")
+
     def inject_json_ld(self, page_id_or_path: str, json_ld: Dict[str, Any]):
-        return {"ok": False, "message": "Implement via theme snippet or metafield"}
+        # Rendered by a theme snippet reading the fieldnote.json_ld metafield.
+        metafield = {"namespace": "fieldnote", "key": "json_ld", "type": "json", "value": json.dumps(json_ld)}
+        return self._stage_metafields(page_id_or_path, [metafield], "JSON-LD metafield")
+
     def create_post(self, collection_or_path: str, title: str, html: str, slug: Optional[str]=None, date: Optional[str]=None, meta: Optional[Dict[str, Any]]=None):
-        return {"ok": False, "message": "Implement with /blogs and /articles endpoints"}
+        article = {"title": title, "body": html, "isPublished": False}
+        if slug: article["handle"] = slug
+        ref = self._stage(self._articles, article)
+        return {"ok": True, "staged": True, "ref": ref, "message": "Article queued as unpublished draft"}
+
     def set_redirects(self, redirects: List[Tuple[str, str, int]]):
-        return {"ok": False, "message": "Implement with redirects API"}
+        refs = [self._stage(self._redirects, {"path": a, "target": b}) for a, b, _ in redirects]
+        # One ref per redirect, so finalize() can fail exactly the redirects Shopify rejected.
+        return {"ok": True, "staged": True, "ref": refs, "message": f"{len(refs)} redirect(s) queued"}
+
+    def _resolve_ids(self) -> Dict[Tuple[str, str], str]:
+        """(resource type, handle) -> GID for every staged metafield owner, LOOKUP_PAGE handles per alias."""
+        wanted = sorted({(kind, handle) for _, kind, handle, _ in self._metafields})
+        lookups = [(kind, [h for _, h in group]) for kind, group in itertools.groupby(wanted, key=lambda w: w[0])]
+        chunks = [(kind, handles[i:i + LOOKUP_PAGE]) for kind, handles in lookups for i in range(0, len(handles), LOOKUP_PAGE)]
+        ids: Dict[Tuple[str, str], str] = {}
+        for batch in self._batches(chunks, "lookup"):
+            fields, variables = [], {}
+            for i, (kind, handles) in enumerate(batch):
+                variables[f"q{i}"] = " OR ".join(f"handle:{json.dumps(h)}" for h in handles)
+                fields.append(f"r{i}: {kind}(first: {LOOKUP_PAGE}, query: $q{i}) {{ nodes {{ id handle }} }}")
+            declared = ", ".join(f"$q{i}: String" for i in range(len(batch)))
+            data = self._graphql(f"query({declared}) {{ {' '.join(fields)} }}", variables, "lookup", len(batch))
+            for i, (kind, _) in enumerate(batch):
+                for node in ((data.get(f"r{i}") or {}).get("nodes") or []):
+                    ids[(kind, node["handle"])] = node["id"]
+        return ids
+
+    def _mutate(self, name: str, argument: str, input_type: str, items: List[Tuple[List[str], Any]], result: str, failed: Dict[str, str]) -> int:
+        """Sends `items` ([refs], input) as aliased `name` mutations, batched; returns the number applied."""
+        applied = 0
+        for batch in self._batches(items, name):
+            declared = ", ".join(f"$v{i}: {input_type}" for i in range(len(batch)))
+            fields = " ".join(f"m{i}: {name}({argument}: $v{i}) {{ {result} userErrors {{ field message }} }}" for i in range(len(batch)))
+            try:
+                data = self._graphql(f"mutation({declared}) {{ {fields} }}", {f"v{i}": item for i, (_, item) in enumerate(batch)}, name, len(batch))
+            except Exception as e:
+                failed.update({ref: str(e) for refs, _ in batch for ref in refs})
+                continue
+            for i, (refs, _) in enumerate(batch):
+                errors = (data.get(f"m{i}") or {}).get("userErrors") or []
+                if errors:
+                    failed.update({ref: "; ".join(e.get("message", "") for e in errors) for ref in refs})
+                else:
+                    applied += 1
+        return applied
+
+    def finalize(self) -> Dict[str, Any]:
+        if not (self._metafields or self._articles or self._redirects):
+            return {}
+        started = time.monotonic()
+        failed: Dict[str, str] = {}
+        applied = 0
+        if self._metafields:
+            ids = self._resolve_ids()
+            resolved = []
+            for ref, kind, handle, metafield in self._metafields:
+                owner = ids.get((kind, handle))
+                if owner is None:
+                    failed[ref] = f"no Shopify {kind[:-1]} with handle '{handle}'"
+                else:
+                    resolved.append((ref, {**metafield, "ownerId": owner}))
+            sets = [([ref for ref, _ in resolved[i:i + METAFIELDS_PER_SET]], [m for _, m in resolved[i:i + METAFIELDS_PER_SET]])
+                    for i in range(0, len(resolved), METAFIELDS_PER_SET)]
+            applied += self._mutate("metafieldsSet", "metafields", "[MetafieldsSetInput!]!", sets, "metafields { id }", failed)
+        if self._articles:
+            blog_id = self.creds.get("blog_id")
+            if not blog_id:
+                blogs = (self._graphql("query { blogs(first: 1) { nodes { id } } }").get("blogs") or {}).get("nodes") or []
+                blog_id = blogs[0]["id"] if blogs else None
+            if blog_id is None:
+                failed.update({ref: "the store has no blog" for ref, _ in self._articles})
+            else:
+                items = [([ref], {**article, "blogId": blog_id}) for ref, article in self._articles]
+                applied += self._mutate("articleCreate", "article", "ArticleCreateInput!", items, "article { id }", failed)
+        if self._redirects:
+            items = [([ref], redirect) for ref, redirect in self._redirects]
+            applied += self._mutate("urlRedirectCreate", "urlRedirect", "UrlRedirectInput!", items, "urlRedirect { id }", failed)
+        return {
+            "ok": True, "failed": failed, "requests": self.requests_made,
+            "throttle_wait_seconds": round(self.throttle.waited, 2),
+            "message": (f"Shopify: {applied} mutation(s) in {self.requests_made} request(s), "
+                        f"{round(self.throttle.waited, 1)}s rate-limit wait, {round(time.monotonic() - started, 1)}s total."),
+        }
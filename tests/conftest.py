@@ -0,0 +1,6 @@
+import os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# context_store creates its database directory relative to the working directory on import.
+os.chdir(tempfile.mkdtemp(prefix="fieldnote-tests-"))
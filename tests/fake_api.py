@@ -0,0 +1,53 @@
+# tests/fake_api.py
+"""
+A local fake HTTP API for adapter tests. Routes map (method, path) to a
+handler(request) returning (status, json body[, headers]); every request is
+recorded in `calls` with its parsed JSON body and query.
+"""
+
+import json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+class FakeAPI:
+    def __init__(self, routes: Dict[Tuple[str, str], Callable[[Dict[str, Any]], tuple]]):
+        self.routes = routes
+        self.calls: List[Dict[str, Any]] = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                request = {"method": self.command, "path": url.path, "headers": dict(self.headers),
+                           "query": {k: v[0] for k, v in parse_qs(url.query).items()},
+                           "body": json.loads(raw) if raw else None}
+                api.calls.append(request)
+                handler = api.routes.get((self.command, url.path))
+                status, body, headers = (handler(request) + ({},))[:3] if handler else (404, {"message": "no route"}, {})
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = _handle
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def requests_to(self, method: str, path: str) -> List[Dict[str, Any]]:
+        return [c for c in self.calls if c["method"] == method and c["path"] == path]
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,122 @@
+import pytest
+from fake_api import FakeAPI
+from webflow_adapter import WebflowAdapter
+from wix_adapter import WixAdapter
+
+@pytest.fixture(autouse=True)
+def unpaced(monkeypatch):
+    monkeypatch.setenv("WEBFLOW_REQUESTS_PER_MINUTE", "0")
+    monkeypatch.setenv("WIX_REQUESTS_PER_MINUTE", "0")
+
+def webflow_api(items, fail_update=(), throttle_once=True, drop_created=()):
+    state = {"throttle": throttle_once}
+
+    def list_items(req):
+        offset, limit = int(req["query"]["offset"]), int(req["query"]["limit"])
+        return 200, {"items": items[offset:offset + limit], "pagination": {"total": len(items)}}
+
+    def update(req):
+        if state["throttle"]:
+            state["throttle"] = False
+            return 429, {"message": "Too many requests"}, {"Retry-After": "0"}
+        return 200, {"items": [i for i in req["body"]["items"] if i["id"] not in fail_update]}
+
+    def create(req):
+        return 200, {"items": [i for i in req["body"]["items"] if i["fieldData"].get("slug") not in drop_created]}
+
+    return FakeAPI({
+        ("GET", "/collections/c1/items"): list_items,
+        ("PATCH", "/collections/c1/items"): update,
+        ("POST", "/collections/c1/items"): create,
+        ("GET", "/sites/s1/pages"): lambda req: (200, {"pages": [{"id": "pg1", "publishedPath": "/about"}], "pagination": {"total": 1}}),
+        ("PUT", "/pages/pg1"): lambda req: (200, {"id": "pg1"}),
+        ("POST", "/sites/s1/publish"): lambda req: (200, {"customDomains": []}),
+    })
+
+def test_webflow_updates_in_bulk_and_reports_items_that_were_not_updated():
+    items = [{"id": f"w{i}", "fieldData": {"slug": f"item-{i}", "name": f"Item {i}"}} for i in range(150)]
+    api = webflow_api(items, fail_update={"w7"})
+    try:
+        client = WebflowAdapter({"token": "t", "site_id": "s1", "collection_id": "c1", "api_base": api.url})
+        refs = {}
+        for i in range(150):
+            refs[i] = client.update_page_meta(f"https://site.test/c/item-{i}", f"Title {i}", "Description")["ref"]
+        schema_ref = client.inject_json_ld("/c/item-7", {"@type": "Thing"})["ref"]
+        result = client.finalize()
+    finally:
+        api.close()
+
+    patches = api.requests_to("PATCH", "/collections/c1/items")
+    assert [len(p["body"]["items"]) for p in patches] == [100, 100, 50]  # first chunk throttled once and retried
+    assert len(api.requests_to("GET", "/collections/c1/items")) == 2
+    item_7 = next(i for i in patches[1]["body"]["items"] if i["id"] == "w7")
+    assert set(item_7["fieldData"]) == {"seo-title", "seo-description", "json-ld"}
+    assert set(result["failed"]) == {refs[7], schema_ref}
+    assert len(api.requests_to("POST", "/sites/s1/publish")) == 1
+
+def test_webflow_create_failures_and_static_page_seo():
+    api = webflow_api([], throttle_once=False, drop_created={"second"})
+    try:
+        client = WebflowAdapter({"token": "t", "site_id": "s1", "collection_id": "c1", "api_base": api.url})
+        page = client.update_page_meta("https://site.test/about", "About us", "Who we are")
+        first = client.create_post("", "First", "<p>1</p>", slug="first")["ref"]
+        second = client.create_post("", "Second", "<p>2</p>", slug="second")["ref"]
+        result = client.finalize()
+    finally:
+        api.close()
+
+    assert page["ok"] and not page.get("staged")
+    assert api.requests_to("PUT", "/pages/pg1")[0]["body"] == {"seo": {"title": "About us", "description": "Who we are"}}
+    assert result["failed"] == {second: "not created by Webflow"} and first not in result["failed"]
+    assert len(api.requests_to("POST", "/sites/s1/publish")) == 1
+
+def wix_api(items, fail_update=()):
+    def query(req):
+        paging = req["body"]["query"]["paging"]
+        return 200, {"dataItems": items[paging["offset"]:paging["offset"] + paging["limit"]]}
+
+    def patch(req):
+        return 200, {"results": [{"itemMetadata": {"id": p["dataItemId"], "success": p["dataItemId"] not in fail_update,
+                                                   "error": {"description": "validation failed"}}}
+                                 for p in req["body"]["patches"]]}
+
+    return FakeAPI({
+        ("POST", "/wix-data/v2/items/query"): query,
+        ("POST", "/wix-data/v2/bulk/items/patch"): patch,
+        ("POST", "/wix-data/v2/bulk/items/insert"): lambda req: (200, {"results": [{"itemMetadata": {"success": True}} for _ in req["body"]["dataItems"]]}),
+        ("POST", "/site-publisher/v1/site/publish"): lambda req: (200, {}),
+    })
+
+def test_wix_patches_only_the_staged_fields():
+    items = [{"id": f"x{i}", "data": {"_id": f"x{i}", "_createdDate": {"$date": "2024-01-01"}, "_owner": "o",
+                                      "slug": f"item-{i}", "title": f"Item {i}", "price": i}} for i in range(1200)]
+    api = wix_api(items, fail_update={"x3"})
+    try:
+        client = WixAdapter({"api_key": "k", "site_id": "s1", "collection_id": "c1", "api_base": api.url})
+        refs = [client.update_page_meta(f"/c/item-{i}", f"T{i}", "D")["ref"] for i in range(1100)]
+        post = client.create_post("", "Hello", "<p>Hi</p>", slug="hello")["ref"]
+        result = client.finalize()
+    finally:
+        api.close()
+
+    patches = api.requests_to("POST", "/wix-data/v2/bulk/items/patch")
+    assert [len(p["body"]["patches"]) for p in patches] == [1000, 100]
+    modifications = patches[0]["body"]["patches"][0]["fieldModifications"]
+    assert {m["fieldPath"]: m["setFieldOptions"]["value"] for m in modifications} == {"seoTitle": "T0", "seoDescription": "D"}
+    assert result["failed"] == {refs[3]: "validation failed"} and post not in result["failed"]
+    assert api.requests_to("POST", "/wix-data/v2/bulk/items/insert")[0]["body"]["dataItems"] == [{"data": {"title": "Hello", "body": "<p>Hi</p>", "slug": "hello"}}]
+    assert len(api.requests_to("POST", "/site-publisher/v1/site/publish")) == 1
+
+def test_nothing_applied_means_no_publish():
+    api = wix_api([{"id": "x0", "data": {"slug": "only"}}], fail_update={"x0"})
+    try:
+        client = WixAdapter({"api_key": "k", "site_id": "s1", "collection_id": "c1", "api_base": api.url})
+        ref = client.update_page_meta("/only", "T", "D")["ref"]
+        missing = client.update_page_meta("/missing", "T", "D")
+        result = client.finalize()
+    finally:
+        api.close()
+
+    assert missing["ok"] is False
+    assert list(result["failed"]) == [ref]
+    assert not api.requests_to("POST", "/site-publisher/v1/site/publish")
@@ -0,0 +1,64 @@
+import asyncio, uuid
+import pytest
+import requests
+from cms_executor import LEDGER_KEY, CMSExecutor, Operation
+from context_store import load_section
+
+class Client:
+    RESUMABLE = True
+
+    def __init__(self, failures=None):
+        self.calls, self.failures, self.finalized = [], dict(failures or {}), 0  # each failure is raised once
+
+    def write(self, target):
+        self.calls.append(target)
+        error = self.failures.pop(target, None)
+        if error:
+            raise error
+        return {"ok": True, "message": f"wrote {target}"}
+
+    def finalize(self):
+        self.finalized += 1
+        return {"ok": True}
+
+def ops(*targets):
+    return [Operation("meta", t, {"title": t}, lambda client, t=t: client.write(t)) for t in targets]
+
+def throttled():
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = "0"
+    return requests.HTTPError(response=response)
+
+@pytest.fixture
+def session():
+    return f"exec-{uuid.uuid4().hex}"
+
+def test_a_resumed_run_skips_operations_marked_done(session):
+    first = Client(failures={"/b": ValueError("bad title")})
+    report = asyncio.run(CMSExecutor(session, first, "wordpress").run(ops("/a", "/b")))
+    assert report["done"] == 1 and report["failed"] == 1
+    ledger = load_section(session, LEDGER_KEY)
+    assert sorted(entry["status"] for entry in ledger.values()) == ["done", "failed"]
+
+    second = Client()
+    report = asyncio.run(CMSExecutor(session, second, "wordpress").run(ops("/a", "/b")))
+    assert second.calls == ["/b"]
+    assert report["already_done"] == 1 and report["done"] == 1
+
+def test_done_on_another_platform_or_a_non_resumable_adapter_is_redone(session):
+    asyncio.run(CMSExecutor(session, Client(), "wordpress").run(ops("/a")))
+    other = Client()
+    asyncio.run(CMSExecutor(session, other, "shopify").run(ops("/a")))
+    assert other.calls == ["/a"]
+    fresh = Client()
+    fresh.RESUMABLE = False
+    asyncio.run(CMSExecutor(session, fresh, "wordpress").run(ops("/a")))
+    assert fresh.calls == ["/a"]
+
+def test_throttled_operations_are_retried(session):
+    client = Client(failures={"/a": throttled()})
+    report = asyncio.run(CMSExecutor(session, client, "wordpress").run(ops("/a")))
+    assert client.calls == ["/a", "/a"]
+    assert report["done"] == 1 and report["by_kind"]["meta"]["retries"] == 1
+    assert client.finalized == 1
@@ -0,0 +1,41 @@
+import uuid
+import context_store
+
+def session():
+    return f"test-{uuid.uuid4().hex}"
+
+def urls(session_id):
+    return [p["url"] for p in context_store.iter_pages(session_id)]
+
+def test_concurrent_sinks_of_one_session_do_not_mix_pages():
+    sid = session()
+    first, second = context_store.PageSink(sid), context_store.PageSink(sid)
+    first.write({"url": "https://a.test/1"})
+    second.write({"url": "https://a.test/2"})
+    second.close()
+    assert urls(sid) == ["https://a.test/2"]
+    first.write({"url": "https://a.test/3"})
+    first.close()
+    assert urls(sid) == ["https://a.test/1", "https://a.test/3"]
+
+def test_a_failed_sink_keeps_the_previous_pages():
+    sid = session()
+    context_store.save_pages(sid, [{"url": "https://a.test/old"}])
+    try:
+        with context_store.PageSink(sid) as sink:
+            sink.write({"url": "https://a.test/new"})
+            raise RuntimeError("crawl failed")
+    except RuntimeError:
+        pass
+    assert urls(sid) == ["https://a.test/old"]
+    assert context_store._conn().execute("SELECT COUNT(*) FROM pages WHERE session_id LIKE ?", (sid + "%",)).fetchone()[0] == 1
+
+def test_stale_staged_pages_are_dropped(monkeypatch):
+    sid = session()
+    sink = context_store.PageSink(sid)
+    sink.write({"url": "https://a.test/1"})
+    sink._flush()
+    started = int(sink._staging.split("\x00")[2])
+    monkeypatch.setattr(context_store.time, "time", lambda: started + context_store._STALE_STAGING_SECONDS + 1)
+    context_store.PageSink(sid)
+    assert context_store._conn().execute("SELECT COUNT(*) FROM pages WHERE session_id=?", (sink._staging,)).fetchone()[0] == 0
@@ -0,0 +1,39 @@
+import asyncio, functools, os, signal, threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import search_crawl
+from search_crawl import CrawlConfig, crawl_site
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def site(tmp_path):
+    links = "".join(f'<a href="/p{i}.html">page {i}</a>' for i in range(6))
+    (tmp_path / "index.html").write_text(f"<html><head><title>Home</title></head><body><h1>Home</h1>{links}</body></html>")
+    for i in range(6):
+        (tmp_path / f"p{i}.html").write_text(f"<html><head><title>Page {i}</title></head><body><h1>Page {i}</h1><p>text {i}</p></body></html>")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(tmp_path)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+def crawl(url, **config):
+    return asyncio.run(crawl_site(url, CrawlConfig(rate_limit_per_host=1000, max_in_flight_per_host=4, **config)))
+
+def test_crawl_recovers_from_a_broken_process_pool(site):
+    kind, pool = search_crawl._parse_pool("process", 2)
+    assert kind == "process"
+    pool.submit(os.getpid).result()
+    for process in list(pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+
+    result = crawl(site, parse_executor="process", parse_workers=2)
+    assert len(result.pages) == 7 and not result.errors
+    assert result.stats["broken_parse_pools"] == 1 and result.stats["parse_executor"] == "thread"
+
+    result = crawl(site, parse_executor="process", parse_workers=2)
+    assert len(result.pages) == 7 and result.stats["parse_executor"] == "process"
+    assert search_crawl._parse_pools["process"] is not pool
@@ -0,0 +1,50 @@
+import asyncio, time
+from collections import deque
+from crawl_frontier import MAX_RETRIES, HostFrontier, host_key, parse_retry_after
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_urls_are_queued_once_per_crawl():
+    frontier = HostFrontier()
+    assert frontier.put_nowait("https://a.test/x")
+    assert not frontier.put_nowait("https://a.test/x")
+    assert not frontier.put_nowait("not a url")
+    assert frontier.size() == 1
+
+def test_a_throttled_host_does_not_hold_up_the_others():
+    async def main():
+        frontier = HostFrontier(rate_per_host=100)
+        await frontier.put("https://a-slow.test/1")
+        await frontier.put("https://b-fast.test/1")
+        await frontier.put("https://b-fast.test/2")
+        key, url = await frontier.get()
+        assert url == "https://a-slow.test/1"
+        await frontier.done(key, url, status=429, retry_after=30)
+        started = time.monotonic()
+        served = []
+        for _ in range(2):
+            key, url = await frontier.get()
+            served.append(url)
+            await frontier.done(key, url, status=200)
+        assert served == ["https://b-fast.test/1", "https://b-fast.test/2"]
+        assert time.monotonic() - started < 1
+        assert frontier.hosts[host_key("https://a-slow.test/1")].queue == deque(["https://a-slow.test/1"])
+        assert frontier.stats()["backed_off_hosts"] == ["https://a-slow.test"]
+    run(main())
+
+def test_throttled_urls_are_retried_a_limited_number_of_times():
+    async def main():
+        frontier = HostFrontier(rate_per_host=1000)
+        await frontier.put("https://a.test/")
+        attempts = 0
+        while (item := await frontier.get()) is not None:
+            attempts += 1
+            await frontier.done(*item, status=503, retry_after=0)
+        return attempts
+    assert run(main()) == MAX_RETRIES + 1
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
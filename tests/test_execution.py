@@ -0,0 +1,31 @@
+import asyncio, subprocess
+from context_store import save_context
+from orchestrator import execute_with_keys
+
+CTX = {"website": {"url": "https://site.test", "platform": "wordpress"},
+       "agents": {"meta_optimization": {"proposals": [{"page_url": "https://site.test/about", "after": {"title": "About us", "description": "Who we are"}}]}}}
+
+def texts(logs):
+    return "\n".join(m["text"] for m in logs)
+
+def test_requests_cannot_choose_the_git_adapter(tmp_path, monkeypatch):
+    monkeypatch.delenv("GIT_REPO_PATH", raising=False)
+    save_context("exec-git", CTX)
+    logs = asyncio.run(execute_with_keys("exec-git", {"platform": "git", "repo_path": str(tmp_path)}))
+    assert "Missing WordPress creds" in texts(logs)
+
+def test_patch_is_the_one_platform_a_request_may_choose(monkeypatch):
+    monkeypatch.delenv("GIT_REPO_PATH", raising=False)
+    save_context("exec-patch", CTX)
+    logs = asyncio.run(execute_with_keys("exec-patch", {"platform": "patch"}))
+    assert "Applied **1**" in texts(logs)
+
+def test_git_repository_comes_from_server_configuration(tmp_path, monkeypatch):
+    subprocess.run(["git", "init", "--quiet"], cwd=tmp_path, check=True)
+    (tmp_path / "about.html").write_text("<html><head><title>About</title></head></html>")
+    subprocess.run(["git", "add", "--all"], cwd=tmp_path, check=True)
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", "commit", "--quiet", "-m", "site"], cwd=tmp_path, check=True)
+    monkeypatch.setenv("GIT_REPO_PATH", str(tmp_path))
+    save_context("exec-server-git", CTX)
+    logs = asyncio.run(execute_with_keys("exec-server-git", {"repo_path": "/elsewhere", "posts_dir": "../../x"}))
+    assert "Committed to branch" in texts(logs)
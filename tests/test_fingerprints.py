@@ -0,0 +1,22 @@
+import pytest
+from fingerprints import PLATFORM, UNKNOWN, detect
+
+@pytest.mark.parametrize("html, platform", [
+    ('<meta name="generator" content="WordPress 6.4">', "WordPress"),
+    ("<meta content='WordPress 6.4' name='generator'>", "WordPress"),
+    ('<meta name=generator content=Drupal>', "Drupal"),
+    ('<meta content=Drupal name=generator/>', "Drupal"),
+    ('<meta name="generator" content="Wix.com Website Builder">', "Wix"),
+    ('<meta name="generator" content="Jekyll v4"><meta name="keywords" content="hugo">', "Jekyll"),
+])
+def test_generator_meta(html, platform):
+    assert detect(html)[PLATFORM][0] == platform
+
+@pytest.mark.parametrize("html", [
+    '<meta name="description" content="The best wordpress theme generator">',
+    '<meta property="og:title" content="Hugo site generator">',
+    '<meta name="generator-version" content="hugo">',
+    '<meta data-name="generator" content="ghost">',
+])
+def test_other_meta_tags_are_not_generators(html):
+    assert detect(html)[PLATFORM][0] == UNKNOWN
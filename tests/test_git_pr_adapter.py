@@ -0,0 +1,82 @@
+import os, subprocess
+import pytest
+from git_pr_adapter import GitPRAdapter
+
+def git(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, capture_output=True, text=True, check=True).stdout
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "--quiet")
+    (tmp_path / "about.html").write_text("<html><head><title>About</title></head><body></body></html>")
+    git(tmp_path, "add", "--all")
+    git(tmp_path, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "--quiet", "-m", "site")
+    return tmp_path
+
+def branches(repo):
+    return git(repo, "branch", "--list", "fieldnote/*").split()
+
+def test_git_commits_edits_on_a_new_branch(repo):
+    client = GitPRAdapter({"repo_path": str(repo), "branch": "fieldnote/seo"})
+    client.update_page_meta("/about", title="About us")
+    result = client.finalize()
+    assert result["ok"] and result["branch"] == "fieldnote/seo"
+    assert "<title>About us</title>" in git(repo, "show", "fieldnote/seo:about.html")
+    assert not git(repo, "worktree", "list", "--porcelain").count("fieldnote-worktree-")
+
+def test_git_deletes_the_branch_when_there_is_nothing_to_commit(repo):
+    client = GitPRAdapter({"repo_path": str(repo), "branch": "fieldnote/seo"})
+    client.update_page_meta("/about", title="About")
+    result = client.finalize()
+    assert result["ok"] and "branch" not in result
+    assert branches(repo) == []
+
+def test_git_deletes_the_branch_when_the_commit_fails(repo):
+    hook = repo / ".git" / "hooks" / "pre-commit"
+    hook.write_text("#!/bin/sh\nexit 1\n")
+    os.chmod(hook, 0o755)
+    client = GitPRAdapter({"repo_path": str(repo), "branch": "fieldnote/seo"})
+    client.update_page_meta("/about", title="About us")
+    with pytest.raises(RuntimeError):
+        client.finalize()
+    assert branches(repo) == []
+
+def test_git_keeps_a_branch_it_did_not_create(repo):
+    git(repo, "branch", "fieldnote/seo")
+    client = GitPRAdapter({"repo_path": str(repo), "branch": "fieldnote/seo"})
+    client.update_page_meta("/about", title="About us")
+    with pytest.raises(RuntimeError):
+        client.finalize()
+    assert branches(repo) == ["fieldnote/seo"]
+
+@pytest.mark.parametrize("creds", [
+    {"posts_dir": "../../../../tmp/evil"},
+    {"posts_dir": "/tmp/evil"},
+    {"redirects_file": "/tmp/evil_redirects"},
+    {"redirects_file": "public/../../_redirects"},
+    {"site_root": ".."},
+])
+def test_git_rejects_paths_outside_the_repository(repo, creds):
+    with pytest.raises(ValueError):
+        GitPRAdapter({"repo_path": str(repo), **creds})
+
+def test_git_does_not_write_through_a_symlink_out_of_the_worktree(repo, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    os.symlink(outside, repo / "blog")
+    git(repo, "add", "--all")
+    git(repo, "-c", "user.name=t", "-c", "user.email=t@t", "commit", "--quiet", "-m", "link")
+    client = GitPRAdapter({"repo_path": str(repo), "branch": "fieldnote/seo"})
+    client.create_post("blog", "Hello", "<p>hi</p>", slug="hello")
+    with pytest.raises(ValueError):
+        client.finalize()
+    assert list(outside.iterdir()) == []
+    assert branches(repo) == []
+
+def test_git_errors_name_the_subcommand(repo):
+    hook = repo / ".git" / "hooks" / "pre-commit"
+    hook.write_text("#!/bin/sh\nexit 1\n")
+    os.chmod(hook, 0o755)
+    client = GitPRAdapter({"repo_path": str(repo), "branch": "fieldnote/seo"})
+    client.update_page_meta("/about", title="About us")
+    with pytest.raises(RuntimeError, match="^git commit failed"):
+        client.finalize()
@@ -0,0 +1,57 @@
+import asyncio, functools, os, threading, time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from http_cache import HttpCache
+from search_crawl import CrawlConfig, crawl_site
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "site"
+    root.mkdir()
+    (root / "index.html").write_text('<html><head><title>Home</title></head><body><a href="/about.html">about</a></body></html>')
+    (root / "about.html").write_text("<html><head><title>About</title></head><body><h1>About</h1></body></html>")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+def crawl(url, cache):
+    return asyncio.run(crawl_site(url, CrawlConfig(rate_limit_per_host=1000, http_cache=cache)))
+
+def test_a_not_modified_response_reuses_the_cached_page(site, tmp_path):
+    cache = HttpCache(str(tmp_path / "cache"))
+    first = crawl(site, cache)
+    assert cache.stats["misses"] == 2 and cache.stats["revalidated"] == 0
+    entry = cache.get(site + "about.html")
+    assert entry["last_modified"] and HttpCache.validators(entry)["If-Modified-Since"] == entry["last_modified"]
+
+    second = crawl(site, cache)
+    assert cache.stats["revalidated"] == 2
+    assert [p["title"] for p in second.pages] == [p["title"] for p in first.pages] == ["Home", "About"]
+
+def write_entries(cache, count, age):
+    for i in range(count):
+        cache.put(f"https://site.test/{i}", "", "x" * 2000, {})
+        os.utime(cache._path(f"https://site.test/{i}"), (time.time() - age - i, time.time() - age - i))
+
+def test_prune_drops_entries_past_the_max_age(tmp_path, monkeypatch):
+    monkeypatch.setenv("HTTP_CACHE_MAX_AGE_DAYS", "1")
+    cache = HttpCache(str(tmp_path))
+    write_entries(cache, 2, age=0)
+    cache.put("https://site.test/old", "", "x", {})
+    os.utime(cache._path("https://site.test/old"), (time.time() - 2 * 86400,) * 2)
+    assert cache.prune() == 1
+    assert cache.get("https://site.test/old") is None and cache.get("https://site.test/0") is not None
+
+def test_prune_drops_the_least_recently_refreshed_entries_past_the_size_cap(tmp_path, monkeypatch):
+    cache = HttpCache(str(tmp_path))
+    write_entries(cache, 4, age=0)
+    size = cache._path("https://site.test/0").stat().st_size
+    monkeypatch.setenv("HTTP_CACHE_MAX_MB", str(2.5 * size / (1024 * 1024)))
+    assert cache.prune() == 2
+    assert [cache.get(f"https://site.test/{i}") is not None for i in range(4)] == [True, True, False, False]
@@ -0,0 +1,43 @@
+import asyncio, gc
+import jobs
+
+def test_jobs_of_a_session_run_in_order_and_release_their_lock():
+    order = []
+
+    def work(name, delay):
+        async def run(emit):
+            order.append(f"{name} start")
+            await asyncio.sleep(delay)
+            emit({"text": name})
+            order.append(f"{name} end")
+        return run
+
+    async def main():
+        first = jobs.start_job("s-order", "chat", work("first", 0.05))
+        second = jobs.start_job("s-order", "chat", work("second", 0))
+        other = jobs.start_job("s-other", "chat", work("other", 0))
+        while not (first.finished and second.finished and other.finished):
+            await asyncio.sleep(0.01)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert order.index("first end") < order.index("second start")
+    assert order.index("other end") < order.index("first end")
+    assert first.status == second.status == "done"
+    assert [e.get("text") for e in second.events] == ["second", None]
+    gc.collect()
+    assert "s-order" not in jobs._session_locks and "s-other" not in jobs._session_locks
+
+def test_a_failing_job_reports_the_error():
+    async def boom(emit):
+        raise ValueError("no key")
+
+    async def main():
+        job = jobs.start_job("s-fail", "execute", boom)
+        async for _ in job.events_after(0, heartbeat=1):
+            pass
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "error" and job.error == "no key"
+    assert job.events[-1] == {"id": len(job.events), "type": "end", "status": "error"}
@@ -0,0 +1,36 @@
+import numpy as np
+from link_graph import UNREACHABLE, LinkGraph
+
+LINKS = [("/", ["/a", "/b"]), ("/a", ["/b", "/c", "/a", "https://elsewhere.test/"]), ("/b", ["/"]), ("/c", []), ("/orphan", ["/c"])]
+
+def dense_pagerank(links, damping=0.85, iterations=200):
+    urls = [u for u, _ in links]
+    n = len(urls)
+    rank = np.full(n, 1 / n)
+    for _ in range(iterations):
+        new = np.full(n, (1 - damping) / n)
+        for i, (_, out) in enumerate(links):
+            targets = sorted({urls.index(t) for t in out if t in urls} - {i})
+            for j in targets or range(n):
+                new[j] += damping * rank[i] / (len(targets) or n)
+        rank = new
+    return rank
+
+def test_pagerank_matches_a_dense_power_iteration():
+    graph = LinkGraph.from_links(LINKS)
+    assert np.allclose(graph.pagerank(), dense_pagerank(LINKS), atol=1e-8)
+    assert abs(graph.pagerank().sum() - 1) < 1e-9
+
+def test_click_depth_and_orphans():
+    graph = LinkGraph.from_links(LINKS, root_url="/")
+    assert graph.click_depth().tolist() == [0, 1, 1, 2, UNREACHABLE]
+    summary, per_page = graph.analyze()
+    assert summary["orphan_samples"] == ["/orphan"]
+    assert summary["unreachable_pages"] == 1 and summary["max_depth"] == 2
+    assert per_page["/a"][1:] == [1, 1, 2]
+    assert summary["hubs"][:2] == [{"url": "/", "outlinks": 2}, {"url": "/a", "outlinks": 2}]
+
+def test_links_match_pages_by_key():
+    graph = LinkGraph.from_links([("https://s.test/", ["https://s.test/a"]), ("https://s.test/a/", [])],
+                                 key=lambda url: url.rstrip("/"))
+    assert graph.in_degree().tolist() == [0, 1]
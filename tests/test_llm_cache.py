@@ -0,0 +1,39 @@
+import pytest
+import llm_cache
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "DB_PATH", str(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.setattr(llm_cache._local, "conn", None, raising=False)
+    yield llm_cache
+    llm_cache._local.conn.close()
+    llm_cache._local.conn = None
+
+def stored(cache):
+    conn = cache._conn()
+    total = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+    assert total == conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    return total
+
+def test_running_total_follows_inserts_replacements_and_deletes(cache):
+    cache.put("m", "prompt one", "a" * 100)
+    cache.put("m", "prompt two", "b" * 50)
+    assert stored(cache) == 150
+    cache.put("m", "prompt one", "c" * 10)
+    assert stored(cache) == 60
+    assert cache.get(["m"], "prompt  one").text == "c" * 10
+
+def test_least_recently_used_entries_are_evicted_past_the_cap(cache, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_MAX_MB", str(2500 / (1024 * 1024)))
+    for i in range(3):
+        cache.put("m", f"prompt {i}", "x" * 1000)
+    assert cache.get(["m"], "prompt 0") is None
+    assert cache.get(["m"], "prompt 2") is not None
+    assert stored(cache) == 2000
+
+def test_expired_entries_are_dropped(cache, monkeypatch):
+    cache.put("m", "old", "x" * 100)
+    monkeypatch.setenv("LLM_CACHE_TTL_SECONDS", "-1")
+    cache.put("m", "new", "y" * 100)
+    assert stored(cache) == 0
+    assert cache.get(["m"], "old") is None
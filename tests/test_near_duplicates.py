@@ -0,0 +1,30 @@
+import random
+from near_duplicates import cluster, simhash
+
+def distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+def fingerprint(bits):
+    return f"{sum(1 << b for b in bits):016x}"
+
+def test_near_duplicate_texts_get_close_fingerprints():
+    rng = random.Random(7)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    words = [rng.choice(vocabulary) for _ in range(600)]
+    edited = list(words)
+    edited[300] = "changed"
+    other = " ".join(rng.choice(vocabulary) for _ in range(600))
+    assert distance(simhash(" ".join(words)), simhash(" ".join(edited))) <= 3
+    assert distance(simhash(" ".join(words)), simhash(other)) > 10
+    assert simhash("too few words") is None
+
+def test_clusters_join_chains_transitively():
+    # a~b and b~c are 3 bits apart, a and c are 6.
+    a, b, c = fingerprint([]), fingerprint([0, 1, 2]), fingerprint([0, 1, 2, 3, 4, 5])
+    far = fingerprint(range(20, 40))
+    assert cluster([a, far, c, None, b], max_bits=3) == [[0, 2, 4]]
+
+def test_identical_fingerprints_cluster_and_missing_ones_never_do():
+    same = fingerprint([5, 9])
+    assert cluster([same, None, same, None, same]) == [[0, 2, 4]]
+    assert cluster([None, None]) == []
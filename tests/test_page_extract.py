@@ -0,0 +1,51 @@
+import pytest
+from page_extract import ENGINES, _COMPARED_FIELDS, extract_page_data
+
+URL = "https://site.test/blog/post"
+STORY = " ".join(f"The roastery ships batch {i} of single origin beans to cafes across the valley." for i in range(12))
+PAGE = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title> Caf&eacute; &amp; Bar </title>
+<meta name="description" content="  Best café in town  ">
+<meta name="generator" content="WordPress 6.4">
+<link rel="stylesheet" href="/wp-content/themes/x.css"><link rel="canonical" href="/blog/post#top">
+<script>document.write("<h1>fake</h1>")</script><!-- <h1>comment</h1> -->
+</head><body>
+<nav><ul><li><a href="/">Home</a><li><a href="/about/">About</a><li><a href="https://other.test/x#y">Out</a></ul></nav>
+<h1>Hello <em>world</em><!-- c --> again</h1>
+<h2>First</h2><h2>Second <br>part</h2>
+<p>{STORY}<p>Second paragraph with <a href="rel/path?q=1#x">a link</a> and <b>bold
+<img src="/a.png"><img src="/b.png" alt="  "><img alt="Cup" src="/c.png">
+<style>p {{ color: red }}</style>
+<table><tr><td>Cell one<td>Cell two</table>
+</body></html>"""
+
+@pytest.fixture(scope="module")
+def expected():
+    return extract_page_data(URL, PAGE, engine="bs4")
+
+def test_bs4_reads_the_fixture(expected):
+    assert expected["title"] == "Café & Bar"
+    assert expected["meta_description"] == "Best café in town"
+    assert expected["canonical"] == "https://site.test/blog/post"
+    assert expected["platform"] == "WordPress"
+    assert expected["h1"] == ["Hello world again"]
+    assert expected["h2"] == ["First", "Second part"]
+    assert expected["internal_links"] == ["https://site.test/", "https://site.test/about/", "https://other.test/x",
+                                          "https://site.test/blog/rel/path?q=1"]
+    assert expected["image_stats"] == {"total": 3, "missing_alt": 2}
+    assert expected["text_fingerprint"]
+    assert "fake" not in expected["html"] and "color" not in expected["html"]
+
+@pytest.mark.parametrize("engine", sorted(set(ENGINES) - {"bs4"}))
+def test_every_engine_returns_the_same_fields(engine, expected):
+    got = extract_page_data(URL, PAGE, engine=engine)
+    assert {k: got[k] for k in _COMPARED_FIELDS} == {k: expected[k] for k in _COMPARED_FIELDS}
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("links, canonical", [
+    ('<link rel="noncanonical" href="/wrong">', ""),
+    ('<link rel="noncanonical" href="/wrong"><link rel="Alternate CANONICAL" href="/right">', "https://site.test/right"),
+])
+def test_canonical_is_matched_as_a_whole_rel_token(engine, links, canonical):
+    page = f"<html><head>{links}</head><body><p>text</p></body></html>"
+    assert extract_page_data(URL, page, engine=engine)["canonical"] == canonical
@@ -0,0 +1,21 @@
+import os, time, zipfile
+import patch_pack_adapter
+from patch_pack_adapter import PACKS_KEPT, PatchPackAdapter, latest_pack, pack_dir
+
+def test_newest_pack_is_chosen_by_time_and_old_packs_are_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(patch_pack_adapter, "PACK_DIR", str(tmp_path))
+    directory = pack_dir("s")
+    directory.mkdir(parents=True)
+    # Names that sort the opposite way to their age, like packs written by a clock that went back.
+    old = [directory / f"{name}.zip" for name in ("z", "y", "x", "w", "v", "u")]
+    for age, path in enumerate(old):
+        path.write_bytes(b"")
+        os.utime(path, (time.time() - 1000 + age, time.time() - 1000 + age))
+    assert latest_pack("s") == old[-1]
+
+    client = PatchPackAdapter({"session_id": "s", "site_url": "https://site.test"})
+    client.update_page_meta("https://site.test/about", title="About us")
+    result = client.finalize()
+    assert latest_pack("s") == directory / os.path.basename(result["artifact"])
+    assert "pages/about/head.html" in zipfile.ZipFile(result["artifact"]).namelist()
+    assert sorted(directory.glob("*.zip")) == sorted([latest_pack("s")] + old[-(PACKS_KEPT - 1):])
@@ -0,0 +1,35 @@
+import uuid
+from context_store import load_agent, update_agent
+from seo_common import ProposalRun
+
+A, B, C = "https://site.test/a", "https://site.test/b", "https://site.test/c"
+
+def stored_run():
+    sid = f"test-{uuid.uuid4().hex}"
+    update_agent(sid, "meta_optimization", {"proposals": [
+        {"page_url": A, "reason": "LLM meta refinement.", "content_hash": "a1"},
+        {"page_url": B, "reason": "LLM meta refinement.", "content_hash": "b1"},
+        {"page_url": C, "reason": "Near-duplicate of b", "content_hash": "c1", "canonical_to": B},
+    ]})
+    pages = [{"url": A, "content_hash": "a1"}, {"url": B, "content_hash": "b2"}]
+    return sid, ProposalRun(sid, "meta_optimization", pages, {B: [{"url": C}]})
+
+def saved(sid):
+    return [(p["page_url"], p["content_hash"]) for p in load_agent(sid, "meta_optimization")["proposals"]]
+
+def test_unchanged_pages_are_reused_and_changed_ones_redone():
+    _, run = stored_run()
+    assert run.todo == [1] and run.reused == 1 and run.pending == 1
+
+def test_pages_pending_at_the_deadline_keep_their_previous_proposals():
+    sid, run = stored_run()
+    run.save()
+    assert saved(sid) == [(A, "a1"), (B, "b1"), (C, "c1")]
+    assert load_agent(sid, "meta_optimization")["pages_pending"] == 1
+
+def test_new_proposals_replace_the_previous_ones():
+    sid, run = stored_run()
+    run.proposals[1] = [{"page_url": B, "content_hash": "b2"}, {"page_url": C, "content_hash": "c2", "canonical_to": B}]
+    run.save()
+    assert saved(sid) == [(A, "a1"), (B, "b2"), (C, "c2")]
+    assert run.pending == 0 and run.propagated == 1
@@ -0,0 +1,34 @@
+from seo_index import SeoIndex
+
+ROOT = "https://site.test/"
+WORDS = " ".join(f"word{i}" for i in range(40))
+
+def page(path, links=(), title=None, words=500, description="d"):
+    return {"url": ROOT.rstrip("/") + path, "title": title or path, "meta_description": description, "h1": [path],
+            "internal_links": [ROOT.rstrip("/") + link for link in links], "word_count": words, "text_fingerprint": None}
+
+def test_incremental_updates_match_a_full_rebuild():
+    first = [page("/", ["/a", "/b"]), page("/a", ["/b"], title="Same"), page("/b", ["/"], title="Same"), page("/c", words=50)]
+    index = SeoIndex.from_pages(first, ROOT)
+    index.add(page("/a", ["/c"], title="Changed", description=""))
+    index.remove(ROOT + "b")
+    index.add(page("/d", ["/"]))
+    index = SeoIndex.from_state(index.to_state())
+
+    rebuilt = SeoIndex.from_pages([page("/", ["/a", "/b"]), page("/a", ["/c"], title="Changed", description=""),
+                                   page("/c", words=50), page("/d", ["/"])], ROOT)
+    summaries = [index.summary(), rebuilt.summary()]
+    for summary in summaries:
+        summary["link_graph"].pop("elapsed_ms")
+    assert summaries[0] == summaries[1]
+    assert index.link_analysis()[1] == rebuilt.link_analysis()[1]
+    assert list(index.rows) == [ROOT, ROOT + "a", ROOT + "c", ROOT + "d"]
+
+def test_summary_counts_thin_pages_and_duplicate_titles():
+    index = SeoIndex.from_pages([page("/", ["/a"]), page("/a", title="Same", words=10), page("/b", title="Same")], ROOT)
+    summary = index.summary()
+    assert summary["thin_pages"] == 1 and summary["thin_samples"] == [ROOT + "a"]
+    assert summary["duplicate_titles"] == [{"title": "same", "pages": 2}]
+    assert summary["orphan_pages"] == 1
+    index.remove(ROOT + "b")
+    assert index.summary()["duplicate_title_pages"] == 0
@@ -0,0 +1,35 @@
+import asyncio
+import seo_common
+from seo_common import forget_session_key, session_api_key
+
+def state_keys():
+    async def snapshot():
+        return {k[0] for d in (seo_common._models, seo_common._breakers, seo_common._windows) for k in d} | set(seo_common._key_semaphores)
+    return asyncio.run_coroutine_threadsafe(snapshot(), seo_common._llm_loop()).result()
+
+def test_session_keys_are_bounded_and_evicted(monkeypatch):
+    monkeypatch.setattr(seo_common, "SESSION_KEY_MAX", 2)
+    assert session_api_key("a", {"gemini": "key-a"}) == "key-a"
+    assert session_api_key("a") == "key-a"
+    session_api_key("b", {"gemini": "key-b"})
+    session_api_key("c", {"gemini": "key-c"})
+    assert session_api_key("a") is None  # least recently used, dropped past SESSION_KEY_MAX
+    forget_session_key("b")
+    assert session_api_key("b") is None and session_api_key("c") == "key-c"
+    forget_session_key("c")
+
+def test_scheduler_state_is_keyed_by_digest_and_dropped_with_the_last_session():
+    session_api_key("s1", {"gemini": "tenant-key"})
+    session_api_key("s2", {"gemini": "tenant-key"})
+    digest = seo_common._key_digest("tenant-key")
+
+    async def touch():
+        seo_common._model("tenant-key", "gemini-2.5-flash")
+        seo_common._key_semaphores.setdefault(digest, asyncio.Semaphore(1))
+    asyncio.run_coroutine_threadsafe(touch(), seo_common._llm_loop()).result()
+    assert digest in state_keys() and "tenant-key" not in state_keys()
+
+    forget_session_key("s1")
+    assert digest in state_keys()  # s2 still uses the key
+    forget_session_key("s2")
+    assert digest not in state_keys()
@@ -0,0 +1,111 @@
+import asyncio, re, threading, time
+from cms_executor import CMSExecutor, Operation
+from fake_api import FakeAPI
+from shopify_adapter import CostThrottle, ShopifyAdapter
+
+LOOKUPS = ("products", "collections", "pages", "blogs")
+
+class MockShopify:
+    """GraphQL Admin API stand-in with a leaky cost bucket and the cost extension on every response."""
+    def __init__(self, maximum=200.0, restore_rate=2000.0, throttle_first=False, http_429_first=False, reject_paths=()):
+        self.maximum, self.restore_rate = maximum, restore_rate
+        self.available, self.updated = maximum, time.monotonic()
+        self.throttle_first, self.http_429_first = throttle_first, http_429_first
+        self.reject_paths = set(reject_paths)
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.api = FakeAPI({("POST", "/graphql.json"): self.handle})
+        self.url = self.api.url + "/graphql.json"
+
+    def status(self):
+        return {"maximumAvailable": self.maximum, "currentlyAvailable": self.available, "restoreRate": self.restore_rate}
+
+    def handle(self, req):
+        if self.http_429_first:
+            self.http_429_first = False
+            return 429, {"errors": "Exceeded 2 calls per second"}, {"Retry-After": "0"}
+        query, variables = req["body"]["query"], req["body"]["variables"]
+        aliases = re.findall(r"(\w+): (\w+)\(", query)
+        cost = sum(52 if field in LOOKUPS else 10 for _, field in aliases)
+        with self.lock:
+            now = time.monotonic()
+            self.available = min(self.maximum, self.available + (now - self.updated) * self.restore_rate)
+            self.updated = now
+            if cost > self.available or self.throttle_first:
+                if self.throttle_first:
+                    self.throttle_first, self.available = False, 0.0
+                self.throttled += 1
+                return 200, {"errors": [{"message": "Throttled", "extensions": {"code": "THROTTLED"}}],
+                             "extensions": {"cost": {"requestedQueryCost": cost, "actualQueryCost": None, "throttleStatus": self.status()}}}
+            self.available -= cost
+            status = self.status()
+        data = {}
+        for alias, field in aliases:
+            if field in LOOKUPS:
+                handles = re.findall(r'handle:"([^"]+)"', variables.get("q" + alias[1:], ""))
+                data[alias] = {"nodes": [{"id": f"gid://shopify/{field}/{h}", "handle": h} for h in handles if h != "missing"]}
+            else:
+                item = variables["v" + alias[1:]]
+                rejected = isinstance(item, dict) and item.get("path") in self.reject_paths
+                data[alias] = {"userErrors": [{"field": ["path"], "message": "Path has already been taken"}] if rejected else []}
+        return 200, {"data": data, "extensions": {"cost": {"requestedQueryCost": cost, "actualQueryCost": cost, "throttleStatus": status}}}
+
+def adapter(mock):
+    return ShopifyAdapter({"token": "t", "api_base": mock.url, "blog_id": "gid://shopify/Blog/1"})
+
+def test_batches_are_paced_by_the_cost_bucket():
+    mock = MockShopify()
+    try:
+        client = adapter(mock)
+        refs = [client.update_page_meta(f"/products/p{i}", f"Title {i}", "Description")["ref"] for i in range(300)]
+        missing = client.update_page_meta("/products/missing", "x", "y")["ref"]
+        assert client.update_page_meta("/", "Home", "x")["ok"] is False
+        result = client.finalize()
+    finally:
+        mock.api.close()
+    assert mock.throttled == 0
+    assert result["failed"] == {missing: "no Shopify product with handle 'missing'"}
+    assert set(refs).isdisjoint(result["failed"])
+    # 601 metafields: 7 lookup chunks and 25 metafieldsSet aliases, in far fewer documents.
+    assert result["requests"] < 15
+    assert client.throttle.maximum == 200.0 and client.throttle.restore_rate == 2000.0
+
+def test_throttled_and_429_responses_are_retried():
+    mock = MockShopify(throttle_first=True, http_429_first=True)
+    try:
+        client = adapter(mock)
+        ref = client.create_post("", "Hello", "<p>Hi</p>", slug="hello")["ref"]
+        result = client.finalize()
+    finally:
+        mock.api.close()
+    assert mock.throttled == 1
+    assert result["failed"] == {} and result["requests"] == 3
+    assert ref.startswith("s")
+
+def test_cost_throttle_waits_for_the_bucket_to_refill():
+    throttle = CostThrottle()
+    throttle.update({"throttleStatus": {"maximumAvailable": 100, "currentlyAvailable": 0, "restoreRate": 1000}})
+    started = time.monotonic()
+    throttle.wait(50)
+    assert time.monotonic() - started >= 0.045 and throttle.waited >= 0.045
+
+def test_redirect_failures_map_to_their_refs():
+    mock = MockShopify(reject_paths={"/taken"})
+    try:
+        client = adapter(mock)
+        staged = client.set_redirects([("/old", "/new", 301), ("/taken", "/new", 301)])
+        result = client.finalize()
+    finally:
+        mock.api.close()
+    assert len(staged["ref"]) == 2
+    assert list(result["failed"]) == [staged["ref"][1]]
+
+def test_executor_fails_only_the_operation_with_a_rejected_redirect():
+    mock = MockShopify(reject_paths={"/taken"})
+    try:
+        client = adapter(mock)
+        ops = [Operation("redirect", src, [src, "/new"], lambda c, src=src: c.set_redirects([(src, "/new", 301)])) for src in ("/old", "/taken")]
+        report = asyncio.run(CMSExecutor("shopify-redirects", client, "shopify").run(ops))
+    finally:
+        mock.api.close()
+    assert report["done"] == 1 and report["failed"] == 1
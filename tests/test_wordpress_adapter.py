@@ -0,0 +1,48 @@
+from fake_api import FakeAPI
+from wordpress_adapter import WordPressAdapter
+
+API = "/wp-json/wp/v2"
+
+def wordpress_api(pages, posts):
+    content = {}
+
+    def listing(items):
+        def handler(req):
+            page, per_page = int(req["query"]["page"]), int(req["query"]["per_page"])
+            fields = req["query"]["_fields"].split(",")
+            chunk = [{k: v for k, v in item.items() if k in fields} for item in items[(page - 1) * per_page:page * per_page]]
+            return 200, chunk, {"X-WP-TotalPages": str(-(-len(items) // per_page) or 1)}
+        return handler
+
+    def item(resource_id):
+        def handler(req):
+            if req["method"] == "POST":
+                if "content" in req["body"]:
+                    content[resource_id] = req["body"]["content"]
+                return 200, {"id": resource_id}
+            return 200, {"content": {"raw": content.get(resource_id, f"<p>page {resource_id}</p>")}}
+        return handler
+
+    routes = {("GET", f"{API}/pages"): listing(pages), ("GET", f"{API}/posts"): listing(posts)}
+    for p in pages:
+        routes[("GET", f"{API}/pages/{p['id']}")] = routes[("POST", f"{API}/pages/{p['id']}")] = item(p["id"])
+    return FakeAPI(routes), content
+
+def test_wordpress_prefetches_paths_only_and_fetches_content_for_injected_pages():
+    pages = [{"id": i, "link": f"https://site.test/page-{i}/", "slug": f"page-{i}", "content": {"raw": "big"}} for i in range(1, 151)]
+    posts = [{"id": 900, "link": "https://site.test/2024/hello/", "slug": "hello", "content": {"raw": "big"}}]
+    api, content = wordpress_api(pages, posts)
+    try:
+        client = WordPressAdapter({"site_url": api.url, "user": "u", "password": "p"})
+        client.update_page_meta("https://site.test/page-3/", "Title", "Description")
+        client.inject_json_ld("/page-7", {"@type": "Thing"})
+        client.inject_json_ld("/page-7", {"@type": "Other"})
+    finally:
+        api.close()
+
+    listings = api.requests_to("GET", f"{API}/pages") + api.requests_to("GET", f"{API}/posts")
+    assert len(listings) == 3
+    assert all("content" not in req["query"]["_fields"] for req in listings)
+    assert len(api.requests_to("GET", f"{API}/pages/7")) == 1
+    assert not api.requests_to("GET", f"{API}/pages/3")
+    assert content[7].startswith("<p>page 7</p>") and '"Thing"' in content[7] and '"Other"' in content[7]
@@ -1,9 +1,10 @@
 # topical_map.py
 
+import hashlib
 import json
 # CORRECTED: Removed the non-existent 'llm_enabled'
 from seo_common import genai_model, generate_with_fallback, safe_json, today_iso
-from context_store import load_context, save_context
+from context_store import load_agent, load_section, iter_pages, update_agent
 
 class TopicalMap:
     def __init__(self):
@@ -23,23 +24,32 @@ class TopicalMap:
         }]
 
     def generate_map(self, session_id: str) -> dict:
-        ctx = load_context(session_id)
-        if not ctx or "website" not in ctx:
+        website = load_section(session_id, "website")
+        if not website:
             return {"error": "No snapshot found."}
 
-        site = ctx["website"].get("url","")
-        biz = ctx.get("business", {})
+        site = website.get("url","")
+        biz = load_section(session_id, "business", {}) or {}
         model = genai_model()
 
-        seeds = [s for p in ctx["website"].get("pages", []) for s in p.get("h1", []) + p.get("h2", []) if s]
-        seeds = list(dict.fromkeys(seeds))[:30]
+        seeds = []
+        for p in iter_pages(session_id, without_html=True):
+            seeds.extend(s for s in p.get("h1", []) + p.get("h2", []) if s)
+            seeds = list(dict.fromkeys(seeds))
+            if len(seeds) >= 30:
+                break
+        seeds = seeds[:30]
         if not seeds:
             clusters = []
-            ctx.setdefault("agents", {}).setdefault("topical_map", {})["clusters"] = clusters
-            ctx["agents"]["topical_map"]["created_at"] = today_iso()
-            save_context(session_id, ctx)
+            update_agent(session_id, self.name, {"clusters": clusters, "created_at": today_iso()})
             return {"status": "skipped", "reason": "No headings available from crawled pages.", "clusters": clusters}
 
+        # Same seeds and business as last time: the earlier map still applies.
+        seed_hash = hashlib.sha256(json.dumps([site, biz.get("name", ""), seeds], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+        previous = load_agent(session_id, self.name)
+        if previous.get("seed_hash") == seed_hash and previous.get("clusters") and not previous.get("fallback"):
+            return {"status": "reused", "clusters": previous["clusters"]}
+
         if not model:
             return {"error": "LLM not configured. Cannot generate topical map."}
 
@@ -50,11 +60,11 @@ class TopicalMap:
             if not resp:
                 raise RuntimeError("LLM unavailable")
             clusters = safe_json(resp.text) or {}
+            fallback = False
         except Exception as e:
             clusters = self._fallback_clusters(site, seeds)
+            fallback = True
 
-        ctx.setdefault("agents", {}).setdefault("topical_map", {})["clusters"] = clusters
-        ctx["agents"]["topical_map"]["created_at"] = today_iso()
-        save_context(session_id, ctx)
+        update_agent(session_id, self.name, {"clusters": clusters, "seed_hash": seed_hash, "fallback": fallback, "created_at": today_iso()})
 
         return {"status": "ok", "clusters": clusters}
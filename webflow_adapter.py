@@ -1,16 +1,95 @@
 
 from typing import Any, Dict, List, Tuple, Optional
-from cms_base import CMSClient
+from urllib.parse import urlparse
+from cms_bulk import BulkItemAdapter
+
+class WebflowAdapter(BulkItemAdapter):
+    """
+    Requires creds: { token: 'x-api-key', site_id: '...', collection_id?: '...' }.
+    Optional: collection_ids, blog_collection_id, fields (item field slugs),
+    custom_domains (ids to publish to), api_base. Uses the Data API v2:
+    CMS items are updated and created in bulk, static page SEO goes through
+    the page metadata endpoint, and the site is published once at the end.
+    """
+    PLATFORM = "webflow"
+    API_BASE = "https://api.webflow.com/v2"
+    REQUESTS_PER_MINUTE = 60
+    BULK_LIMIT = 100
+    FIELDS = {"seo_title": "seo-title", "seo_description": "seo-description", "json_ld": "json-ld",
+              "post_title": "name", "post_body": "post-body", "slug": "slug"}
 
-class WebflowAdapter(CMSClient):
-    """Requires creds: { token: 'x-api-key', site_id: '...', collection_id?: '...' }"""
     def __init__(self, creds: Dict[str, Any]):
-        self.creds = creds
-    def update_page_meta(self, page_id_or_path: str, title: Optional[str]=None, description: Optional[str]=None, canonical: Optional[str]=None):
-        return {"ok": False, "message": "Static page SEO limited in Webflow API; use CMS items or designer task."}
-    def inject_json_ld(self, page_id_or_path: str, json_ld: Dict[str, Any]):
-        return {"ok": False, "message": "Inject via CMS field rendered in template or manual step."}
-    def create_post(self, collection_or_path: str, title: str, html: str, slug: Optional[str]=None, date: Optional[str]=None, meta: Optional[Dict[str, Any]]=None):
-        return {"ok": False, "message": "Implement with CMS items API"}
-    def set_redirects(self, redirects: List[Tuple[str, str, int]]):
-        return {"ok": False, "message": "Implement with redirects API"}
+        super().__init__(creds)
+        if not (self.creds.get("token") and self.creds.get("site_id")):
+            raise ValueError("Missing Webflow creds: need token and site_id.")
+        self.site_id = self.creds["site_id"]
+        self.session.headers.update({"Authorization": f"Bearer {self.creds['token']}", "Content-Type": "application/json", "accept": "application/json"})
+        self._pages: Optional[Dict[str, str]] = None
+
+    def _list_items(self, collection_id: str):
+        offset = 0
+        while True:
+            data = self._request("GET", f"/collections/{collection_id}/items", params={"offset": offset, "limit": 100})
+            items = data.get("items") or []
+            for item in items:
+                yield item["id"], item.get("fieldData") or {}
+            offset += len(items)
+            if not items or offset >= (data.get("pagination") or {}).get("total", 0):
+                return
+
+    def _bulk_update(self, collection_id: str, items: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, str]:
+        data = self._request("PATCH", f"/collections/{collection_id}/items",
+                             {"items": [{"id": item_id, "fieldData": fields} for item_id, fields in items]})
+        # The response lists the items that were updated; any other item of the request was not.
+        updated = {item.get("id") for item in data.get("items") or []}
+        errors = {item_id: "not updated by Webflow" for item_id, _ in items if item_id not in updated}
+        for error in data.get("errors") or []:
+            if isinstance(error, dict) and error.get("id"):
+                errors[error["id"]] = error.get("message") or "update failed"
+        return errors
+
+    def _bulk_create(self, collection_id: str, items: List[Dict[str, Any]]) -> List[Optional[str]]:
+        data = self._request("POST", f"/collections/{collection_id}/items",
+                             {"items": [{"isDraft": True, "fieldData": fields} for fields in items]})
+        created = data.get("items") or []
+        if len(created) == len(items):
+            return [None] * len(items)
+        # Fewer items came back: the ones whose slug is missing were not created.
+        slugs = {(item.get("fieldData") or {}).get(self.fields["slug"]) for item in created}
+        return [None if fields.get(self.fields["slug"]) in slugs else "not created by Webflow" for fields in items]
+
+    def _publish(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"publishToWebflowSubdomain": True}
+        if self.creds.get("custom_domains"):
+            payload["customDomains"] = list(self.creds["custom_domains"])
+        return self._request("POST", f"/sites/{self.site_id}/publish", payload) or {"ok": True}
+
+    def _static_pages(self) -> Dict[str, str]:
+        """publishedPath -> page id of the site's static pages, listed once."""
+        with self._lock:
+            if self._pages is None:
+                pages: Dict[str, str] = {}
+                offset = 0
+                while True:
+                    data = self._request("GET", f"/sites/{self.site_id}/pages", params={"offset": offset, "limit": 100})
+                    batch = data.get("pages") or []
+                    for page in batch:
+                        path = page.get("publishedPath") or "/" + (page.get("slug") or "")
+                        pages.setdefault(path.rstrip("/") or "/", page["id"])
+                    offset += len(batch)
+                    if not batch or offset >= (data.get("pagination") or {}).get("total", 0):
+                        break
+                self._pages = pages
+            return self._pages
+
+    def _page_seo(self, page_id_or_path: str, title: Optional[str], description: Optional[str]) -> Optional[Dict[str, Any]]:
+        path = (urlparse(page_id_or_path).path if "://" in page_id_or_path else page_id_or_path).rstrip("/") or "/"
+        page_id = self._static_pages().get(path)
+        if page_id is None:
+            return None
+        seo = {k: v for k, v in (("title", title), ("description", description)) if v}
+        # Page metadata has no bulk endpoint; it is written now and goes live with the final publish.
+        self._request("PUT", f"/pages/{page_id}", {"seo": seo})
+        with self._lock:
+            self.direct_writes += 1
+        return {"ok": True, "message": f"Page SEO updated for {path}"}
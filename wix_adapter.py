@@ -1,16 +1,69 @@
 
 from typing import Any, Dict, List, Tuple, Optional
-from cms_base import CMSClient
+from cms_bulk import BulkItemAdapter
+
+class WixAdapter(BulkItemAdapter):
+    """
+    Requires creds: { api_key, site_id, collection_id } where the collection is
+    the Wix Data collection behind the site's dynamic pages (its SEO fields
+    are bound in the editor). Optional: collection_ids, blog_collection_id,
+    fields (field keys), api_base. Items are patched and created with the Wix
+    Data bulk endpoints and the site is published once at the end.
+    """
+    PLATFORM = "wix"
+    API_BASE = "https://www.wixapis.com"
+    REQUESTS_PER_MINUTE = 100
+    BULK_LIMIT = 1000
+    FIELDS = {"seo_title": "seoTitle", "seo_description": "seoDescription", "json_ld": "jsonLd",
+              "post_title": "title", "post_body": "body", "slug": "slug"}
+    QUERY_PAGE = 1000
 
-class WixAdapter(CMSClient):
-    """Requires creds: { api_key or app_id/secret, site_id, optional: velo_endpoint }"""
     def __init__(self, creds: Dict[str, Any]):
-        self.creds = creds
-    def update_page_meta(self, page_id_or_path: str, title: Optional[str]=None, description: Optional[str]=None, canonical: Optional[str]=None):
-        return {"ok": False, "message": "Implement with Wix Management API or Velo function"}
-    def inject_json_ld(self, page_id_or_path: str, json_ld: Dict[str, Any]):
-        return {"ok": False, "message": "Send to Velo endpoint and render"}
-    def create_post(self, collection_or_path: str, title: str, html: str, slug: Optional[str]=None, date: Optional[str]=None, meta: Optional[Dict[str, Any]]=None):
-        return {"ok": False, "message": "Implement via Wix Data"}
-    def set_redirects(self, redirects: List[Tuple[str, str, int]]):
-        return {"ok": False, "message": "Implement via redirects"}
+        super().__init__(creds)
+        if not (self.creds.get("api_key") and self.creds.get("site_id")):
+            raise ValueError("Missing Wix creds: need api_key and site_id.")
+        self.session.headers.update({"Authorization": self.creds["api_key"], "wix-site-id": self.creds["site_id"],
+                                     "Content-Type": "application/json"})
+
+    def _list_items(self, collection_id: str):
+        offset = 0
+        while True:
+            data = self._request("POST", "/wix-data/v2/items/query", {
+                "dataCollectionId": collection_id,
+                "query": {"paging": {"limit": self.QUERY_PAGE, "offset": offset}},
+            })
+            items = data.get("dataItems") or []
+            for item in items:
+                yield item["id"], item.get("data") or {}
+            offset += len(items)
+            if len(items) < self.QUERY_PAGE:
+                return
+
+    def _bulk_update(self, collection_id: str, items: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, str]:
+        # Bulk patch sets only the staged fields; every other field (system fields included) is left as it is.
+        data = self._request("POST", "/wix-data/v2/bulk/items/patch", {
+            "dataCollectionId": collection_id,
+            "patches": [{"dataItemId": item_id,
+                         "fieldModifications": [{"fieldPath": name, "action": "SET_FIELD", "setFieldOptions": {"value": value}}
+                                                for name, value in fields.items()]}
+                        for item_id, fields in items],
+        })
+        errors = {}
+        for result in data.get("results") or []:
+            meta = result.get("itemMetadata") or {}
+            if meta.get("success") is False:
+                errors[meta.get("id")] = (meta.get("error") or {}).get("description") or "update failed"
+        return errors
+
+    def _bulk_create(self, collection_id: str, items: List[Dict[str, Any]]) -> List[Optional[str]]:
+        data = self._request("POST", "/wix-data/v2/bulk/items/insert", {
+            "dataCollectionId": collection_id,
+            "dataItems": [{"data": fields} for fields in items],
+        })
+        results = data.get("results") or []
+        return [None if (r.get("itemMetadata") or {}).get("success", True) else
+                ((r.get("itemMetadata") or {}).get("error") or {}).get("description") or "insert failed"
+                for r in results] + [None] * (len(items) - len(results))
+
+    def _publish(self) -> Dict[str, Any]:
+        return self._request("POST", "/site-publisher/v1/site/publish", {}) or {"ok": True}
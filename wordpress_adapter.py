@@ -1,12 +1,24 @@
 
 import base64
 import json
+import threading
 from typing import Any, Dict, List, Tuple, Optional
 from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from cms_base import CMSClient
+from cms_executor import platform_concurrency
 
 class WordPressAdapter(CMSClient):
+    """
+    Pages and posts are prefetched once (paginated, only their id, link and
+    slug) into a path -> (type, id, item) index, so resolving the URL of
+    each proposal costs no request. Content is fetched only for the items
+    that get JSON-LD injected. All calls share one pooled requests.Session;
+    the adapter is safe to call from several threads.
+    """
+    PREFETCH_FIELDS = "id,link,slug"
+
     def __init__(self, creds: Dict[str, Any]):
         self.base = creds.get('site_url', '').rstrip('/')
         user = creds.get('user')
@@ -15,24 +27,34 @@ class WordPressAdapter(CMSClient):
             raise ValueError("Missing WordPress creds: need site_url, user, password (Application Password)." )
         token = base64.b64encode(f"{user}:{app_pw}".encode()).decode()
         self.headers = {"Authorization": f"Basic {token}", "Content-Type": "application/json"}
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        pool = HTTPAdapter(pool_connections=2, pool_maxsize=max(4, platform_concurrency("wordpress")))
+        self.session.mount("https://", pool)
+        self.session.mount("http://", pool)
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()  # held while paging, so only callers waiting on the index block
+        self._by_path: Optional[Dict[str, Tuple[str, int, Dict[str, Any]]]] = None
+        self._by_id: Dict[int, Tuple[str, int, Dict[str, Any]]] = {}
+        self._by_slug: Dict[str, Tuple[str, int, Dict[str, Any]]] = {}
+        self._item_locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self.requests_made = 0
 
-    def _get(self, path: str, params: Optional[Dict[str, Any]] = None):
+    def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, data: Optional[Dict[str, Any]] = None):
         url = f"{self.base}/wp-json/wp/v2{path}"
-        r = requests.get(url, headers=self.headers, params=params, timeout=30)
+        r = self.session.request(method, url, params=params, data=json.dumps(data) if data is not None else None, timeout=30)
+        self.requests_made += 1
         r.raise_for_status()
-        return r.json()
+        return r
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None):
+        return self._request("GET", path, params=params).json()
 
     def _post(self, path: str, data: Dict[str, Any]):
-        url = f"{self.base}/wp-json/wp/v2{path}"
-        r = requests.post(url, headers=self.headers, data=json.dumps(data), timeout=30)
-        r.raise_for_status()
-        return r.json()
+        return self._request("POST", path, data=data).json()
 
     def _put(self, path: str, data: Dict[str, Any]):
-        url = f"{self.base}/wp-json/wp/v2{path}"
-        r = requests.post(url, headers=self.headers, data=json.dumps(data), timeout=30)  # WP uses POST for updates
-        r.raise_for_status()
-        return r.json()
+        return self._request("POST", path, data=data).json()  # WP uses POST for updates
 
     def _canonical_path(self, url_or_path: str) -> str:
         parsed = urlparse(url_or_path)
@@ -40,12 +62,37 @@ class WordPressAdapter(CMSClient):
         path = "/" + path.lstrip("/")
         return path.rstrip("/") or "/"
 
+    def _index(self) -> Dict[str, Tuple[str, int, Dict[str, Any]]]:
+        """path -> (resource type, id, item), built on first use from every page and post."""
+        with self._index_lock:
+            if self._by_path is None:
+                by_path: Dict[str, Tuple[str, int, Dict[str, Any]]] = {}
+                for resource_type in ("pages", "posts"):
+                    page, total_pages = 1, 1
+                    while page <= total_pages:
+                        r = self._request("GET", f"/{resource_type}", params={
+                            "per_page": 100, "page": page, "context": "edit", "_fields": self.PREFETCH_FIELDS,
+                        })
+                        total_pages = int(r.headers.get("X-WP-TotalPages", "1") or 1)
+                        for item in r.json():
+                            entry = (resource_type, int(item["id"]), item)
+                            # Pages win over posts when both claim a path, as in the old per-URL lookup.
+                            by_path.setdefault(self._canonical_path(item.get("link", "")), entry)
+                            self._by_id.setdefault(entry[1], entry)
+                            self._by_slug.setdefault(item.get("slug", ""), entry)
+                        page += 1
+                self._by_path = by_path
+            return self._by_path
+
     def _resolve_resource(self, page_id_or_path: str) -> Tuple[str, int, Dict[str, Any]]:
+        index = self._index()
         if str(page_id_or_path).isdigit():
             numeric_id = int(page_id_or_path)
+            if numeric_id in self._by_id:
+                return self._by_id[numeric_id]
             for resource_type in ("pages", "posts"):
                 try:
-                    item = self._get(f"/{resource_type}/{numeric_id}", params={"context": "edit"})
+                    item = self._get(f"/{resource_type}/{numeric_id}", params={"context": "edit", "_fields": self.PREFETCH_FIELDS})
                     return resource_type, numeric_id, item
                 except requests.HTTPError:
                     continue
@@ -54,22 +101,12 @@ class WordPressAdapter(CMSClient):
         target_path = self._canonical_path(page_id_or_path)
         if target_path == "/":
             raise ValueError("Homepage updates require a WordPress ID; URL-based homepage lookup is not supported yet.")
-
+        if target_path in index:
+            return index[target_path]
+        # Fall back to slug match if the public link path differs from the crawled URL.
         slug = target_path.split("/")[-1]
-        for resource_type in ("pages", "posts"):
-            items = self._get(
-                f"/{resource_type}",
-                params={"slug": slug, "per_page": 100, "context": "edit"},
-            )
-            for item in items:
-                item_path = self._canonical_path(item.get("link", ""))
-                if item_path == target_path:
-                    return resource_type, int(item["id"]), item
-
-            if items:
-                # Fall back to slug match if the public link path differs from the crawled URL.
-                return resource_type, int(items[0]["id"]), items[0]
-
+        if slug in self._by_slug:
+            return self._by_slug[slug]
         raise ValueError(f"Could not map URL/path '{page_id_or_path}' to a WordPress page or post.")
 
     def update_page_meta(self, page_id_or_path: str, title: Optional[str]=None, description: Optional[str]=None, canonical: Optional[str]=None):
@@ -85,18 +122,29 @@ class WordPressAdapter(CMSClient):
             payload['meta'] = yoast_meta
         return self._put(f"/{resource_type}/{resource_id}", payload)
 
+    def _item_lock(self, resource_type: str, resource_id: int) -> threading.Lock:
+        with self._lock:
+            return self._item_locks.setdefault((resource_type, resource_id), threading.Lock())
+
     def inject_json_ld(self, page_id_or_path: str, json_ld: Dict[str, Any]):
         resource_type, resource_id, item = self._resolve_resource(page_id_or_path)
         script = f"<script type=\"application/ld+json\">{json.dumps(json_ld)}</script>"
-        current_content = (
-            item.get("content", {}).get("raw")
-            or item.get("content", {}).get("rendered")
-            or ""
-        )
-        if script in current_content:
-            return {"ok": True, "message": "JSON-LD already present."}
-        updated_content = f"{current_content}\n{script}".strip()
-        return self._put(f"/{resource_type}/{resource_id}", {"content": updated_content})
+        # Read-modify-write of the content, so two schemas for one page must not interleave.
+        with self._item_lock(resource_type, resource_id):
+            if "content" not in item:
+                item["content"] = self._get(f"/{resource_type}/{resource_id}", params={"context": "edit", "_fields": "content"}).get("content") or {}
+            current_content = (
+                item.get("content", {}).get("raw")
+                or item.get("content", {}).get("rendered")
+                or ""
+            )
+            if script in current_content:
+                return {"ok": True, "message": "JSON-LD already present."}
+            updated_content = f"{current_content}\n{script}".strip()
+            result = self._put(f"/{resource_type}/{resource_id}", {"content": updated_content})
+            # Keep the prefetched copy current, so a later injection on the same page appends to it.
+            item["content"] = {"raw": updated_content}
+            return result
 
     def create_post(self, collection_or_path: str, title: str, html: str, slug: Optional[str]=None, date: Optional[str]=None, meta: Optional[Dict[str, Any]]=None):
         payload = {"title": title, "content": html, "status": "draft"}